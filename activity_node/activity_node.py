@@ -5,22 +5,36 @@
 
 import json
 import os
+import threading
 import time
 import traceback
-from datetime import datetime
 
-import pytz
 import util
-from bottle import Bottle, request
+from bottle import BaseRequest, Bottle, request, response
 from data_structures.activity_correlations import ActivityCorrelations
+from data_structures.case_eviction import CaseEviction
 from data_structures.neighbors import NeighborhoodCollection
 from data_structures.start_activities import StartActivities
-from dateutil.parser import parse
-from paste import httpserver
+from transport import RETRY_AFTER_S, create_transport
 
-UTC = pytz.UTC
-NUM_THREADS = 10
+FAN_OUT_WORKERS = int(os.getenv('FAN_OUT_WORKERS', '16'))    # HTTP transport, 0 or 1: ask the other nodes one after another
+CASE_TTL_S = float(os.getenv('CASE_TTL_S', '0'))             # 0: cases are kept until they are closed
+MAX_CASES = int(os.getenv('MAX_CASES', '0'))                 # 0: number of stored cases is not bounded
+COMPACT_NEIGHBORHOODS = os.getenv('COMPACT_NEIGHBORHOODS', '0') == '1'
+OUTPUTS_DIR = os.getenv('OUTPUTS_DIR', '/application/outputs')   # where the requested nodes per event are written
+PREDECESSOR_QUERY_RETRIES = int(os.getenv('PREDECESSOR_QUERY_RETRIES', '1'))  # unanswered queries are sent again that often
+PREDECESSOR_QUERY_TIMEOUT_S = float(os.getenv('PREDECESSOR_QUERY_TIMEOUT_S', '10'))  # all queries of one event together, 0: no limit
 
+# allow large event batches on /trigger_events
+BaseRequest.MEMFILE_MAX = 16 * 1024 * 1024
+
+
+
+class PredecessorQueryError(Exception):
+    """
+    Another node did not answer a predecessor query. The event is not handled, as it is unknown
+    whether that node holds the predecessor.
+    """
 
 
 class ActivityNode(Bottle):
@@ -28,9 +42,10 @@ class ActivityNode(Bottle):
     An instance of the ActivityNode class represents a sensor node that detects exactly
     one kind of activity of a process. An event is simulated by the receiving of a
     HTTP request to ``/trigger_event``.
+    The other nodes are contacted through ``transport``, by default the one selected by ``TRANSPORT``.
     """
 
-    def __init__(self, ID, IP, activity_name, server_ip_list, server_name_list):
+    def __init__(self, ID, IP, activity_name, server_ip_list, server_name_list, transport=None):
         super(ActivityNode, self).__init__()
 
         self.id = int(ID)
@@ -43,28 +58,54 @@ class ActivityNode(Bottle):
         self.server_name_list = server_name_list
 
         # data structures
-        self.neighbors = NeighborhoodCollection()
+        self.neighbors = NeighborhoodCollection(compact=COMPACT_NEIGHBORHOODS)
         self.start_activities = StartActivities(self)
         self.activity_correlations = ActivityCorrelations(self)
+        self.case_eviction = CaseEviction(self, CASE_TTL_S, MAX_CASES)
 
         # Initialize footprint matrix, start activities and neighbors
         size = (len(self.server_name_list),len(self.server_name_list))
         self.activity_correlations.set_variables(size)
 
-        # for counting predecessor requests
-        self.number_asked_for_predecessor = 0
+        # for counting predecessor requests, per thread as events can be handled concurrently
+        self.asked_for_predecessor = threading.local()
+        # when the predecessor queries of the event the current thread handles have to be answered
+        self.query_deadline = threading.local()
+
+        # sends the requests to the other nodes, the predecessor queries of one event at once
+        self.transport = transport if transport is not None else create_transport(FAN_OUT_WORKERS)
 
         # routes
         self.post('/trigger_event', callback=self.trigger_event)
+        self.post('/trigger_events', callback=self.trigger_events)
         self.get('/case_event_data', callback=self.get_case_event_data_by_request)
         self.get('/current_data', callback=self.get_current_data)
+        self.get('/current_data_delta', callback=self.get_current_data_delta)
         self.post('/get_chosen', callback=self.get_chosen)
+        self.get('/memory_usage', callback=self.get_memory_usage)
+        self.post('/close_case', callback=self.close_case)
+        self.post('/close_cases', callback=self.close_cases)
+
+        # handling these requests contacts other nodes, the server runs them apart from the others
+        self.outbound_routes = {'/trigger_event', '/trigger_events'}
+
+
+    @property
+    def number_asked_for_predecessor(self):
+        """
+        The number of nodes asked for the predecessor of the event the current thread handles.
+        """
+        return getattr(self.asked_for_predecessor, 'count', 0)
+
+    @number_asked_for_predecessor.setter
+    def number_asked_for_predecessor(self, count):
+        self.asked_for_predecessor.count = count
 
 
     def get_chosen(self):
         """
         Gets called to tell a node that it is the predecessor of a node in a certain case.
-        keys: 'case_id', 'activity_id', 'req_timestamp', 'chosen_timestamp'
+        keys: 'case_id', 'activity_id', 'req_timestamp', 'chosen_timestamp' (both in nanoseconds since the epoch)
         """
         try:
 
@@ -73,9 +114,11 @@ class ActivityNode(Bottle):
             if req:
                 case_id = str(req.get('case_id'))
                 successor = int(req.get('activity_id'))
-                successor_timestamp = req.get('req_timestamp')
-                own_timestamp = req.get('chosen_timestamp')
+                successor_timestamp = int(req.get('req_timestamp'))
+                own_timestamp = int(req.get('chosen_timestamp'))
 
+                # before the update, so it waits for a removal of the case that is in progress
+                self.case_eviction.touch_if_stored(case_id)
                 added = self.neighbors.add_succ_to_neighborhood(case_id, own_timestamp, successor, successor_timestamp)
 
                 if not added:
@@ -94,25 +137,85 @@ class ActivityNode(Bottle):
     def get_current_data(self):
         """
         FM Builder node sends request to `/current_data`.
-        Returns currently stored start and end activities as well as its FM.
+        Returns currently stored start and end activities as well as its FM
+        in the binary format of ``ActivityCorrelations.to_bytes``.
         """
         try:
-            end_activities = []
-            for neighborlist in self.neighbors.all.values():
-                for neighbor in neighborlist:
-                    # iterate over successors, as soon as there is a case in which the node does not have
-                    # a successor this node is an end node
-                    if neighbor.succ not in range(len(self.server_name_list)):
-                        end_activities = [self.id]
-                        break
-
-            data =  {
-                'start_activities': self.activity_correlations.get_sendable_is_start_vector(),
-                'end_activities': end_activities,
-                'seq_nmbr_vector': self.activity_correlations.get_sendable_seq_nmbr_vector(),
-                'fm': self.activity_correlations.get_sendable_footprint_matrix()
-                }
-            return data
+            # as soon as there is an event without a successor this node is an end node
+            is_end_activity = self.neighbors.has_event_without_successor()
+
+            response.content_type = 'application/octet-stream'
+            return self.activity_correlations.to_bytes(is_end_activity)
+
+        except Exception as e:
+            print(f"[ACTIVITY NODE {self.id} ERROR] {e}")
+            print(traceback.format_exc())
+            raise e
+
+
+    def get_current_data_delta(self):
+        """
+        FM Builder node sends request to `/current_data_delta` with the last sequence number
+        it received from this node as parameter 'since'.
+        Returns whether this node is an end activity and, if its sequence number changed, its own
+        FM row and start activity value in the binary format of ``ActivityCorrelations.delta_to_bytes``.
+        """
+        try:
+            known_seq_nmbr = int(request.query.since or -1)
+            is_end_activity = self.neighbors.has_event_without_successor()
+
+            response.content_type = 'application/octet-stream'
+            return self.activity_correlations.delta_to_bytes(known_seq_nmbr, is_end_activity)
+
+        except Exception as e:
+            print(f"[ACTIVITY NODE {self.id} ERROR] {e}")
+            print(traceback.format_exc())
+            raise e
+
+
+    def get_memory_usage(self):
+        """
+        Returns how many events the node stores and how many bytes they occupy
+        as well as how many cases were closed or evicted.
+        """
+        return {**self.neighbors.memory_usage(), **self.case_eviction.get_statistics()}
+
+
+    def close_case(self):
+        """
+        Gets called to tell the node that a case is finished. All data of the case is removed.
+        keys: 'case_id'
+        """
+        try:
+            case_id = request.forms.get('case_id')
+
+            if case_id:
+                self.case_eviction.close_case(str(case_id))
+            else:
+                print("Something went wrong! The request did not include a case_id.")
+
+        except Exception as e:
+            print(f"[ACTIVITY NODE {self.id} ERROR] {e}")
+            print(traceback.format_exc())
+            raise e
+
+
+    def close_cases(self):
+        """
+        Batch version of ``close_case``. The request body is a JSON object with the key 'case_ids',
+        the list of finished cases.
+        """
+        try:
+            msg = request.json
+
+            if not msg or "case_ids" not in msg:
+                print("Something went wrong! The request did not include a list of case_ids.")
+                return
+
+            for case_id in msg["case_ids"]:
+                self.case_eviction.close_case(str(case_id))
+
+            return {'closed_cases': len(msg["case_ids"])}
 
         except Exception as e:
             print(f"[ACTIVITY NODE {self.id} ERROR] {e}")
@@ -125,13 +228,16 @@ class ActivityNode(Bottle):
         Gets called by request to /case_event_data.
         The function calls get_case_event_data to return the event data
         to the given case_id if fitting event data exists.
+        The timestamp is given in nanoseconds since the epoch.
         """
         data = request.query
         case_id = str(data.case_id)
         req_timestamp = data.timestamp
 
         if case_id and req_timestamp:
-            return self.get_case_event_data(case_id, req_timestamp)
+            # the case is still running, even if its events are handled by other nodes
+            self.case_eviction.touch_if_stored(case_id)
+            return self.get_case_event_data(case_id, int(req_timestamp))
         else:
             print("Something went wrong with request!")
 
@@ -139,31 +245,20 @@ class ActivityNode(Bottle):
     def get_case_event_data(self, case_id, req_timestamp):
         """
         If the node has a fitting event without a successor for the given case_id,
-        it returns the event data.
+        it returns the event data. Timestamps are nanoseconds since the epoch.
         """
         # print(f"Asking node {self.id}")
         try:
-            if str(case_id) in self.neighbors.all:
-                neighbor_list = self.neighbors.all[str(case_id)]
-                predecessor = None
-
-                for neighbor in reversed(neighbor_list): # because we want the one that is closest to the timestamp
-
-                    if (type(neighbor.succ) != int and neighbor.event_timestamp < req_timestamp) \
-                        or (neighbor.succ and neighbor.event_timestamp < req_timestamp < neighbor.succ_timestamp): # second part is not necessary for synchr comm
-                        # print(f"Succ data    succ {neighbor.succ}   succ timestamp {neighbor.succ_timestamp}")
-                        predecessor = {
-                            'case_id': case_id,
-                            'activity_id': self.id,
-                            'timestamp': neighbor.event_timestamp
-                            }
-                        break
-
-                    if neighbor.event_timestamp > req_timestamp:
-                        break
-
-                if predecessor:
-                    return json.dumps(predecessor)
+            # latest event before the requested timestamp that has no earlier successor
+            event_timestamp = self.neighbors.find_predecessor_candidate(case_id, req_timestamp)
+
+            if event_timestamp is not None:
+                predecessor = {
+                    'case_id': case_id,
+                    'activity_id': self.id,
+                    'timestamp': event_timestamp
+                    }
+                return json.dumps(predecessor)
         except Exception as e:
             print(f"[ACTIVITY NODE {self.id} ERROR] {e}")
             print(traceback.format_exc())
@@ -174,8 +269,9 @@ class ActivityNode(Bottle):
         """
         Asking for predecessor activity node in specific case.
         predecessor_list is a list of dicts with keys 'case_id', 'activity_id', 'timestamp'
+        Timestamps are nanoseconds since the epoch.
         """
-        latest_timestamp = datetime.min.replace(tzinfo=UTC)
+        latest_timestamp = None
         latest_activity = None
 
         # look for event with latest timestamp before own timestamp
@@ -186,12 +282,12 @@ class ActivityNode(Bottle):
 
             if pred_case_id == case_id:
                 print(f"req ts: {requester_timestamp}   pred ts: {pred_timestamp}   latest: {latest_timestamp}")
-                if parse(requester_timestamp) > parse(pred_timestamp) > latest_timestamp:
-                    latest_timestamp = parse(pred_timestamp)
+                if requester_timestamp > pred_timestamp and (latest_timestamp is None or pred_timestamp > latest_timestamp):
+                    latest_timestamp = pred_timestamp
                     latest_activity = pred_activity_id
 
         # if no predecessor event could be found None is returned
-        if latest_timestamp == datetime.min.replace(tzinfo=UTC):
+        if latest_timestamp is None:
             print("No predecessor")
             return
 
@@ -213,7 +309,7 @@ class ActivityNode(Bottle):
             'chosen_timestamp': chosen_timestamp
             }
         server_name = self.server_name_list[chosen_activity_id]
-        util.contact_another_server(server_name, '/get_chosen', 'POST', data)
+        self.transport.request(server_name, '/get_chosen', 'POST', data)
 
 
     def ask_for_predecessor(self, activity, case_id, timestamp):
@@ -221,18 +317,90 @@ class ActivityNode(Bottle):
         Node contacts all other nodes and asks for potential predecessor events for a given event.
         """
         # Ask for predecessor
-        predecessor_list = []
-
-        for server_id in range(len(self.server_name_list)):
-            predecessor = self.ask_node_for_predecessor(server_id, activity, case_id, timestamp)
-
-            if predecessor:
-                predecessor_list.append(predecessor) # list of dicts with keys 'case_id', 'activity_id', 'timestamp'
+        predecessor_list = self.ask_nodes_for_predecessor(range(len(self.server_name_list)), activity, case_id, timestamp)
 
         chosen_pred_data = self.pick_predecessor(case_id, predecessor_list, timestamp)
         return chosen_pred_data
 
 
+    def ask_nodes_for_predecessor(self, server_ids, activity_id, case_id, timestamp):
+        """
+        All nodes with the given IDs are asked for a potential predecessor event.
+        The queries are sent at once through the transport and the answers are collected.
+        Returns a list of dicts with keys 'case_id', 'activity_id', 'timestamp', ordered by activity ID.
+        """
+        predecessors = {}
+        params = {'activity':activity_id, 'case_id': case_id, 'timestamp': timestamp}
+
+        # check own events without contacting another node
+        if self.id in server_ids:
+            res = self.get_case_event_data(case_id, timestamp)
+            if res:
+                predecessors[self.id] = json.loads(res)
+
+        other_ids = [server_id for server_id in server_ids if server_id != self.id]
+        self.number_asked_for_predecessor += len(other_ids)
+
+        calls = [{'srv_ip': self.server_name_list[server_id], 'URI': '/case_event_data', 'req': 'GET', 'params': params}
+                 for server_id in other_ids]
+        for server_id, res in zip(other_ids, self.send_predecessor_queries(calls)):
+            if res.text:
+                predecessors[server_id] = json.loads(res.text)
+
+        # keep the order of the sequential requests, so ties are resolved the same way
+        return [predecessors[server_id] for server_id in sorted(predecessors)]
+
+
+    def send_predecessor_queries(self, calls):
+        """
+        Sends the given ``/case_event_data`` queries at once and returns the responses in the same order.
+        Queries that fail, e.g. by a timeout, are sent again up to ``PREDECESSOR_QUERY_RETRIES`` times.
+        All queries of an event together may take ``PREDECESSOR_QUERY_TIMEOUT_S``, so the sender of the
+        event gets an answer before its own timeout.
+        If one still fails, ``PredecessorQueryError`` is raised: taking it as no predecessor would
+        record the event as a start activity.
+        """
+        remaining_s = self.get_remaining_query_time()
+        if remaining_s is not None and remaining_s <= 0:
+            raise PredecessorQueryError(f"The predecessor queries took longer than {PREDECESSOR_QUERY_TIMEOUT_S}s")
+        results = self.transport.request_many(self.limit_timeouts(calls, remaining_s), remaining_s)
+
+        for _ in range(PREDECESSOR_QUERY_RETRIES):
+            failed = [i for i, (success, _) in enumerate(results) if not success]
+            remaining_s = self.get_remaining_query_time()
+            if not failed or (remaining_s is not None and remaining_s <= 0):
+                break
+            print(f"[ACTIVITY NODE {self.id} ERROR] No answer to the predecessor queries sent to "
+                  f"{', '.join(calls[i]['srv_ip'] for i in failed)}, asking again")
+            retried = self.transport.request_many(self.limit_timeouts([calls[i] for i in failed], remaining_s), remaining_s)
+            for i, result in zip(failed, retried):
+                results[i] = result
+
+        failed = [calls[i]['srv_ip'] for i, (success, _) in enumerate(results) if not success]
+        if failed:
+            raise PredecessorQueryError(f"No answer to the predecessor queries sent to {', '.join(failed)}")
+        return [res for _, res in results]
+
+
+    def get_remaining_query_time(self):
+        """
+        Returns how many seconds the predecessor queries of the event the current thread handles
+        may still take, None if there is no limit.
+        """
+        deadline = getattr(self.query_deadline, 'at', None)
+        return deadline - time.monotonic() if deadline is not None else None
+
+
+    def limit_timeouts(self, calls, remaining_s):
+        """
+        Returns the given calls with timeouts that end after ``remaining_s`` seconds at the latest.
+        """
+        if remaining_s is None:
+            return calls
+        timeout_s = (min(util.HTTP_CONNECT_TIMEOUT_S, remaining_s), min(util.HTTP_READ_TIMEOUT_S or remaining_s, remaining_s))
+        return [dict(call, timeout_s=timeout_s) for call in calls]
+
+
     def ask_node_for_predecessor(self, pred_activity_id, activity_id, case_id, timestamp):
         """
         A node with a given ID is contacted and asked for a potential predecessor event.
@@ -246,7 +414,8 @@ class ActivityNode(Bottle):
         if pred_activity_id != self.id:
             self.number_asked_for_predecessor += 1
 
-            _, res = util.contact_another_server(self.server_name_list[pred_activity_id], '/case_event_data', 'GET', params=params)
+            res, = self.send_predecessor_queries([{'srv_ip': self.server_name_list[pred_activity_id], 'URI': '/case_event_data',
+                                                   'req': 'GET', 'params': params}])
 
             if res.text:
                 predecessor = json.loads(res.text)
@@ -269,40 +438,54 @@ class ActivityNode(Bottle):
             msg = request.forms
 
             if msg["activity_id"] and msg["case_id"] and msg["timestamp"]:
+                self.handle_event(str(msg["case_id"]), int(msg["activity_id"]), msg["timestamp"])
 
-                case_id = str(msg["case_id"])
-                activity = int(msg["activity_id"])
-                timestamp = msg["timestamp"]
+            else:
+                print("Something went wrong! The request did not include one of the following fields: activity, case_id, timestamp")
 
-                if activity != self.id:
-                    print("This event is not supposed to be triggered by me!")
-                    return
+        except PredecessorQueryError as e:
+            # nothing was stored for the event yet, so the sender can trigger it again
+            print(f"[ACTIVITY NODE {self.id} ERROR] {e}, the event is rejected")
+            self.number_asked_for_predecessor = 0
+            response.status = 503
+            response.set_header('Retry-After', str(RETRY_AFTER_S))
 
-                print(f"Case {case_id}: Activity {activity} was triggered at {timestamp}.")
+        except Exception as e:
+            print(f"[ACTIVITY NODE {self.id} ERROR] {e}")
+            print(traceback.format_exc())
+            raise e
 
-                chosen_pred_data = self.ask_for_predecessor(activity, case_id, timestamp)
 
-                # write number of requested nodes to file
-                file_path = str(os.getenv('FILE_PATH'))
-                output_file_name = os.path.splitext(os.path.basename(file_path))[0]
-                filename=f"/application/outputs/{output_file_name}_opt.csv"
-                with open(filename, "a") as f:
-                    f.write(f"{case_id};{activity};{timestamp};{self.number_asked_for_predecessor}\n")
+    def trigger_events(self):
+        """
+        Batch version of ``trigger_event``. The request body is a JSON object with the key 'events',
+        an ordered list of events with keys 'activity_id', 'case_id', 'timestamp'.
+        The events are handled one after another in the given order, so the sender has to make sure
+        that no event in the list depends on an event of the same case that was not handled yet.
+        Returns the number of handled events as 'handled_events'. If a predecessor query is not answered,
+        the remaining events are not handled and the answer is 503 with the number of events handled before,
+        so the sender only triggers the remaining ones again.
+        """
+        handled = 0
+        try:
+            msg = request.json
 
-                self.number_asked_for_predecessor = 0
+            if not msg or "events" not in msg:
+                print("Something went wrong! The request did not include a list of events.")
+                return
 
-                # If there is no predecessor: Event is start event
-                if not chosen_pred_data:
-                    self.start_activities.add_own_start_activity(case_id)
-                    self.neighbors.add_neighborhood(case_id, timestamp)
+            for event in msg["events"]:
+                self.handle_event(str(event["case_id"]), int(event["activity_id"]), event["timestamp"])
+                handled += 1
 
-                # Otherwise: update relations, neighbors and start activities
-                else:
-                    pred_activity_id, pred_timestamp = chosen_pred_data
-                    self.neighbors.add_neighborhood(case_id, timestamp, pred_activity_id, pred_timestamp)
+            return {'handled_events': handled}
 
-            else:
-                print("Something went wrong! The request did not include one of the following fields: activity, case_id, timestamp")
+        except PredecessorQueryError as e:
+            print(f"[ACTIVITY NODE {self.id} ERROR] {e}, the remaining {len(msg['events']) - handled} events are rejected")
+            self.number_asked_for_predecessor = 0
+            response.status = 503
+            response.set_header('Retry-After', str(RETRY_AFTER_S))
+            return {'handled_events': handled}
 
         except Exception as e:
             print(f"[ACTIVITY NODE {self.id} ERROR] {e}")
@@ -310,17 +493,61 @@ class ActivityNode(Bottle):
             raise e
 
 
+    def handle_event(self, case_id, activity, timestamp):
+        """
+        Handles one triggered event: the predecessor event is requested and the neighbors
+        and start activities are updated accordingly.
+        """
+        if activity != self.id:
+            print("This event is not supposed to be triggered by me!")
+            return
+
+        print(f"Case {case_id}: Activity {activity} was triggered at {timestamp}.")
+
+        # the timestamp is only parsed here, all comparisons and requests use nanoseconds since the epoch
+        timestamp_ns = util.to_epoch_ns(timestamp)
+
+        self.query_deadline.at = time.monotonic() + PREDECESSOR_QUERY_TIMEOUT_S if PREDECESSOR_QUERY_TIMEOUT_S > 0 else None
+        try:
+            chosen_pred_data = self.ask_for_predecessor(activity, case_id, timestamp_ns)
+        finally:
+            self.query_deadline.at = None
+
+        # write number of requested nodes to file
+        file_path = str(os.getenv('FILE_PATH'))
+        output_file_name = os.path.splitext(os.path.basename(file_path))[0]
+        filename=os.path.join(OUTPUTS_DIR, f"{output_file_name}_opt.csv")
+        with open(filename, "a") as f:
+            f.write(f"{case_id};{activity};{timestamp};{self.number_asked_for_predecessor}\n")
+
+        self.number_asked_for_predecessor = 0
+
+        # before the event is stored, so it waits for a removal of the case that is in progress
+        self.case_eviction.touch(case_id)
+
+        # If there is no predecessor: Event is start event
+        if not chosen_pred_data:
+            self.start_activities.add_own_start_activity(case_id)
+            self.neighbors.add_neighborhood(case_id, timestamp_ns)
+
+        # Otherwise: update relations, neighbors and start activities
+        else:
+            pred_activity_id, pred_timestamp = chosen_pred_data
+            self.neighbors.add_neighborhood(case_id, timestamp_ns, pred_activity_id, pred_timestamp)
+
+
 # Uncomment if using unimproved activity node
-# Sleep a bit to allow logging to be attached
-# time.sleep(2)
+# if __name__ == '__main__':
+#     # Sleep a bit to allow logging to be attached
+#     time.sleep(2)
 
-# server_list = os.getenv('SERVER_NAME_LIST').split(',')
-# server_ip_list = os.getenv('SERVER_IP_LIST').split(',')
-# own_id = int(os.getenv('SERVER_ID'))
-# own_ip = server_list[own_id]
-# own_name = os.getenv('ACTIVITY_NAME')
+#     server_list = os.getenv('SERVER_NAME_LIST').split(',')
+#     server_ip_list = os.getenv('SERVER_IP_LIST').split(',')
+#     own_id = int(os.getenv('SERVER_ID'))
+#     own_ip = server_list[own_id]
+#     own_name = os.getenv('ACTIVITY_NAME')
 
-# server = ActivityNode(own_id, own_ip, own_name, server_ip_list, server_list)
+#     server = ActivityNode(own_id, own_ip, own_name, server_ip_list, server_list)
 
-# print(f"#### Starting Activity Node with Id {own_id}")
-# httpserver.serve(server, host='0.0.0.0', port=80, threadpool_workers=NUM_THREADS, threadpool_options={"spawn_if_under": NUM_THREADS})
+#     print(f"#### Starting Activity Node with Id {own_id}")
+#     server.transport.serve(server)
@@ -3,9 +3,26 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-import pickle
+import struct
+import threading
+
 import numpy as np
 
+# Binary format of the node data sent to the central node (all little-endian):
+# header: magic b'EMFP', format version (uint8), flags (uint8, bit 0: end activity), node id (uint16),
+#         n = number of activities (uint32), 4 bytes padding
+# body:   is_start vector (n int64), sequence number vector (n int64), footprint matrix (n*n int64, row-major)
+WIRE_MAGIC = b'EMFP'
+WIRE_VERSION = 1
+WIRE_HEADER = struct.Struct('<4sBBHI4x')
+FLAG_END_ACTIVITY = 1
+
+# Binary format of the incremental node data (`/current_data_delta`):
+# header: like above with magic b'EMRW', flags bit 1 is set if the body is included
+# body:   sequence number of own row (int64), own is_start value (int64), own FM row (n int64)
+DELTA_MAGIC = b'EMRW'
+FLAG_ROW_INCLUDED = 2
+
 class ActivityCorrelations():
     """
     Includes all functions and data structures concerning the storage and updating of the
@@ -18,6 +35,7 @@ class ActivityCorrelations():
         self.footprint_matrix = None
         self.seq_nmbr_vector = None     # not necessary for the synchronous communication without the optimization
         self.is_start_vector = None
+        self.lock = threading.Lock()    # keeps the own row and its sequence number consistent
 
 
     def set_variables(self,size:tuple[int,int]) -> None:
@@ -29,25 +47,49 @@ class ActivityCorrelations():
         self.is_start_vector = np.zeros((size[0],1), dtype='int')
 
 
-    def get_sendable_footprint_matrix(self) -> str:
+    def to_bytes(self, is_end_activity:bool) -> bytes:
         """
-        Returns a string version footprint_matrix.
+        Returns the is_start vector, the sequence number vector and the FM in the binary format
+        described by ``WIRE_HEADER``. ``is_end_activity`` is sent as flag.
         """
-        return pickle.dumps(self.footprint_matrix).decode('latin-1')
+        n = self.footprint_matrix.shape[0]
+        flags = FLAG_END_ACTIVITY if is_end_activity else 0
+        header = WIRE_HEADER.pack(WIRE_MAGIC, WIRE_VERSION, flags, self.activity_node.id, n)
 
+        with self.lock:
+            return b''.join([
+                header,
+                self.is_start_vector.astype('<i8', copy=False).tobytes(),
+                self.seq_nmbr_vector.astype('<i8', copy=False).tobytes(),
+                self.footprint_matrix.astype('<i8', copy=False).tobytes()
+                ])
 
-    def get_sendable_seq_nmbr_vector(self) -> str:
+
+    def delta_to_bytes(self, known_seq_nmbr:int, is_end_activity:bool) -> bytes:
         """
-        Returns a string version of seq_nmbr_vector.
+        Returns the own FM row, the own is_start value and their sequence number in the binary format
+        described by ``DELTA_MAGIC``. The row is left out if ``known_seq_nmbr`` is the current
+        sequence number, then only the header with the ``is_end_activity`` flag is sent.
+        As a node only changes its own row, this is everything the central node needs to update
+        its merged FM.
         """
-        return pickle.dumps(self.seq_nmbr_vector).decode('latin-1')
+        own_id = self.activity_node.id
+        n = self.footprint_matrix.shape[0]
+        flags = FLAG_END_ACTIVITY if is_end_activity else 0
 
+        with self.lock:
+            seq_nmbr = int(self.seq_nmbr_vector[own_id][0])
 
-    def get_sendable_is_start_vector(self) -> str:
-        """
-        Returns a string version is_start_vector.
-        """
-        return pickle.dumps(self.is_start_vector).decode('latin-1')
+            # not only "greater": a restarted node starts again with sequence number 0
+            if seq_nmbr == known_seq_nmbr:
+                return WIRE_HEADER.pack(DELTA_MAGIC, WIRE_VERSION, flags, own_id, n)
+
+            flags |= FLAG_ROW_INCLUDED
+            return b''.join([
+                WIRE_HEADER.pack(DELTA_MAGIC, WIRE_VERSION, flags, own_id, n),
+                np.array([seq_nmbr, self.is_start_vector[own_id][0]], dtype='<i8').tobytes(),
+                self.footprint_matrix[own_id].astype('<i8', copy=False).tobytes()
+                ])
 
 
     def add_direct_succession(self, succ) -> None:
@@ -56,8 +98,9 @@ class ActivityCorrelations():
         A node can only add a direct succession if it is the predecessor of it.
         It adds 1 to the count of the corresponding cell and also increases the sequence number by 1.
         """
-        self.footprint_matrix[self.activity_node.id][succ] += 1
-        self.seq_nmbr_vector[self.activity_node.id] += 1
+        with self.lock:
+            self.footprint_matrix[self.activity_node.id][succ] += 1
+            self.seq_nmbr_vector[self.activity_node.id] += 1
 
 
     def update_own_start_activity(self, is_start:bool) -> None:
@@ -65,6 +108,7 @@ class ActivityCorrelations():
         Sets the start activity bool of own activity ID to value of ``is_start``.
         Increments the sequence number corresponding to own activity ID.
         """
-        if is_start != self.is_start_vector[self.activity_node.id]:
-            self.is_start_vector[self.activity_node.id] = is_start
-            self.seq_nmbr_vector[self.activity_node.id] += 1
+        with self.lock:
+            if is_start != self.is_start_vector[self.activity_node.id]:
+                self.is_start_vector[self.activity_node.id] = is_start
+                self.seq_nmbr_vector[self.activity_node.id] += 1
@@ -0,0 +1,119 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CaseEviction:
+    """
+    Removes the case dependent data (neighborhoods and start activities) of cases that are no
+    longer needed, so the storage of a long-running node stays bounded.
+    A case is removed when it is closed explicitly, when it was not active for ``case_ttl_s`` seconds,
+    or when more than ``max_cases`` cases are stored (least recently active first).
+    A case is active when the node stores one of its events or becomes the predecessor of another one, and
+    when another node asks for its events. So a case that continues on other nodes stays active here as
+    long as the nodes that handle its events ask this one for their predecessor.
+    The data of a case is removed while the lock is held, and the node touches a case before it stores
+    an event of it. So a new event of a case that is being removed waits for the removal and is kept.
+    Removing a case by TTL or bound is lossy: if the case is not finished, its next event finds no
+    predecessor and is counted as a start activity, and its direct succession is missing from the
+    footprint matrix. Only closing finished cases keeps the process model exact.
+    """
+
+    def __init__(self, activity_node, case_ttl_s=0, max_cases=0) -> None:
+        self.activity_node = activity_node
+        self.case_ttl_s = case_ttl_s    # 0: cases do not expire
+        self.max_cases = max_cases      # 0: number of cases is not bounded
+
+        self.last_updated = OrderedDict()   # elements: str(case_id): time of last update, least recently updated first
+        self.lock = threading.Lock()
+
+        # counters
+        self.closed_cases = 0
+        self.evicted_cases = 0
+
+
+    def is_active(self) -> bool:
+        """
+        Returns whether cases are evicted by time or number.
+        """
+        return self.case_ttl_s > 0 or self.max_cases > 0
+
+
+    def touch(self, case_id:str) -> None:
+        """
+        Marks the case as active right now and removes cases if the TTL or the bound is exceeded.
+        """
+        if not self.is_active():
+            return
+
+        with self.lock:
+            self.last_updated[str(case_id)] = time.monotonic()
+            self.last_updated.move_to_end(str(case_id))
+        self.evict()
+
+
+    def touch_if_stored(self, case_id:str) -> None:
+        """
+        Like ``touch``, but only for a case the node stores, e.g. when another node asks for its events.
+        """
+        if not self.is_active():
+            return
+
+        with self.lock:
+            if str(case_id) not in self.last_updated:
+                return
+            self.last_updated[str(case_id)] = time.monotonic()
+            self.last_updated.move_to_end(str(case_id))
+        self.evict()
+
+
+    def evict(self) -> None:
+        """
+        Removes the least recently active cases while there are too many or they are expired.
+        """
+        expired_before = time.monotonic() - self.case_ttl_s
+
+        with self.lock:
+            while self.last_updated:
+                case_id, last_updated = next(iter(self.last_updated.items()))
+                too_many = self.max_cases > 0 and len(self.last_updated) > self.max_cases
+                expired = self.case_ttl_s > 0 and last_updated < expired_before
+                if not too_many and not expired:
+                    break
+                self.last_updated.popitem(last=False)
+                self.remove_case(case_id)
+                self.evicted_cases += 1
+
+
+    def close_case(self, case_id:str) -> None:
+        """
+        Removes a case that is known to be finished.
+        """
+        with self.lock:
+            self.last_updated.pop(str(case_id), None)
+            self.remove_case(case_id)
+            self.closed_cases += 1
+
+
+    def remove_case(self, case_id:str) -> None:
+        """
+        Removes all data of the given ``case_id``, called with the lock held.
+        """
+        self.activity_node.neighbors.remove_case(case_id)
+        self.activity_node.start_activities.remove_case(case_id)
+
+
+    def get_statistics(self) -> dict:
+        """
+        Returns the number of tracked, closed and evicted cases.
+        """
+        return {
+            'tracked_cases': len(self.last_updated),
+            'closed_cases': self.closed_cases,
+            'evicted_cases': self.evicted_cases
+            }
@@ -3,46 +3,164 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import sys
+import threading
+from array import array
+
+NO_ACTIVITY = -1    # stored as predecessor/successor if it is not known (yet)
+MAX_ACTIVITY = 2**15 - 1    # activity IDs are stored as int16
+
+
 class NeighborhoodCollection:
     """
     Manages a datastructure to keep up with all neighbors (predecessors and successors)
     per event structured by case.
+
+    A neighborhood is specific for one event - so for one event timestamp. It includes a predecessor
+    with its timestamp and a successor with its timestamp. The neighborhoods are stored column-wise
+    in typed arrays, one row per event: timestamps as int64 nanoseconds since the epoch and activity
+    IDs as int16 with ``NO_ACTIVITY`` if they are not set.
+    Per case, the rows are kept sorted by event timestamp, so events can be looked up by binary search.
     """
 
-    def __init__(self):
-        self.all = {} # key: case_id,  value: list of Neighborhood instances
+    def __init__(self, compact=False):
+        # columns, indexed by row
+        self.event_timestamp = array('q')
+        self.pred = array('h')
+        self.pred_timestamp = array('q')
+        self.succ = array('h')
+        self.succ_timestamp = array('q')
 
+        self.all = {} # key: case_id,  value: array of the case's rows sorted by event_timestamp
+        self.free_rows = array('i') # rows of removed events, reused for new events
+        self.events_without_successor = 0
+        self.end_event_removed = False # whether an event without successor was removed
+        self.lock = threading.Lock()
 
-    def add_neighborhood(self, case_id, event_timestamp, pred=None, pred_timestamp=None) -> None:
+        # if True, neighborhoods are dropped as soon as their successor is fixed
+        self.compact = compact
+
+
+    def add_neighborhood(self, case_id, event_timestamp:int, pred=None, pred_timestamp=None) -> None:
         """
         Adding a new neighborhood to ``all`` if it does not exist for the ``case_id`` yet.
         Possibly already adding a predecessor and its timestamp.
         """
+        # checked before any column is changed, so the columns keep the same length
+        if pred is not None and not 0 <= pred <= MAX_ACTIVITY:
+            raise OverflowError(f"Activity ID {pred} cannot be stored as int16")
+
+        with self.lock:
+            if self.free_rows:
+                row = self.free_rows.pop()
+                self.event_timestamp[row] = event_timestamp
+                self.pred[row] = NO_ACTIVITY if pred is None else pred
+                self.pred_timestamp[row] = 0 if pred_timestamp is None else pred_timestamp
+                self.succ[row] = NO_ACTIVITY
+                self.succ_timestamp[row] = 0
+            else:
+                row = len(self.event_timestamp)
+                self.event_timestamp.append(event_timestamp)
+                self.pred.append(NO_ACTIVITY if pred is None else pred)
+                self.pred_timestamp.append(0 if pred_timestamp is None else pred_timestamp)
+                self.succ.append(NO_ACTIVITY)
+                self.succ_timestamp.append(0)
+            self.events_without_successor += 1
+
+            # If case id already exists, insert at the position of its timestamp
+            if str(case_id) in self.all:
+                rows = self.all[str(case_id)]
+                if event_timestamp >= self.event_timestamp[rows[-1]]:
+                    rows.append(row)
+                else:
+                    rows.insert(self.bisect(rows, event_timestamp, right=True), row)
+
+            # Otherwise add new case to dict
+            else:
+                self.all[str(case_id)] = array('i', [row])
+
+
+    def bisect(self, rows, timestamp:int, right=False) -> int:
+        """
+        Returns the position in ``rows`` at which an event with ``timestamp`` would be inserted,
+        before (or with ``right`` after) all events with the same timestamp.
+        """
+        lo, hi = 0, len(rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_timestamp = self.event_timestamp[rows[mid]]
+            if mid_timestamp < timestamp or (right and mid_timestamp == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+    def find_positions(self, rows, event_timestamp:int) -> range:
+        """
+        Returns the positions in ``rows`` of all events that happened exactly at ``event_timestamp``.
+        """
+        return range(self.bisect(rows, event_timestamp), self.bisect(rows, event_timestamp, right=True))
 
-        # If case id already exists, add to according list
-        if str(case_id) in self.all:
-            self.all[str(case_id)].append(self.Neighborhood(event_timestamp,pred,pred_timestamp,None,None))
 
-        # Otherwise add new case to dict
-        else:
-            self.all[str(case_id)] = [self.Neighborhood(event_timestamp,pred,pred_timestamp,None,None)]
+    def find_rows(self, case_id, event_timestamp:int) -> list:
+        """
+        Returns the rows of all events of the given ``case_id`` that happened exactly at ``event_timestamp``.
+        """
+        rows = self.all.get(str(case_id))
+        if not rows:
+            return []
+        return [rows[i] for i in self.find_positions(rows, event_timestamp)]
 
 
-    def add_succ_to_neighborhood(self, case_id, event_timestamp, succ, succ_timestamp) -> bool:
+    def find_predecessor_candidate(self, case_id, req_timestamp:int):
         """
-        Adding a successor and its timestamp to a specific event with given ``event_timestamp`` of a given ``case_id``.
+        Returns the timestamp of the latest event of the given ``case_id`` before ``req_timestamp``
+        that can still be the predecessor of an event at ``req_timestamp``: it has no successor yet,
+        or its successor happened after ``req_timestamp``. Returns None if there is no such event.
+        Holds the lock, as removed rows are reused for the events of other cases.
         """
+        with self.lock:
+            rows = self.all.get(str(case_id))
+            if not rows:
+                return None
+
+            i = self.bisect(rows, req_timestamp) - 1
 
-        # Find neighborhood entry of given event_timestamp and given case_id
-        for i, neighborhood in enumerate(self.all[str(case_id)]):
+            # usually the first one fits, older events are only checked if it already has an earlier successor
+            while i >= 0:
+                row = rows[i]
+                if self.succ[row] == NO_ACTIVITY \
+                    or req_timestamp < self.succ_timestamp[row]: # second part is not necessary for synchr comm
+                    return self.event_timestamp[row]
+                i -= 1
 
-            if neighborhood.event_timestamp == event_timestamp:
+            return None
+
+
+    def add_succ_to_neighborhood(self, case_id, event_timestamp:int, succ, succ_timestamp:int) -> bool:
+        """
+        Adding a successor and its timestamp to a specific event with given ``event_timestamp`` of a given ``case_id``.
+        """
+        with self.lock:
+            # Find neighborhood entry of given event_timestamp and given case_id
+            rows = self.all.get(str(case_id), array('i'))
+            for i in self.find_positions(rows, event_timestamp):
+                row = rows[i]
 
                 # Check whether succ_timestamp is really better before updating
-                if not neighborhood.succ:
+                if self.succ[row] == NO_ACTIVITY:
+
+                    self.succ[row] = succ
+                    self.succ_timestamp[row] = succ_timestamp
+                    self.events_without_successor -= 1
 
-                    self.all[str(case_id)][i].succ = succ
-                    self.all[str(case_id)][i].succ_timestamp = succ_timestamp
+                    # with synchronous communication an event with fixed successor is never asked for again
+                    if self.compact:
+                        del rows[i]
+                        self.free_rows.append(row)
+                        if not rows:
+                            del self.all[str(case_id)]
 
                     return True
 
@@ -50,20 +168,19 @@ class NeighborhoodCollection:
         return False
 
 
-    def add_pred_to_neighborhood(self, case_id, event_timestamp, pred, pred_timestamp) -> bool:
+    def add_pred_to_neighborhood(self, case_id, event_timestamp:int, pred, pred_timestamp:int) -> bool:
         """
         Adding a predecessor and its timestamp to a specific event with given ``event_timestamp``of a given ``case_id``.
         """
-        # Find neighborhood entry of given event_timestamp and given case_id
-        for i, neighborhood in enumerate(self.all[str(case_id)]):
-
-            if neighborhood.event_timestamp == event_timestamp:
+        with self.lock:
+            # Find neighborhood entry of given event_timestamp and given case_id
+            for row in self.find_rows(case_id, event_timestamp):
 
                 # Check whether there is no predecessor set yet
-                if not neighborhood.pred:
+                if self.pred[row] == NO_ACTIVITY:
 
-                    self.all[str(case_id)][i].pred = pred
-                    self.all[str(case_id)][i].pred_timestamp = pred_timestamp
+                    self.pred[row] = pred
+                    self.pred_timestamp[row] = pred_timestamp
 
                     return True
 
@@ -71,17 +188,49 @@ class NeighborhoodCollection:
         return False
 
 
-    class Neighborhood():
+    def remove_case(self, case_id) -> int:
         """
-        A neighborhood is specific for one event - so for one ``event_timestamp`.
-        Each neighborhood includes a predecessor with its timestamp and a successor with its timestamp.
+        Removes all neighborhoods of the given ``case_id`` and returns how many were removed.
+        Their rows are reused for new events.
         """
-        def __init__(self, event_timestamp, pred, pred_timestamp, succ, succ_timestamp) -> None:
-            self.event_timestamp = event_timestamp
-            self.pred = pred
-            self.pred_timestamp = pred_timestamp
-            self.succ = succ
-            self.succ_timestamp = succ_timestamp
+        with self.lock:
+            rows = self.all.pop(str(case_id), None)
+            if not rows:
+                return 0
 
+            for row in rows:
+                if self.succ[row] == NO_ACTIVITY:
+                    self.events_without_successor -= 1
+                    self.end_event_removed = True
+            self.free_rows.extend(rows)
+            return len(rows)
 
 
+    def has_event_without_successor(self) -> bool:
+        """
+        Returns whether there is or was a stored event that has no successor (yet).
+        An event without successor of a removed case was the last event of that case.
+        """
+        return self.events_without_successor > 0 or self.end_event_removed
+
+
+    def memory_usage(self) -> dict:
+        """
+        Returns how many events and cases are stored and how many bytes they occupy,
+        including the per-case index. Holds the lock, as events are added and removed meanwhile.
+        """
+        with self.lock:
+            columns = [self.event_timestamp, self.pred, self.pred_timestamp, self.succ, self.succ_timestamp, self.free_rows]
+            column_bytes = sum(sys.getsizeof(column) for column in columns)
+            index_bytes = sys.getsizeof(self.all) + sum(sys.getsizeof(case_id) + sys.getsizeof(rows) for case_id, rows in self.all.items())
+
+            events = len(self.event_timestamp) - len(self.free_rows)
+            cases = len(self.all)
+
+        return {
+            'events': events,
+            'cases': cases,
+            'column_bytes': column_bytes,
+            'index_bytes': index_bytes,
+            'bytes_per_event': (column_bytes + index_bytes) / events if events else 0
+            }
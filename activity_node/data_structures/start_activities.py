@@ -26,3 +26,11 @@ class StartActivities:
 
         if size_before == 0:
             self.activity_node.activity_correlations.update_own_start_activity(True)
+
+
+    def remove_case(self, case_id:str) -> None:
+        """
+        Forgets the start activity of the given ``case_id``.
+        The is_start vector is not changed, the activity stays a start activity.
+        """
+        self.start_activities_by_case.pop(str(case_id), None)
@@ -4,20 +4,20 @@
 # LICENSE file in the root directory of this source tree.
 
 import os
+import threading
 import time
-from activity_node import ActivityNode
-from paste import httpserver
 
-NUM_THREADS = 10
+from activity_node import ActivityNode
 
 
 class ImprovedActivityNode(ActivityNode):
 
 
-    def __init__(self,own_id, own_ip, own_name, server_ip_list, server_list):
-        super(ImprovedActivityNode, self).__init__(own_id, own_ip, own_name, server_ip_list, server_list)
+    def __init__(self,own_id, own_ip, own_name, server_ip_list, server_list, transport=None):
+        super(ImprovedActivityNode, self).__init__(own_id, own_ip, own_name, server_ip_list, server_list, transport)
         self.ask_first_nmbr = len(self.server_name_list)
         self.most_frequent = [] # form of elements:   (activity_id, count)
+        self.most_frequent_lock = threading.Lock()
 
 
     # Overwriting ActivityNode method ask_for_predecessor
@@ -31,12 +31,15 @@ class ImprovedActivityNode(ActivityNode):
 
         ## Ask most frequent predecessors first
         # Determine most frequent predecessors
+        with self.most_frequent_lock:
+            most_frequent = list(self.most_frequent)
+
         most_frequent_subset = []
-        if self.ask_first_nmbr >= len(self.most_frequent):
-            most_frequent_subset = [x[0] for x in self.most_frequent]
+        if self.ask_first_nmbr >= len(most_frequent):
+            most_frequent_subset = [x[0] for x in most_frequent]
 
         else:
-            most_frequent_subset = [x[0] for x in self.most_frequent[:self.ask_first_nmbr]]
+            most_frequent_subset = [x[0] for x in most_frequent[:self.ask_first_nmbr]]
 
         if self.id in most_frequent_subset: most_frequent_subset.remove(self.id)
         most_frequent_subset.insert(0, self.id) # this way not wasting requests
@@ -73,12 +76,7 @@ class ImprovedActivityNode(ActivityNode):
 
 
         ## If no predecessor was found ask all others (not the ones that were already asked)
-        predecessor_list = []
-        for server_id in not_asked_yet:
-            predecessor = self.ask_node_for_predecessor(server_id, activity, case_id, timestamp)
-
-            if predecessor:
-                predecessor_list.append(predecessor) # list of dicts with keys 'case_id', 'activity_id', 'timestamp'
+        predecessor_list = self.ask_nodes_for_predecessor(not_asked_yet, activity, case_id, timestamp)
 
         chosen_pred_data = self.pick_predecessor(case_id, predecessor_list, timestamp)
         if chosen_pred_data:
@@ -91,31 +89,33 @@ class ImprovedActivityNode(ActivityNode):
         """
         The data structure `most_frequent` is updated whenever a predecessor activity was found.
         """
-        increased = False
+        with self.most_frequent_lock:
+            increased = False
 
-        for i, (pred_activity, count) in enumerate(self.most_frequent):
-            if pred_activity == chosen_activity_id:
-                self.most_frequent[i] = (pred_activity, count+1)
-                increased = True
-                break
+            for i, (pred_activity, count) in enumerate(self.most_frequent):
+                if pred_activity == chosen_activity_id:
+                    self.most_frequent[i] = (pred_activity, count+1)
+                    increased = True
+                    break
 
-        if not increased:
-            self.most_frequent.append((chosen_activity_id, 1))
+            if not increased:
+                self.most_frequent.append((chosen_activity_id, 1))
 
-        # sort list
-        self.most_frequent = sorted(self.most_frequent, key=lambda tup: tup[1], reverse=True)
+            # sort list
+            self.most_frequent = sorted(self.most_frequent, key=lambda tup: tup[1], reverse=True)
 
 
-# Sleep a bit to allow logging to be attached
-time.sleep(2)
+if __name__ == '__main__':
+    # Sleep a bit to allow logging to be attached
+    time.sleep(2)
 
-server_list = os.getenv('SERVER_NAME_LIST').split(',')
-server_ip_list = os.getenv('SERVER_IP_LIST').split(',')
-own_id = int(os.getenv('SERVER_ID'))
-own_ip = server_list[own_id]
-own_name = os.getenv('ACTIVITY_NAME')
+    server_list = os.getenv('SERVER_NAME_LIST').split(',')
+    server_ip_list = os.getenv('SERVER_IP_LIST').split(',')
+    own_id = int(os.getenv('SERVER_ID'))
+    own_ip = server_list[own_id]
+    own_name = os.getenv('ACTIVITY_NAME')
 
-server = ImprovedActivityNode(own_id, own_ip, own_name, server_ip_list, server_list)
+    server = ImprovedActivityNode(own_id, own_ip, own_name, server_ip_list, server_list)
 
-print(f"#### Starting Activity Node with Id {own_id} and IP {own_ip}")
-httpserver.serve(server, host='0.0.0.0', port=80, threadpool_workers=NUM_THREADS, threadpool_options={"spawn_if_under": NUM_THREADS})
\ No newline at end of file
+    print(f"#### Starting Activity Node with Id {own_id} and IP {own_ip}")
+    server.transport.serve(server)
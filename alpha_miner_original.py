@@ -14,7 +14,8 @@ def run_original_alpha_miner(log):
     Optionally writes the output into a file and opens a visualization of the resulting
     Petri Net.
     """
-    log['case:concept:name'] = log["case:concept:name"].apply(lambda x: str(x))
+    # pm4py needs string columns, a cached log has categorical ones
+    log = log.astype({'case:concept:name': str, 'concept:name': str})
     net, initial_marking, final_marking = pm4py.discover_petri_net_alpha(log)
 
     # pm4py.write_pnml(net, initial_marking, final_marking, "alpha_miner_result.pnml")
@@ -3,28 +3,42 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import numpy as np
+import pandas as pd
+
 from auxiliaries.file_reader import read_event_log
-from datetime import timedelta
 
 
 def no_doubled_timestamps(event_log_df):
     """
     Assumption: Dataframe is ordered by case Id and timestamp
+    Each timestamp that is not later than the (already adjusted) timestamp before it in the same case
+    is set to that timestamp plus a second.
+    One pass over the rows with the timestamps as integers, a row only depends on the row before it.
     """
-    current_case_id = -1
-    last_timestamp = None
-
-    for i, row in event_log_df.iterrows():
-
-        case_id = row["case:concept:name"]
-        timestamp = row["time:timestamp"]
-
-        if last_timestamp and case_id == current_case_id and timestamp <= last_timestamp:
-            # Add a second to timestamp to make it slightly later than the one before
-            event_log_df.loc[i, "time:timestamp"] = last_timestamp + timedelta(seconds=1)
-
-        current_case_id = case_id
-        last_timestamp = event_log_df.loc[i, "time:timestamp"]
+    num_events = event_log_df.shape[0]
+    if num_events == 0:
+        return event_log_df
+
+    timestamps = event_log_df["time:timestamp"]
+    if timestamps.dtype == object:
+        # timestamps with different UTC offsets, e.g. across a change to daylight saving time, are only
+        # compared as datetimes in UTC
+        timestamps = pd.to_datetime(timestamps, utc=True)
+        event_log_df["time:timestamp"] = timestamps
+
+    relative = (timestamps - timestamps.iloc[0]).to_numpy()     # timedeltas, keeps the resolution of the log
+    one_second = int(np.timedelta64(1, 's').astype(relative.dtype).astype(np.int64))
+    adjusted = relative.astype(np.int64).tolist()
+
+    case_ids = event_log_df["case:concept:name"].tolist()
+    for i in range(1, num_events):
+        if adjusted[i] <= adjusted[i - 1] and case_ids[i] == case_ids[i - 1]:
+            adjusted[i] = adjusted[i - 1] + one_second
+    adjusted = np.array(adjusted, dtype=np.int64).astype(relative.dtype)
+
+    if (adjusted != relative).any():
+        event_log_df["time:timestamp"] = (timestamps.iloc[0] + pd.TimedeltaIndex(adjusted)).array
 
     return event_log_df
 
@@ -0,0 +1,130 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+LogCache stores a preprocessed event log as memory-mappable numpy columns, so later runs do not have to
+read, sort and adjust the original file again.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from auxiliaries.event_log_adjuster import no_doubled_timestamps
+from auxiliaries.file_reader import read_event_log
+
+CACHE_VERSION = 2
+COLUMNS = ["case:concept:name", "concept:name", "time:timestamp"]
+
+
+def get_cache_dir(file_path, cache_root):
+    """
+    Returns the directory the cache of the given event log is stored in.
+    """
+    abs_path = os.path.abspath(file_path)
+    digest = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_root, f"{os.path.basename(file_path)}-{digest}")
+
+
+def get_source_stamp(file_path):
+    """
+    Returns what identifies the current content of the event log file, its size and modification time.
+    """
+    stat = os.stat(file_path)
+    return {"source": os.path.abspath(file_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def preprocess_event_log(file_path):
+    """
+    Reads the event log, sorts it by case id and timestamp and makes the timestamps within a case unique.
+    """
+    event_log_df = read_event_log(file_path)
+    event_log_df = event_log_df.filter(items=COLUMNS) # Caution: filter changes order
+    event_log_df = event_log_df.sort_values(["case:concept:name","time:timestamp"])
+    event_log_df = no_doubled_timestamps(event_log_df)
+    return event_log_df
+
+
+def write_cache(event_log_df, file_path, cache_dir):
+    """
+    Writes the preprocessed event log to ``cache_dir``: the case ids and activities as categorical codes
+    (in the integer type pandas uses for that many categories, so they can be mapped without a copy) with their
+    names, the timestamps as int64 since epoch (UTC) in their unit and the sort order, i.e. the row of each
+    event in the original file. The meta data is written last, a cache without it is incomplete.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    cases = pd.Categorical(event_log_df["case:concept:name"].astype(str))
+    activities = pd.Categorical(event_log_df["concept:name"].astype(str))
+    timestamps = pd.DatetimeIndex(event_log_df["time:timestamp"])
+
+    np.save(os.path.join(cache_dir, "case.npy"), cases.codes)
+    np.save(os.path.join(cache_dir, "case_names.npy"), cases.categories.to_numpy(dtype=str))
+    np.save(os.path.join(cache_dir, "activity.npy"), activities.codes)
+    np.save(os.path.join(cache_dir, "activity_names.npy"), activities.categories.to_numpy(dtype=str))
+    np.save(os.path.join(cache_dir, "timestamp.npy"), timestamps.asi8)
+    np.save(os.path.join(cache_dir, "order.npy"), event_log_df.index.to_numpy(dtype=np.int64))
+
+    meta = get_source_stamp(file_path)
+    meta.update({
+        "version": CACHE_VERSION,
+        "num_events": int(event_log_df.shape[0]),
+        "tz": str(timestamps.tz) if timestamps.tz is not None else None,
+        "unit": timestamps.unit
+        })
+    with open(os.path.join(cache_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def read_cache(file_path, cache_dir):
+    """
+    Returns the cached preprocessed event log as dataframe, or None if there is no valid cache for the
+    current content of the file. The case ids and activities are categorical columns over the memory-mapped
+    codes. The timestamps are memory-mapped as well, unless they have a time zone: localizing copies them once.
+    """
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != CACHE_VERSION or any(meta.get(key) != value for key, value in get_source_stamp(file_path).items()):
+        return None
+
+    load = lambda name: np.load(os.path.join(cache_dir, name), mmap_mode="r")
+
+    cases = pd.Categorical.from_codes(load("case.npy"), dtype=pd.CategoricalDtype(load("case_names.npy")))
+    activities = pd.Categorical.from_codes(load("activity.npy"), dtype=pd.CategoricalDtype(load("activity_names.npy")))
+
+    timestamps = pd.DatetimeIndex(load("timestamp.npy").view(f"M8[{meta['unit']}]"), copy=False)
+    if meta["tz"] is not None:
+        timestamps = timestamps.tz_localize("UTC").tz_convert(meta["tz"])
+
+    return pd.DataFrame({
+        "case:concept:name": cases,
+        "concept:name": activities,
+        "time:timestamp": timestamps
+        }, index=pd.Index(load("order.npy"), copy=False), copy=False)
+
+
+def read_cached_event_log(file_path, cache_root):
+    """
+    Returns the event log sorted by case id and timestamp and with unique timestamps within a case,
+    like ``preprocess_event_log``. The result is read from the cache in ``cache_root`` if it is valid,
+    otherwise the file is preprocessed and the cache is written.
+    """
+    cache_dir = get_cache_dir(file_path, cache_root)
+
+    event_log_df = read_cache(file_path, cache_dir)
+    if event_log_df is not None:
+        print(f"Using cached event log {cache_dir}")
+        return event_log_df
+
+    event_log_df = preprocess_event_log(file_path)
+    write_cache(event_log_df, file_path, cache_dir)
+    print(f"Cached event log in {cache_dir}")
+    return event_log_df
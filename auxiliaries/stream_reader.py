@@ -0,0 +1,223 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+StreamReader reads event logs that do not fit into memory chunk by chunk.
+Only the case id, activity and timestamp columns are loaded.
+"""
+import heapq
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from auxiliaries.event_log_adjuster import no_doubled_timestamps
+
+COLUMNS = ["case:concept:name", "concept:name", "time:timestamp"]
+MERGE_FAN_IN = 64     # runs that are merged at once, each one keeps a file open
+
+
+def _local_name(tag):
+    """
+    Returns the tag of an xml element without its namespace.
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def _to_event_frame(rows):
+    """
+    Takes a list of (case id, activity, timestamp) tuples and returns them as a dataframe
+    with the same types ``read_event_log`` uses. The timestamps are converted to UTC like pm4py reads
+    xes logs, so timestamps with different UTC offsets, e.g. across a change to daylight saving time,
+    still form one datetime column.
+    The format is not inferred from the first timestamp of the chunk, so ISO 8601 timestamps with and
+    without fractional seconds can be mixed. Timestamps of a csv log in another format are parsed one by one.
+    """
+    chunk = pd.DataFrame(rows, columns=COLUMNS)
+    try:
+        chunk['time:timestamp'] = pd.to_datetime(chunk['time:timestamp'], utc=True, format='ISO8601')
+    except ValueError:
+        chunk['time:timestamp'] = pd.to_datetime(chunk['time:timestamp'], utc=True, format='mixed')
+    chunk['concept:name'] = chunk['concept:name'].astype(str)
+    chunk['case:concept:name'] = chunk['case:concept:name'].astype(str)
+    return chunk
+
+
+def iter_csv_chunks(file_path, chunk_size):
+    """
+    Reading the event log from a csv file in chunks of ``chunk_size`` events in file order.
+    """
+    for chunk in pd.read_csv(file_path, sep=',', usecols=COLUMNS, dtype={"case:concept:name": str, "concept:name": str}, chunksize=chunk_size):
+        yield _to_event_frame(chunk[COLUMNS])
+
+
+def iter_xes_chunks(file_path, chunk_size):
+    """
+    Reading the event log from a xes file in chunks of about ``chunk_size`` events in file order.
+    The file is parsed incrementally, only the trace that is currently read is kept in memory.
+    """
+    rows = []
+    root = None
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if root is None:
+            root = elem
+        if event != "end" or _local_name(elem.tag) != "trace":
+            continue
+
+        case_id = None
+        trace_events = []
+        for child in elem:
+            if _local_name(child.tag) == "event":
+                attributes = {attribute.get("key"): attribute.get("value") for attribute in child}
+                trace_events.append((attributes.get("concept:name"), attributes.get("time:timestamp")))
+            elif child.get("key") == "concept:name":
+                case_id = child.get("value")
+        rows.extend((case_id, activity, timestamp) for activity, timestamp in trace_events)
+
+        # the trace is not needed anymore
+        root.clear()
+        if len(rows) >= chunk_size:
+            yield _to_event_frame(rows)
+            rows = []
+
+    if rows:
+        yield _to_event_frame(rows)
+
+
+def iter_event_chunks(file_path, chunk_size):
+    """
+    Reading the given event log in ``csv`` or ``xes`` format in chunks of about ``chunk_size`` events
+    in file order.
+    """
+    if file_path[-3:] == "xes":
+        return iter_xes_chunks(file_path, chunk_size)
+    if file_path[-3:] == "csv":
+        return iter_csv_chunks(file_path, chunk_size)
+    raise ValueError(f"The given file format is not supported: {file_path}")
+
+
+def read_activities(file_path, chunk_size):
+    """
+    Returns the activity names of the event log in the order they first occur.
+    """
+    activities = {}
+    for chunk in iter_event_chunks(file_path, chunk_size):
+        activities.update(dict.fromkeys(chunk["concept:name"].unique()))
+    return list(activities)
+
+
+def is_ordered(file_path, chunk_size):
+    """
+    Returns whether the events of the event log are already ordered by case id and timestamp.
+    """
+    last_case_id, last_timestamp = None, None
+    for chunk in iter_event_chunks(file_path, chunk_size):
+        case_ids = chunk["case:concept:name"]
+        timestamps = chunk["time:timestamp"]
+        previous_case_ids = case_ids.shift(1)
+        previous_timestamps = timestamps.shift(1)
+        if last_case_id is not None:
+            previous_case_ids.iloc[0] = last_case_id
+            previous_timestamps.iloc[0] = last_timestamp
+
+        ordered = (case_ids > previous_case_ids) | ((case_ids == previous_case_ids) & (timestamps >= previous_timestamps))
+        # the first event of the log has no predecessor
+        if last_case_id is None:
+            ordered.iloc[0] = True
+        if not ordered.all():
+            return False
+        last_case_id, last_timestamp = case_ids.iloc[-1], timestamps.iloc[-1]
+    return True
+
+
+def _iter_run(path, chunk_size):
+    """
+    Reads a sorted run written by ``external_sort`` back in chunks and yields its events as tuples.
+    """
+    for chunk in pd.read_csv(path, dtype=str, chunksize=chunk_size):
+        yield from _to_event_frame(chunk).itertuples(index=False, name=None)
+
+
+def external_sort(chunks, chunk_size, tmp_dir, fan_in=MERGE_FAN_IN):
+    """
+    Sorts the events of the given chunks by case id and timestamp with bounded memory.
+    Each chunk is sorted and written to ``tmp_dir`` as a run, then the runs are merged. At most ``fan_in``
+    runs are open at the same time: with more runs, groups of them are merged into new runs first.
+    Events with the same case id and timestamp keep their order.
+    Yields the sorted events in chunks of ``chunk_size``.
+    """
+    run_paths = []
+    for i, chunk in enumerate(chunks):
+        path = os.path.join(tmp_dir, f"run_{i}.csv")
+        chunk.sort_values(["case:concept:name", "time:timestamp"], kind="mergesort").to_csv(path, index=False)
+        run_paths.append(path)
+
+    merge_pass = 0
+    while len(run_paths) > fan_in:
+        # neighbouring runs are merged, so events with the same key stay in the order of the file
+        merged_paths = []
+        for i in range(0, len(run_paths), fan_in):
+            group = run_paths[i:i + fan_in]
+            path = os.path.join(tmp_dir, f"run_{merge_pass}_{i // fan_in}.csv")
+            for j, chunk in enumerate(_merge_runs(group, chunk_size)):
+                chunk.to_csv(path, mode="w" if j == 0 else "a", header=j == 0, index=False)
+            for run_path in group:
+                os.remove(run_path)
+            merged_paths.append(path)
+        run_paths = merged_paths
+        merge_pass += 1
+
+    yield from _merge_runs(run_paths, chunk_size)
+
+
+def _merge_runs(run_paths, chunk_size):
+    """
+    Merges the given sorted runs and yields their events in chunks of ``chunk_size``.
+    All runs are read at the same time, together they hold about ``chunk_size`` events.
+    """
+    run_chunk_size = max(1, chunk_size // max(1, len(run_paths)))
+    runs = [_iter_run(path, run_chunk_size) for path in run_paths]
+
+    rows = []
+    for row in heapq.merge(*runs, key=lambda event: (event[0], event[2])):
+        rows.append(row)
+        if len(rows) == chunk_size:
+            yield pd.DataFrame(rows, columns=COLUMNS)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=COLUMNS)
+
+
+def stream_event_log(file_path, chunk_size):
+    """
+    Yields the events of the event log ordered by case id and timestamp in chunks of about ``chunk_size``
+    events, without loading the whole log. If the file is not ordered yet, it is sorted externally.
+    Like ``no_doubled_timestamps``, a timestamp that is not later than the one before in the same case
+    is set to that one plus a second, also across chunks.
+    """
+    if is_ordered(file_path, chunk_size):
+        yield from _without_doubled_timestamps(iter_event_chunks(file_path, chunk_size))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="event_log_runs_") as tmp_dir:
+        sorted_chunks = external_sort(iter_event_chunks(file_path, chunk_size), chunk_size, tmp_dir)
+        yield from _without_doubled_timestamps(sorted_chunks)
+
+
+def _without_doubled_timestamps(chunks):
+    """
+    Applies ``no_doubled_timestamps`` to ordered chunks. The last event of the previous chunk is
+    put in front of the next chunk, so a case that continues is adjusted correctly.
+    """
+    last_event = None
+    for chunk in chunks:
+        chunk = chunk.reset_index(drop=True)
+        if last_event is not None and chunk["case:concept:name"].iloc[0] == last_event["case:concept:name"].iloc[0]:
+            chunk = no_doubled_timestamps(pd.concat([last_event, chunk], ignore_index=True)).iloc[1:].reset_index(drop=True)
+        else:
+            chunk = no_doubled_timestamps(chunk)
+        last_event = chunk.iloc[[-1]]
+        yield chunk
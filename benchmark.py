@@ -0,0 +1,307 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark of the full pipeline: an event log is replayed against the nodes running in this process and the
+throughput, the trigger_event latency, the messages between the nodes per event, the time the central node
+needs to build the model, the peak memory of the process and the peak neighborhood storage of every activity
+node are written as JSON.
+The event log is either given with ``--log`` or generated with ``--cases``, ``--activities`` and ``--variants``.
+Passing the JSON of an earlier run with ``--baseline`` compares both runs, the exit code is 1 on a regression.
+
+    python benchmark.py --cases 2000 --activities 20 --variants 50 --workers 16 --output run.json
+    python benchmark.py --log my_log.csv --mode http --baseline run.json
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+# metric: True if higher is better, compared with --baseline
+COMPARED_METRICS = {
+    'replay.events_per_s': True,
+    'replay.latency_p50_ms': False,
+    'replay.latency_p99_ms': False,
+    'messages_per_event': False,
+    'model.timings_ms.total': False,
+    'memory.peak_rss_mb': False,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replays an event log against the nodes in this process and reports the performance as JSON.")
+    log = parser.add_argument_group("event log")
+    log.add_argument("--log", help="csv or xes event log to replay, otherwise a synthetic log is generated")
+    log.add_argument("--cases", type=int, default=1000, help="synthetic log: number of cases")
+    log.add_argument("--activities", type=int, default=10, help="synthetic log: number of activities")
+    log.add_argument("--variants", type=int, default=20, help="synthetic log: number of distinct traces")
+    log.add_argument("--deviations", type=int, default=2, help="synthetic log: changes of the base trace per variant")
+    log.add_argument("--seed", type=int, default=0, help="synthetic log: random seed")
+
+    run = parser.add_argument_group("run")
+    run.add_argument("--mode", choices=["direct", "http"], default="direct", help="how the nodes reach each other, see LocalCluster")
+    run.add_argument("--node", choices=["improved", "basic"], default="improved", help="activity node implementation")
+    run.add_argument("--workers", type=int, default=8, help="cases replayed concurrently")
+    run.add_argument("--rate", type=float, default=0.0, help="events per second, 0: no limit")
+    run.add_argument("--time-scale", type=float, default=0.0, help="follow the log's timestamps this much faster")
+    run.add_argument("--port", type=int, default=int(os.getenv('BASE_SERVER_PORT', '9000')), help="first port of the nodes")
+    run.add_argument("--check", action="store_true", help="compare the model to the original miner")
+    run.add_argument("--verbose", action="store_true", help="show the output of the nodes")
+
+    result = parser.add_argument_group("result")
+    result.add_argument("--output", help="write the JSON to this file instead of stdout")
+    result.add_argument("--baseline", help="JSON of an earlier run to compare to")
+    result.add_argument("--tolerance", type=float, default=0.1, help="relative change that counts as a regression")
+    args = parser.parse_args(argv)
+    if args.time_scale > 0 and os.getenv('STREAM_LOG', '0') == '1':
+        parser.error("--time-scale cannot be used with STREAM_LOG")
+    return args
+
+
+def make_synthetic_log(path, cases, activities, variants, deviations, seed):
+    """
+    Writes a csv event log of ``cases`` cases. Every case follows one of ``variants`` traces, which are
+    derived from the base order of the activities by ``deviations`` random changes each: two neighbours are
+    swapped (concurrency), one is skipped (choice) or repeated (loop). The first variants are the most
+    frequent ones.
+    """
+    rng = random.Random(seed)
+    names = [f"activity_{i}" for i in range(activities)]
+
+    traces = []
+    for _ in range(variants):
+        trace = list(range(activities))
+        for _ in range(deviations):
+            # the first and the last activity stay in place
+            if len(trace) < 4:
+                break
+            i = rng.randrange(1, len(trace) - 2)
+            change = rng.choice(("swap", "skip", "repeat"))
+            if change == "swap":
+                trace[i], trace[i + 1] = trace[i + 1], trace[i]
+            elif change == "skip":
+                del trace[i]
+            else:
+                trace.insert(i + 1, trace[i])
+        traces.append(trace)
+    weights = [1 / (rank + 1) for rank in range(variants)]
+
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["case:concept:name", "concept:name", "time:timestamp"])
+        for case_id in range(cases):
+            timestamp = start + timedelta(seconds=rng.randrange(cases * 60))
+            for activity in rng.choices(traces, weights)[0]:
+                timestamp += timedelta(seconds=rng.randint(1, 600))
+                writer.writerow([case_id, names[activity], timestamp.isoformat(sep=" ")])
+
+
+class MemorySampler:
+    """
+    Polls ``/memory_usage`` of the activity nodes in the background and keeps, per activity, the peak number of
+    stored events and the peak bytes of their neighborhood columns and case index. The footprint matrix and the
+    rest of a node's memory are not included.
+    """
+
+    def __init__(self, nodes, interval_s=0.05):
+        self.nodes = nodes
+        self.interval_s = interval_s
+        self.peaks = {node.activity_name: {'peak_events': 0, 'peak_storage_bytes': 0} for node in nodes}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+
+    def start(self):
+        self.thread.start()
+
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+
+    def run(self):
+        while not self.stopped.wait(self.interval_s):
+            self.sample()
+
+
+    def sample(self):
+        for node in self.nodes:
+            usage = node.get_memory_usage()
+            peak = self.peaks[node.activity_name]
+            peak['peak_events'] = max(peak['peak_events'], usage['events'])
+            peak['peak_storage_bytes'] = max(peak['peak_storage_bytes'], usage['column_bytes'] + usage['index_bytes'])
+
+
+def get_peak_rss_mb():
+    """
+    Returns the peak resident memory of this process in MB, None where it is unknown.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def count_messages(cluster):
+    """
+    Returns how many requests the nodes sent to each other so far.
+    """
+    if cluster.direct_transport is not None:
+        return cluster.direct_transport.requests_sent
+    transports = {id(node.transport): node.transport for node in cluster.nodes}
+    return sum(transport.requests_sent for transport in transports.values())
+
+
+def run_benchmark(args, log_path):
+    """
+    Replays the event log at ``log_path`` and returns the results.
+    The modules are imported here, as they read their settings from the environment when they are imported.
+    """
+    from event_log_handler import EventLogHandler, IP_NO_PORT
+    from local_cluster import LocalCluster
+    from replay_scheduler import ReplayScheduler
+
+    cluster = LocalCluster(args.mode, args.node)
+    elh = EventLogHandler(session=cluster.session)
+    mapping = elh.get_server_id_to_activity_name_mapping()
+    cluster.start(mapping)
+
+    try:
+        activity_nodes = cluster.nodes[:-1]
+        sampler = MemorySampler(activity_nodes)
+        sampler.start()
+
+        messages_before = count_messages(cluster)
+        replay = ReplayScheduler(elh.trigger_event, args.workers, args.rate, args.time_scale).run(elh.iter_remaining_chunks())
+        replay_messages = count_messages(cluster) - messages_before
+        sampler.stop()
+
+        messages_before = count_messages(cluster)
+        res = elh.send("get", f"{IP_NO_PORT}{args.port + len(mapping)}/process_model", timeout=600)
+        model_messages = count_messages(cluster) - messages_before
+        timings_ms = res.json().get('timings_ms', {}) if res.status_code == 200 else {}
+
+        equal = elh.request_process_model() if args.check else None
+    finally:
+        cluster.stop()
+
+    return {
+        'log': {
+            'path': log_path,
+            'events': replay['events'],
+            'cases': None if elh.event_log_df is None else int(elh.event_log_df["case:concept:name"].nunique()),
+            'activities': len(mapping)
+            },
+        'replay': replay,
+        'messages_per_event': replay_messages / replay['events'] if replay['events'] else 0.0,
+        'model': {
+            'status': res.status_code,
+            'timings_ms': timings_ms,
+            'messages': model_messages,
+            'equal': equal
+            },
+        'memory': {
+            'peak_rss_mb': get_peak_rss_mb(),
+            'activity_node_storage': sampler.peaks
+            }
+        }
+
+
+def get_metric(results, path):
+    for key in path.split('.'):
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Compares the metrics in ``COMPARED_METRICS`` to the baseline and returns the ones that got worse by
+    more than ``tolerance``, relative to the baseline.
+    """
+    regressions = {}
+    for path, higher_is_better in COMPARED_METRICS.items():
+        current, previous = get_metric(results, path), get_metric(baseline, path)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        print(f"{path}: {previous:.3f} -> {current:.3f} ({change:+.1%})", file=sys.stderr)
+        if worse > tolerance:
+            regressions[path] = {'baseline': previous, 'current': current, 'change': change}
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="edgeminer_benchmark_") as work_dir:
+        if args.log:
+            log_path = os.path.abspath(args.log)
+        else:
+            log_path = os.path.join(work_dir, "synthetic.csv")
+            make_synthetic_log(log_path, args.cases, args.activities, args.variants, args.deviations, args.seed)
+
+        # The EventLogHandler writes to outputs/ in the working directory, the nodes to OUTPUTS_DIR
+        os.environ.update({
+            'BASE_SERVER_PORT': str(args.port),
+            'DOCKER_LABEL': os.getenv('DOCKER_LABEL', 'benchmark'),
+            'FILE_PATH': log_path,
+            'OUTPUTS_DIR': work_dir
+            })
+        os.makedirs(os.path.join(work_dir, "outputs"))
+        cwd = os.getcwd()
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.chdir(work_dir)
+        try:
+            with open(os.devnull, "w", encoding="utf-8") as devnull:
+                with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                    results = run_benchmark(args, log_path if args.log else None)
+        finally:
+            os.chdir(cwd)
+
+    results = {
+        'config': {
+            **{key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'tolerance', 'verbose')},
+            **{name: os.getenv(name) for name in ('TRANSPORT', 'EVENT_WORKERS', 'QUERY_WORKERS', 'MAX_QUEUED_EVENTS',
+                                                  'FAN_OUT_WORKERS', 'PAIR_ENGINE', 'SYNC_MODE') if os.getenv(name) is not None}
+            },
+        **results
+        }
+    if baseline is not None:
+        results['regressions'] = compare_to_baseline(results, baseline, args.tolerance)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    return 1 if results.get('regressions') or results['replay']['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,37 +3,43 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import hashlib
 import itertools
 import json
 import os
-import pickle
+import threading
 import time
 import traceback
 from ast import literal_eval
 from functools import reduce
 
 import numpy as np
-import util
-from bottle import Bottle
-from paste import httpserver
+from bottle import Bottle, request, response
 from pm4py.objects.petri_net.exporter import exporter
 from pm4py.objects.petri_net.obj import Marking, PetriNet
 from pm4py.objects.petri_net.utils import petri_utils
 
 from central_node_auxiliaries import (
-    find_transition_to_activity_id, get_all_subsets, is_causality_pair,
-    is_independent_set, is_subset, print_with_name_instead_of_id)
+    decode_node_data, decode_node_delta, drop_self_loop_sides, get_all_subsets,
+    get_pair_cliques, get_pair_graph, get_relations, is_causality_pair,
+    is_independent_set, iter_bits, print_with_name_instead_of_id,
+    remove_subsumed_pairs, to_mask, update_pair_cliques)
+from transport import create_transport
 
-NUM_THREADS = 10
+SYNC_MODE = os.getenv('SYNC_MODE', 'delta')     # 'delta': only changed rows are requested, 'full': all FMs
+COLLECT_WORKERS = int(os.getenv('COLLECT_WORKERS', '16'))           # HTTP transport: threads requesting the activity nodes' data
+COLLECT_TIMEOUT_S = float(os.getenv('COLLECT_TIMEOUT_S', '5'))      # nodes not answering in time are left out
+PAIR_ENGINE = os.getenv('PAIR_ENGINE', 'cliques')   # 'cliques': maximal cliques, 'powerset': all subsets of activities
 
 
 class CentralNode(Bottle):
     """
     The Central Node is responsible for collecting all data from the activity nodes,
     and using it to calculate a current process model.
+    The activity nodes are contacted through ``transport``, by default the one selected by ``TRANSPORT``.
     """
 
-    def __init__(self, ID, IP, server_list, server_ip_list, server_activity_mapping) -> None:
+    def __init__(self, ID, IP, server_list, server_ip_list, server_activity_mapping, transport=None) -> None:
         super(CentralNode, self).__init__()
 
         self.id = int(ID)
@@ -47,54 +53,192 @@ class CentralNode(Bottle):
         self.server_activity_mapping = server_activity_mapping
         self.activities = [int(x) for x in list(self.server_activity_mapping.keys())]
 
-        self.data_list = []
+        self.transport = transport if transport is not None else create_transport(min(COLLECT_WORKERS, len(self.server_name_list)))
+
+        # merged node data, kept up to date by the incremental sync
+        num_nodes = len(self.server_name_list)
+        self.fm = np.zeros((num_nodes,num_nodes), dtype='int')
+        self.seq_nmbr_vector = np.full(num_nodes, -1, dtype='int')  # -1: nothing received yet
+        self.is_start_vector = np.zeros(num_nodes, dtype='int')
+        self.end_activities = set()
+        self.sync_lock = threading.Lock()
+
+        # process model state, only the pairs of activities with changed FM cells are recomputed
+        self.model_fm = None        # 0/1-FM of the current model
+        self.pair_cliques = None    # maximal (A,B)-cliques, including the ones with a single self-loop side
+        self.model_key = None       # FM, start and end activities of the current model
+        self.pnml_string = None
+        self.model_lock = threading.Lock()
 
         self.get('/process_model', callback=self.get_process_model)
 
+        # handling these requests contacts the activity nodes, the server runs them apart from the others
+        self.outbound_routes = {'/process_model'}
+
 
     # GET "/process_model"
     def get_process_model(self) -> tuple[PetriNet,Marking,Marking]:
         """
         All activity nodes' data is requested, then merged and the original Alpha Miner
         algorithm is continued on the merged data.
-        It returns the resulting Petri Net.
+        It returns the resulting Petri Net and the time each step took in ``timings_ms``.
+        The response has the model version as ETag. If the request's If-None-Match header holds
+        the current version, only "304 Not Modified" is returned and no model is formed.
         """
         try:
             print("Receiving request to form process model")
+            started = time.perf_counter()
+            timings = {}
+
+            if SYNC_MODE == 'delta':
+                # Request the changed rows of each node and update the merged data
+                merged_data, missing_nodes = self.sync_node_deltas(timings)
+
+            else:
+                # Request data from each node, a fresh list for every request
+                contents, missing_nodes = self.collect_from_nodes('/current_data')
+                timings['collect'] = 1000 * (time.perf_counter() - started)
+                data_list = [decode_node_data(content) for content in contents.values()]
+                if not data_list:
+                    raise RuntimeError("No activity node sent its data")
+
+                # Merge results at central node
+                merged_data = self.merge_node_data(data_list)
+                timings['merge'] = 1000 * (time.perf_counter() - started) - timings['collect']
+
+            if missing_nodes:
+                print(f"[CENTRAL NODE]  No data from {missing_nodes}, forming the process model without it")
+
+            etag = f'"{self.get_model_version(merged_data)}"'
+            response.set_header('ETag', etag)
+            response.set_header('Cache-Control', 'no-cache')
+            if etag in request.headers.get('If-None-Match', ''):
+                response.status = 304
+                return ''
+
+            pnml_string = self.update_process_model(merged_data, timings)
+            timings['total'] = 1000 * (time.perf_counter() - started)
+
+            return json.dumps({'net': pnml_string, 'missing_nodes': missing_nodes, 'timings_ms': timings})
+
+        except Exception as e:
+            print(f"[CENTRAL NODE ERROR]  {e}")
+            print(traceback.format_exc())
+
+
+    def get_model_version(self, merged_data:dict) -> str:
+        """
+        Returns the version of the process model of the merged data. It is derived from the merged sequence
+        number vector, which changes with every FM row and start activity update, and the end activities,
+        which are not covered by sequence numbers.
+        """
+        version = hashlib.sha1(np.asarray(merged_data["seq_nmbr_vector"], dtype='<i8').tobytes())
+        version.update(repr(sorted(merged_data["end_activities"])).encode())
+        return version.hexdigest()[:16]
 
-            # Request data from each node and add it to data_list
-            for server_name in self.server_name_list:
-                succ, res = util.contact_another_server(server_name, '/current_data', 'GET', None)
-                if succ and res:
 
-                    data = res.text
-                    if data:
-                        data = json.loads(data)
-                        data['start_activities'] = pickle.loads(data['start_activities'].encode('latin-1'))
-                        data['end_activities'] = set(data['end_activities'])
-                        data['seq_nmbr_vector'] = pickle.loads(data['seq_nmbr_vector'].encode('latin-1'))
-                        data['fm'] = pickle.loads(data['fm'].encode('latin-1'))
-                        self.data_list.append(data)
+    def update_process_model(self, merged_data:dict, timings:dict=None) -> str:
+        """
+        Forms the process model of the merged data and returns it as a pnml string.
+        As long as the 0/1-FM, the start and the end activities stay the same, the cached string is returned.
+        Otherwise only the (A,B)-pairs containing an activity whose FM row or column changed are recomputed.
+        The milliseconds each step took are added to ``timings``.
+        """
+        timings = timings if timings is not None else {}
+        fm = merged_data["fm"]
+        model_key = (fm.tobytes(), frozenset(merged_data["start_activities"]), frozenset(merged_data["end_activities"]))
+
+        with self.model_lock:
+            if model_key == self.model_key:
+                return self.pnml_string
 
-            # Merge results at central node
-            merged_data = self.merge_node_data(self.data_list)
+            changed_activities = None
+            if self.model_fm is not None and self.model_fm.shape == fm.shape:
+                preds, succs = np.nonzero(fm != self.model_fm)
+                changed_activities = to_mask(set(preds.tolist()) | set(succs.tolist()))
 
             # Calculate the (A,B)-pair set and minimizes it
-            set_pairs, self_loops = self.calculate_pairs(merged_data["fm"])
+            started = time.perf_counter()
+            set_pairs, self_loops = self.calculate_pairs(fm, changed_activities)
+            timings['calculate_pairs'] = 1000 * (time.perf_counter() - started)
+
+            started = time.perf_counter()
             set_pairs = self.minimize_pairs(set_pairs, self_loops)
+            timings['minimize_pairs'] = 1000 * (time.perf_counter() - started)
 
             # Calculate resulting Petri Net
+            started = time.perf_counter()
             net, start, end = self.form_petri_net(set_pairs, merged_data["start_activities"], merged_data["end_activities"])
+            timings['form_petri_net'] = 1000 * (time.perf_counter() - started)
 
-            # Convert the PetriNet object to a pnml string and return it in response
+            # Convert the PetriNet object to a pnml string
+            started = time.perf_counter()
             pnml_string = exporter.serialize(net,start,end)
-            pnml_string = pnml_string.decode("utf-8")
+            timings['serialize'] = 1000 * (time.perf_counter() - started)
+            self.pnml_string = pnml_string.decode("utf-8")
+            self.model_fm = fm
+            self.model_key = model_key
 
-            return json.dumps({'net': pnml_string})
+            return self.pnml_string
 
-        except Exception as e:
-            print(f"[CENTRAL NODE ERROR]  {e}")
-            print(traceback.format_exc())
+
+    def collect_from_nodes(self, uri:str, params_list:list[dict]=None) -> tuple[dict,list]:
+        """
+        Sends a GET request to all activity nodes at once, ``params_list`` holds the parameters per node.
+        Each request may take ``COLLECT_TIMEOUT_S`` to connect and to read, so a single slow node does not hold up the others.
+        Returns the response contents by node id and the names of the nodes that did not answer in time.
+        """
+        calls = [{'srv_ip': server_name, 'URI': uri, 'req': 'GET', 'params': params_list[node_id] if params_list else None,
+                  'timeout_s': COLLECT_TIMEOUT_S}
+                 for node_id, server_name in enumerate(self.server_name_list)]
+
+        contents = {}
+        for node_id, (succ, res) in enumerate(self.transport.request_many(calls, timeout_s=COLLECT_TIMEOUT_S)):
+            if succ and res and res.content:
+                contents[node_id] = res.content
+
+        missing_nodes = [server_name for node_id, server_name in enumerate(self.server_name_list) if node_id not in contents]
+        return contents, missing_nodes
+
+
+    def sync_node_deltas(self, timings:dict=None) -> tuple[dict,list]:
+        """
+        Sends each activity node the last sequence number received from it. A node only answers with
+        its FM row and start activity value if its sequence number changed since, and always with
+        whether it is an end activity. As each node only updates its own row, the received rows
+        replace the rows of the merged FM. Nodes that do not answer keep their last known data.
+        Returns the merged data like ``merge_node_data`` and the names of the nodes that did not answer.
+        The milliseconds collecting and merging took are added to ``timings``.
+        """
+        timings = timings if timings is not None else {}
+        with self.sync_lock:
+            started = time.perf_counter()
+            params_list = [{'since': int(seq_nmbr)} for seq_nmbr in self.seq_nmbr_vector]
+            contents, missing_nodes = self.collect_from_nodes('/current_data_delta', params_list)
+            timings['collect'] = 1000 * (time.perf_counter() - started)
+
+            started = time.perf_counter()
+
+            for node_id, content in contents.items():
+                delta = decode_node_delta(content)
+                if 'row' in delta:
+                    self.fm[node_id] = delta['row']
+                    self.is_start_vector[node_id] = delta['is_start']
+                    self.seq_nmbr_vector[node_id] = delta['seq_nmbr']
+
+                if delta['is_end_activity']:
+                    self.end_activities.add(node_id)
+                else:
+                    self.end_activities.discard(node_id)
+
+            merged_start_activities = set(k for k, is_start in enumerate(self.is_start_vector) if is_start)
+            # converting FM to a 0/1-matrix
+            merged_fms = self.convert_footprint_matrix(np.column_stack((self.fm, self.seq_nmbr_vector)))
+
+            merged_data = {"start_activities": merged_start_activities, "fm": merged_fms, "end_activities": set(self.end_activities),
+                           "seq_nmbr_vector": self.seq_nmbr_vector.copy()}
+            timings['merge'] = 1000 * (time.perf_counter() - started)
+            return merged_data, missing_nodes
 
 
     def merge_node_data(self, data:list[dict]) -> dict:
@@ -103,216 +247,116 @@ class CentralNode(Bottle):
         {"start_activities": set({int}), "FM": [pred][succ], "end_activities": set({int}})}.
         Unites the start activity sets and the end activity sets.
         Merges the footprint matrices.
-        Returns the merged data.
+        Returns the merged data, including the merged sequence number vector.
         Sequence numbers are not necessary for the synchronous communication case.
         """
+        # stacking the nodes' data, first axis is the node
+        seq_nmbrs = np.stack([np.ravel(el["seq_nmbr_vector"]) for el in data])     # [node][activity]
+        start_activities = np.stack([np.ravel(el["start_activities"]) for el in data])
+        fms = np.stack([el["fm"] for el in data])                                  # [node][pred][succ]
+
+        # for each row the node with the highest sequence number, the first one on ties
+        newest = np.argmax(seq_nmbrs, axis=0)
+        rows = np.arange(seq_nmbrs.shape[1])
+
         # merging start activity sets
-        start_activities_w_seq_nmbrs = [np.column_stack((el["start_activities"],el["seq_nmbr_vector"])) for el in data]
-        merged_start_activities = reduce(self.merge_start_activities, start_activities_w_seq_nmbrs)
-        merged_start_activities = set(k for k,value in enumerate(merged_start_activities) if value[0])
+        merged_start_activities = set(np.flatnonzero(start_activities[newest, rows]).tolist())
 
         # merging end activity sets
         end_activities_list = [el["end_activities"] for el in data]
         merged_end_activities = set(reduce(lambda a,b: a.union(b), end_activities_list))
 
-        # merging the FMs
-        fm_list_w_seq_nmbrs = [np.column_stack((el["fm"], el["seq_nmbr_vector"])) for el in data] # last column is always seq numbers
-        merged_fms = reduce(self.merge_two_matrices, fm_list_w_seq_nmbrs)
+        # merging the FMs, last column is always seq numbers
+        merged_fms = np.column_stack((fms[newest, rows], seq_nmbrs[newest, rows]))
         # converting FM to a 0/1-matrix
         merged_fms = self.convert_footprint_matrix(merged_fms)
 
-        merged_data = {"start_activities": merged_start_activities,"fm": merged_fms, "end_activities": merged_end_activities}
+        merged_data = {"start_activities": merged_start_activities,"fm": merged_fms, "end_activities": merged_end_activities,
+                       "seq_nmbr_vector": seq_nmbrs[newest, rows]}
         return merged_data
 
 
-    def merge_start_activities(self, start_activities_1:np.ndarray, start_activities_2:np.ndarray) -> np.ndarray:
-        """
-        Taking two lists of start activity tuples and returning a merged one with all entries,
-        that correspond to an activity which is only part of one of the lists and additionally
-        the doubled entries, but here only the ones with the higher sequence number.
-
-        update: array have entries of arrays with first the start activity bool and second the sequence number
-        """
-        for k, is_start_w_seq_nmbr_2 in enumerate(start_activities_2):
-
-            kth_seq_nmbr_2 = is_start_w_seq_nmbr_2[1]
-
-            # kth_start_activity_1 = start_activities_1[k][0]
-            kth_seq_nmbr_1 = start_activities_1[k][1]
-
-            if kth_seq_nmbr_1 < kth_seq_nmbr_2:
-                # update
-                start_activities_1[k] = start_activities_2[k]
-        return start_activities_1
-
-
     def convert_footprint_matrix(self, fm:np.ndarray) -> np.ndarray:
         """
         Taking a numpy array where an entry denotes how often a direct succession
         occurred and converting it into an array which denotes whether a direct succession
         occurred.
         More precisely: 0 if the amount was 0, otherwise 1.
+        The last column (sequence numbers) is dropped.
         """
-        new_matrix = np.zeros((fm.shape[0],fm.shape[1]-1),dtype="int")
-        for i, row_and_seq_nmbr in enumerate(fm):
-            for j, el in enumerate(row_and_seq_nmbr):
-                if j != len(row_and_seq_nmbr)-1:
-                    new_matrix[i][j] = 0 if el == 0 else 1
-
-        return new_matrix
-
-
-    def merge_two_matrices(self, matrix_1:np.ndarray, matrix_2:np.ndarray) -> np.ndarray:
-        """
-        Taking two numpy arrays and returning a merged one.
-        Always choosing the entry with the higher sequence number.
-        """
-        for i, row_with_seq_nmbr in enumerate(matrix_1):
-            seq_nmbr_1 = row_with_seq_nmbr[-1]
-
-            row_2 = matrix_2[i]
-            seq_nmbr_2 = matrix_2[i][-1]
-
-            if seq_nmbr_2 > seq_nmbr_1:
-                matrix_1[i] = row_2
-        return matrix_1
+        return (fm[:, :-1] != 0).astype("int")
 
 
-    def calculate_pairs(self, fm):
+    def calculate_pairs(self, fm, changed_activities=None):
         """
         Creating the set of (A,B) pairs to the given direct successions and activities  and returning it.
-        Using causality and choice relations.
+        Using causality and choice relations, stored as one bitmask per activity.
+        The pairs are tuples of bitmasks, the self-loop activities are a bitmask as well.
+        If the bitmask ``changed_activities`` is given, only the pairs containing one of them are computed
+        again, the others are kept from the previous call.
         """
-        causalities = set()     # a > b AND NOT b > a
-        choices = set()         # NOT a > b AND NOT b > a
-        parallels = set()       # a > b AND b > A
-        self_loops = set()      # a > a
-
-        # iterating through the FM and filling up the relation sets
-        for i,_ in enumerate(fm):
-            for j in range(i,len(fm)):
-                if fm[i][j] == 1 and fm[j][i] == 1:
-                    parallels.add((i,j))
-
-                    if i == j:
-                        self_loops.add(i)
-
-                elif fm[i][j] == 0 and fm[j][i] == 0:
-                    choices.add((i,j))
-                    choices.add((j,i))
-
-                elif fm[i][j] == 1:
-                    causalities.add((i,j))
-
-                elif fm[j][i] == 1:
-                    causalities.add((j,i))
+        # causalities: a > b AND NOT b > a, choices: NOT a > b AND NOT b > a,
+        # parallels: a > b AND b > a, self_loops: a > a
+        causalities, choices, parallels, self_loops = get_relations(fm)
 
         print_with_name_instead_of_id(self.server_activity_mapping, causalities, parallels)
 
         # calculating the set of (A,B)-pairs, here p_set
         activities = set(self.activities)
 
+        if PAIR_ENGINE == 'cliques':
+            # only the maximal pairs, the same ones that are left after the first step of minimize_pairs
+            neighbors = get_pair_graph(activities, causalities, choices)
+            if changed_activities is None or self.pair_cliques is None:
+                self.pair_cliques = get_pair_cliques(neighbors)
+            else:
+                self.pair_cliques = update_pair_cliques(self.pair_cliques, neighbors, changed_activities)
+            return drop_self_loop_sides(self.pair_cliques, self_loops), self_loops
+
         set_of_pairs = set()
         activity_subsets = get_all_subsets(activities)
         independent_activity_sets = [subset for subset in activity_subsets if is_independent_set(subset, choices, self_loops)]
 
         for a, b in itertools.product(independent_activity_sets, independent_activity_sets):
             if is_causality_pair(a, b, causalities):
-                set_of_pairs.add((frozenset(a), frozenset(b)))
+                set_of_pairs.add((a, b))
 
         return set_of_pairs, self_loops
 
 
     def minimize_pairs(self, set_of_pairs, self_loops):
         """
-        Takes a (A,B)-pair set and a list of self-loop activities.
+        Takes a (A,B)-pair set and the self-loop activities, all as bitmasks.
         It removes all pairs that are subsets of other pairs and also removes self-loop
         activities from the sets and makes sure the resulting pair is still not a subset.
         """
-        combs = itertools.combinations(set_of_pairs, 2)
-
         # remove subsets of pairs
-        for (p_1, p_2) in combs:
-            if is_subset(p_1,p_2):
-                set_of_pairs.discard(p_1)
-            elif is_subset(p_2,p_1):
-                set_of_pairs.discard(p_2)
+        set_of_pairs = remove_subsumed_pairs(set_of_pairs)
 
         # remove self-loops
         # e.g. if (a,b),(b,c) in a_b_pairs_set, and (b,b) in Parallel, then we need to remove (a,b),(b,c)
         # (a,b) is equal to (a,bb), also b||b, thus a and bb cannot make a pair, only "#" relations can.
-        # to_be_deleted = set()
-
-        for activity in self_loops:
-
-            set_of_pairs_copy = set_of_pairs.copy()
-
-            for (a,b) in set_of_pairs_copy:
-
-                # self loop only in first set
-                if activity in a and activity not in b:
-                    # remove pair from set and self loop from pair
-                    # if still not subset, add to pair set
-                    set_of_pairs.discard((a,b))
-                    a_new = a.difference(frozenset([activity]))
-                    if a_new:
-                        # check if it is subset now
-                        subset = False
-                        fresh_set_of_pairs_copy = set_of_pairs.copy()
-                        for pair in fresh_set_of_pairs_copy:
-                            if is_subset((a_new,b),pair):
-                                subset = True
-                        if not subset:
-                            set_of_pairs.add((a_new,b))
-
-                # self loop only in second set
-                elif activity in b and activity not in a:
-                    # remove pair from set and self loop from pair
-                    # if still not subset, add to pair set
-                    set_of_pairs.discard((a,b))
-                    b_new = b.difference(frozenset([activity]))
-                    if b_new:
-                        # check if it is subset now
-                        subset = False
-                        fresh_set_of_pairs_copy = set_of_pairs.copy()
-                        for pair in fresh_set_of_pairs_copy:
-                            if is_subset((a,b_new),pair):
-                                subset = True
-                        if not subset:
-                            set_of_pairs.add((a,b_new))
-
-                # self loop in both sets
-                elif activity in a and activity in b:
-                    # remove pair from set and self loop from pair
-                    # if still not subset, add to pair set
-                    set_of_pairs.discard((a,b))
-                    a_new = a.difference(frozenset([activity]))
-                    b_new = b.difference(frozenset([activity]))
-                    if b_new and a_new:
-                        # check if it is subset now
-                        subset = False
-                        fresh_set_of_pairs_copy = set_of_pairs.copy()
-                        for pair in fresh_set_of_pairs_copy:
-                            if is_subset((a_new,b_new),pair):
-                                subset = True
-                        if not subset:
-                            set_of_pairs.add((a_new,b_new))
+        # All self-loop activities are removed at once, pairs with an empty set are dropped and
+        # of the remaining ones only those that are no subset of another pair are kept.
+        if self_loops:
+            without_self_loops = ((a & ~self_loops, b & ~self_loops) for (a,b) in set_of_pairs)
+            set_of_pairs = remove_subsumed_pairs(set((a,b) for (a,b) in without_self_loops if a and b))
 
         return set_of_pairs
 
 
     def pair_with_activity_names(self, set_pair):
         """
-        The input parameter a_b_pair is an (A,B) pair with A and B consiting of activity ids.
-        The function returns the same pair but uses activity names instead of ids.
+        The input parameter a_b_pair is an (A,B) pair with A and B being bitmasks of activity ids.
+        The function returns the same pair but uses sets of activity names instead.
         """
         a, b = set_pair
-        a_with_activity_names = set(self.server_activity_mapping[str(x)] for x in a)
-        b_with_activity_names = set(self.server_activity_mapping[str(x)] for x in b)
+        a_with_activity_names = set(self.server_activity_mapping[str(x)] for x in iter_bits(a))
+        b_with_activity_names = set(self.server_activity_mapping[str(x)] for x in iter_bits(b))
         return (a_with_activity_names, b_with_activity_names)
 
 
-    def form_petri_net(self, set_pairs:tuple[set[int],set[int]], start_activities:set[int], end_activities:set[int]) -> tuple[PetriNet,Marking,Marking]:
+    def form_petri_net(self, set_pairs:set[tuple[int,int]], start_activities:set[int], end_activities:set[int]) -> tuple[PetriNet,Marking,Marking]:
         """
         Takes the (A,B)-pair set, the start activity set and the end activity set and
         returns a Petri Net.
@@ -323,46 +367,43 @@ class CentralNode(Bottle):
         # 1 place for each pair in the minimized (A,B)-pair set, 1 place for source, 1 for sink
         source = PetriNet.Place("start")
         sink = PetriNet.Place("end")
-        places = [PetriNet.Place(str(self.pair_with_activity_names(x))) for x in set_pairs]
+        # the label of a place is its pair with activity names, as in the original Alpha Miner
+        places = {x: PetriNet.Place(str(self.pair_with_activity_names(x))) for x in set_pairs}
         # Add places to the petri net
         net.places.add(source)
         net.places.add(sink)
-        for place in places:
+        for place in places.values():
             net.places.add(place)
 
         ## Transitions (for each activity one transition)
-        transitions = [PetriNet.Transition(str(self.server_activity_mapping[str(activity)]), str(self.server_activity_mapping[str(activity)])) for activity in self.activities]
+        transitions = {}
+        for activity in self.activities:
+            activity_name = str(self.server_activity_mapping[str(activity)])
+            transitions[activity] = PetriNet.Transition(activity_name, activity_name)
         # Add them to the petri net
-        for tran in transitions:
+        for tran in transitions.values():
             net.transitions.add(tran)
 
         ## Arcs
         # Add arcs to the petri net: place -> transition and transition -> place
-        for place in places:
+        for (a_set, b_set), place in places.items():
             # incoming arcs
             # 1 arc for each element of the A-set
-            a_b_pair = eval(place.name)
-            a_set = a_b_pair[0]
-            for a in a_set:
-                activity_corr_to_a = find_transition_to_activity_id(transitions, a)
-                petri_utils.add_arc_from_to(activity_corr_to_a, place, net)
+            for a in iter_bits(a_set):
+                petri_utils.add_arc_from_to(transitions[a], place, net)
 
             # outgoing arcs
             # 1 arc for each element of the B-set
-            b_set = a_b_pair[1]
-            for b in b_set:
-                activity_corr_to_b = find_transition_to_activity_id(transitions, activity_name=b)
-                petri_utils.add_arc_from_to(place, activity_corr_to_b, net)
+            for b in iter_bits(b_set):
+                petri_utils.add_arc_from_to(place, transitions[b], net)
 
         # source -> start_activities
         for activity_id in start_activities:
-            tran_corr_to_activity = find_transition_to_activity_id(transitions, self.server_activity_mapping[str(activity_id)])
-            petri_utils.add_arc_from_to(source, tran_corr_to_activity, net)
+            petri_utils.add_arc_from_to(source, transitions[activity_id], net)
 
         # end_activities -> sink
         for activity_id in end_activities:
-            tran_corr_to_activity = find_transition_to_activity_id(transitions, self.server_activity_mapping[str(activity_id)])
-            petri_utils.add_arc_from_to(tran_corr_to_activity, sink, net)
+            petri_utils.add_arc_from_to(transitions[activity_id], sink, net)
 
         ## Tokens
         # create initial nd final markings
@@ -378,16 +419,17 @@ class CentralNode(Bottle):
         return net, initial_marking, final_marking
 
 
-# Sleep a bit to allow logging to be attached
-time.sleep(2)
+if __name__ == '__main__':
+    # Sleep a bit to allow logging to be attached
+    time.sleep(2)
 
-server_list = os.getenv('SERVER_NAME_LIST').split(',') # for direct connection
-server_ip_list = os.getenv('SERVER_IP_LIST').split(',')
-own_id = int(os.getenv('SERVER_ID'))
-own_ip = server_list[own_id]
-server_activity_mapping = literal_eval(os.getenv('SERVER_ACTIVITY_MAPPING'))
+    server_list = os.getenv('SERVER_NAME_LIST').split(',') # for direct connection
+    server_ip_list = os.getenv('SERVER_IP_LIST').split(',')
+    own_id = int(os.getenv('SERVER_ID'))
+    own_ip = server_list[own_id]
+    server_activity_mapping = literal_eval(os.getenv('SERVER_ACTIVITY_MAPPING'))
 
-server = CentralNode(own_id, own_ip, server_list, server_ip_list, server_activity_mapping)
+    server = CentralNode(own_id, own_ip, server_list, server_ip_list, server_activity_mapping)
 
-print(f"#### Starting Central Node {own_ip}")
-httpserver.serve(server, host='0.0.0.0', port=80, threadpool_workers=NUM_THREADS, threadpool_options={"spawn_if_under": NUM_THREADS})
+    print(f"#### Starting Central Node {own_ip}")
+    server.transport.serve(server)
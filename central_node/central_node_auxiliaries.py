@@ -6,77 +6,280 @@
 """
 A collection of auxiliary functions.
 """
-from itertools import chain, combinations, product
+import struct
+import numpy as np
+
+# Binary format of the node data sent by the activity nodes to `/current_data` (all little-endian):
+# header: magic b'EMFP', format version (uint8), flags (uint8, bit 0: end activity), node id (uint16),
+#         n = number of activities (uint32), 4 bytes padding
+# body:   is_start vector (n int64), sequence number vector (n int64), footprint matrix (n*n int64, row-major)
+WIRE_MAGIC = b'EMFP'
+WIRE_VERSION = 1
+WIRE_HEADER = struct.Struct('<4sBBHI4x')
+FLAG_END_ACTIVITY = 1
+
+# Binary format of the incremental node data (`/current_data_delta`):
+# header: like above with magic b'EMRW', flags bit 1 is set if the body is included
+# body:   sequence number of the node's own row (int64), its is_start value (int64), its FM row (n int64)
+DELTA_MAGIC = b'EMRW'
+FLAG_ROW_INCLUDED = 2
+
+
+def decode_node_data(payload):
+    """
+    Decodes the binary node data of an activity node.
+    The arrays are read-only views on ``payload``, nothing is copied.
+    Returns a dict with the keys 'start_activities', 'end_activities', 'seq_nmbr_vector' and 'fm'.
+    """
+    magic, version, flags, node_id, n = WIRE_HEADER.unpack_from(payload)
+    if magic != WIRE_MAGIC or version != WIRE_VERSION:
+        raise ValueError(f"Unknown node data format {magic} version {version}")
+
+    offset = WIRE_HEADER.size
+    start_activities = np.frombuffer(payload, dtype='<i8', count=n, offset=offset).reshape((n,1))
+    offset += 8 * n
+    seq_nmbr_vector = np.frombuffer(payload, dtype='<i8', count=n, offset=offset).reshape((n,1))
+    offset += 8 * n
+    fm = np.frombuffer(payload, dtype='<i8', count=n*n, offset=offset).reshape((n,n))
+
+    return {
+        'start_activities': start_activities,
+        'end_activities': {node_id} if flags & FLAG_END_ACTIVITY else set(),
+        'seq_nmbr_vector': seq_nmbr_vector,
+        'fm': fm
+        }
+
+
+def decode_node_delta(payload):
+    """
+    Decodes the binary incremental node data of an activity node.
+    Returns a dict with the keys 'node_id' and 'is_end_activity' and, if the node's row changed,
+    'seq_nmbr', 'is_start' and 'row' (a read-only view on ``payload``).
+    """
+    magic, version, flags, node_id, n = WIRE_HEADER.unpack_from(payload)
+    if magic != DELTA_MAGIC or version != WIRE_VERSION:
+        raise ValueError(f"Unknown node delta format {magic} version {version}")
+
+    delta = {'node_id': node_id, 'is_end_activity': bool(flags & FLAG_END_ACTIVITY)}
+
+    if flags & FLAG_ROW_INCLUDED:
+        seq_nmbr, is_start = np.frombuffer(payload, dtype='<i8', count=2, offset=WIRE_HEADER.size)
+        delta['seq_nmbr'] = int(seq_nmbr)
+        delta['is_start'] = int(is_start)
+        delta['row'] = np.frombuffer(payload, dtype='<i8', count=n, offset=WIRE_HEADER.size + 16)
+
+    return delta
 
 def print_with_name_instead_of_id(dict_activity_id_to_name, causalities, parallels):
     """
     Printing the causalities and parallelisms in a more human readable way.
     """
     print('\n')
-    for (a,b) in causalities:
-        print(f"{dict_activity_id_to_name[str(a)]} -> {dict_activity_id_to_name[str(b)]}")
-    for (a,b) in parallels:
-        print(f"{dict_activity_id_to_name[str(a)]} || {dict_activity_id_to_name[str(b)]}")
+    for a, successors in enumerate(causalities):
+        for b in iter_bits(successors):
+            print(f"{dict_activity_id_to_name[str(a)]} -> {dict_activity_id_to_name[str(b)]}")
+    for a, parallel_activities in enumerate(parallels):
+        for b in iter_bits(parallel_activities >> a << a):
+            print(f"{dict_activity_id_to_name[str(a)]} || {dict_activity_id_to_name[str(b)]}")
+
+
+def iter_bits(mask):
+    """
+    Returning the positions of the set bits of the integer ``mask``, lowest first.
+    iter_bits(0b1010) --> 1 3
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
 
 
-def find_transition_to_activity_id(transitions, activity_name):
+def to_mask(activities):
     """
-    When creating the petri net, all activities correspond to a transition.
-    The transition object is looked up by checking which name is the same as the activity's.
-    The transition object is returned.
+    Returning the bitmask of a collection of activity ids, bit ``a`` is set for activity ``a``.
+    to_mask([0,3]) --> 0b1001
     """
-    for tran in transitions:
-        if tran.name == activity_name:
-            return tran
+    mask = 0
+    for a in activities:
+        mask |= 1 << a
+    return mask
+
+
+def get_relations(fm):
+    """
+    Takes the 0/1 footprint matrix and returns the relations of the Alpha Miner as one bitmask per activity:
+    ``causalities[a]`` has the bits of all b with a -> b, ``choices[a]`` of all b with a # b (including a itself,
+    if a has no self-loop) and ``parallels[a]`` of all b with a || b. ``self_loops`` is a single bitmask.
+    """
+    fm = np.asarray(fm, dtype=bool)
+    relations = (
+        fm & ~fm.T,     # a > b AND NOT b > a
+        ~fm & ~fm.T,    # NOT a > b AND NOT b > a
+        fm & fm.T       # a > b AND b > a
+        )
+    causalities, choices, parallels = ([to_mask(np.flatnonzero(row).tolist()) for row in relation] for relation in relations)
+    self_loops = to_mask(np.flatnonzero(np.diagonal(fm)).tolist())
+    return causalities, choices, parallels, self_loops
 
 
 def get_all_subsets(activities):
     """
-    Returning all possible non-empty subsets of the activities.
-    get_all_subsets([1,2,3]) --> (1,) (2,) (3,) (1,2) (1,3) (2,3) (1,2,3)
+    Returning all possible non-empty subsets of the activities as bitmasks.
+    get_all_subsets([1,2,3]) --> 0b10 0b100 0b110 0b1000 0b1010 0b1100 0b1110
     """
     activities_list = list(activities)
-    return list(chain.from_iterable(combinations(activities_list, el) for el in range(len(activities_list)+1)))[1:]
+    subsets = [0]
+    for a in activities_list:
+        subsets += [subset | (1 << a) for subset in subsets]
+    return subsets[1:]
 
 
-def is_independent_set(activity_list, choices, self_loops):
+def is_independent_set(activities, choices, self_loops):
     """
-    Takes a list (of activities) ``activity_list`` and a list which includes all choices,
-    meaning there is no correlation between the activity-pairs in ``choices``.
-    If all combinations of elements in ``activity_list`` are in ``choices``, True is returned.
+    Takes a bitmask of activities ``activities`` and the choice bitmasks of all activities,
+    meaning there is no correlation between an activity and the activities in its bitmask.
+    If all pairs of different activities in ``activities`` are choices, True is returned.
+    A single activity is independent if it has no self-loop.
     Otherwise False is returned.
     """
-    if len(activity_list) == 1:
-        if activity_list[0] not in self_loops:
-            return True
-        return False
+    if activities & (activities - 1) == 0:
+        return not activities & self_loops
 
-    pairs = combinations(activity_list, 2)
-    for pair in pairs:
-        if pair not in choices:
+    for a in iter_bits(activities):
+        if activities & ~(1 << a) & ~choices[a]:
             return False
     return True
 
 
 def is_causality_pair(activities_1, activities_2, causalities):
     """
-    Two lists of activities as well as a list of all causality relationsare given.
+    Two bitmasks of activities as well as the causality bitmasks of all activities are given.
     If all pairs of the form ``(a,b)``, where ``a`` is in activities_1 and ``b`` is in
-    ``activities_2``, are in the causality list, True is returned - otherwise False.
+    ``activities_2``, are causalities, True is returned - otherwise False.
     """
-    all_combs = product(activities_1, activities_2)
-    for pair in all_combs:
-        if pair not in causalities:
+    for a in iter_bits(activities_1):
+        if activities_2 & ~causalities[a]:
             return False
     return True
 
 
-def is_subset(a, b):
+def remove_subsumed_pairs(set_of_pairs):
+    """
+    Takes a set of (A,B)-pairs of bitmasks and returns the pairs that are no subset of another pair.
+    The pairs are checked from the largest to the smallest, so a pair can only be a subset of an already
+    kept one. For each activity bit of A and of B, the kept pairs containing it are stored as a bitmask of
+    their indices; a pair is a subset of a kept pair if the AND of the index bitmasks of its bits is non-zero.
+    """
+    n = max((max(a, b).bit_length() for a, b in set_of_pairs), default=0)
+    # index bitmasks of the kept pairs, first n entries for the A-bits, the others for the B-bits
+    containing = [0] * (2 * n)
+
+    kept = []
+    for a, b in sorted(set_of_pairs, key=lambda pair: bin(pair[0]).count("1") + bin(pair[1]).count("1"), reverse=True):
+        supersets = -1     # all kept pairs, the pairs are never empty
+        for i in iter_bits(a):
+            supersets &= containing[i]
+        for i in iter_bits(b):
+            supersets &= containing[n + i]
+        if supersets:
+            continue
+
+        index_bit = 1 << len(kept)
+        for i in iter_bits(a):
+            containing[i] |= index_bit
+        for i in iter_bits(b):
+            containing[n + i] |= index_bit
+        kept.append((a, b))
+
+    return set(kept)
+
+
+def get_maximal_cliques(neighbors, required=(), vertices=None):
+    """
+    Bron-Kerbosch with pivoting on a graph given as a list of neighbor bitmasks
+    (bit ``j`` of ``neighbors[i]`` is set if i and j are adjacent).
+    Yields every maximal clique as a bitmask that has a vertex in each of the ``required`` bitmasks.
+    Branches that cannot reach one of them are not expanded.
+    If the bitmask ``vertices`` is given, only the maximal cliques containing one of these vertices are yielded.
+    """
+    def expand(clique, candidates, excluded):
+        if any(not (clique | candidates) & mask for mask in required):
+            return
+        if not candidates and not excluded:
+            yield clique
+            return
+        # the pivot covers as many candidates as possible, only the others are expanded
+        pivot = max(iter_bits(candidates | excluded), key=lambda u: bin(candidates & neighbors[u]).count("1"))
+        for v in iter_bits(candidates & ~neighbors[pivot]):
+            bit = 1 << v
+            yield from expand(clique | bit, candidates & neighbors[v], excluded & neighbors[v])
+            candidates &= ~bit
+            excluded |= bit
+
+    if vertices is None:
+        yield from expand(0, (1 << len(neighbors)) - 1, 0)
+        return
+
+    # each clique is found starting from the first of the given vertices it contains
+    done = 0
+    for v in iter_bits(vertices):
+        bit = 1 << v
+        yield from expand(bit, neighbors[v] & ~done, neighbors[v] & done)
+        done |= bit
+
+
+def get_pair_graph(activities, causalities, choices):
+    """
+    Every activity is a vertex on the left (A) and on the right side (B) of a graph, activity ``a`` is vertex ``a``
+    on the left and vertex ``n+a`` on the right. Two vertices on the same side are adjacent if their activities are
+    a choice, a left and a right vertex if their activities are a causality.
+    Returns the neighbor bitmasks of the vertices.
+    """
+    n = max(activities) + 1 if activities else 0
+    activities_mask = to_mask(activities)
+
+    neighbors = [0] * (2 * n)
+    for a in activities:
+        others = activities_mask & ~(1 << a)
+        neighbors[a] |= choices[a] & others                 # left - left
+        neighbors[n + a] |= (choices[a] & others) << n      # right - right
+        neighbors[a] |= (causalities[a] & others) << n      # left a - right b
+        for b in iter_bits(causalities[a] & others):
+            neighbors[n + b] |= 1 << a
+    return neighbors
+
+
+def get_pair_cliques(neighbors, changed_activities=None):
+    """
+    Returns the maximal cliques of the pair graph with vertices on both sides as (A,B)-pairs of bitmasks.
+    Cliques with vertices on only one side are not enumerated.
+    If the bitmask ``changed_activities`` is given, only the cliques containing one of them are returned.
+    """
+    n = len(neighbors) // 2
+    left_mask = (1 << n) - 1
+    right_mask = left_mask << n
+    vertices = None if changed_activities is None else changed_activities | (changed_activities << n)
+
+    cliques = get_maximal_cliques(neighbors, required=(left_mask, right_mask), vertices=vertices)
+    return set((clique & left_mask, clique >> n) for clique in cliques)
+
+
+def update_pair_cliques(pair_cliques, neighbors, changed_activities):
+    """
+    Takes the pair cliques of the previous pair graph and the new graph, whose edges only changed between
+    vertices of the ``changed_activities`` (a bitmask). A clique without such a vertex is still a clique, and
+    still maximal, as none of its vertices' edges changed. So only the cliques containing a changed activity
+    are removed and enumerated again.
+    """
+    unchanged = set((a, b) for (a, b) in pair_cliques if not (a | b) & changed_activities)
+    return unchanged | get_pair_cliques(neighbors, changed_activities)
+
+
+def drop_self_loop_sides(pair_cliques, self_loops):
     """
-    The input parameters are pairs (a_0,a_1) and (b_0,b_1).
-    The function returns True if a_0 is a subset of b_0 as well
-    as a_1 of b_1.
+    A side consisting of a single self-loop activity is not independent, the pairs with such a side are dropped.
+    Every pair that contains such a side is only contained in cliques with the same side, so no other pair
+    becomes maximal by this.
     """
-    if set(a[0]).issubset(b[0]) and set(a[1]).issubset(b[1]):
-        return True
-    return False
+    return set((a, b) for (a, b) in pair_cliques
+               if not any(side & (side - 1) == 0 and side & self_loops for side in (a, b)))
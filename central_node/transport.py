@@ -0,0 +1,451 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+A Transport sends the requests of a node to the other nodes and serves the node's app.
+``HttpTransport`` uses blocking requests sessions and a thread per connection,
+``AsyncioTransport`` handles all connections of the node on aiohttp event loops.
+With both, the app's handlers run in the worker pools of ``RequestPools``.
+The module is the same in both node directories, as each one is a separate Docker context;
+tests/test_node_modules.py fails when the copies differ.
+"""
+import asyncio
+import io
+import json as jsonlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import util
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:     # only needed for TRANSPORT=asyncio
+    aiohttp = None
+
+TRANSPORT = os.getenv('TRANSPORT', 'http')     # 'http': blocking requests, 'asyncio': aiohttp
+EVENT_WORKERS = int(os.getenv('EVENT_WORKERS', '8'))        # threads handling requests that contact other nodes
+QUERY_WORKERS = int(os.getenv('QUERY_WORKERS', '32'))       # threads answering all other requests
+MAX_QUEUED_EVENTS = int(os.getenv('MAX_QUEUED_EVENTS', '256'))   # more waiting ones are answered with 503, 0: no limit
+RETRY_AFTER_S = 1
+
+
+def create_transport(max_workers):
+    """
+    Returns the transport selected by ``TRANSPORT``. ``max_workers`` bounds the threads
+    the HTTP transport sends concurrent requests with.
+    """
+    if TRANSPORT == 'http':
+        return HttpTransport(max_workers)
+    if TRANSPORT == 'asyncio':
+        return AsyncioTransport()
+    raise ValueError(f"Unknown transport: {TRANSPORT}")
+
+
+class Transport:
+    """
+    The interface the nodes send their requests with. A request is described by the arguments of
+    ``request``, its result is ``(success, res)``, where ``res`` has ``status_code``, ``content``
+    and ``text`` like a requests response, or is None if the node could not be reached.
+    """
+
+    def __init__(self):
+        self.requests_sent = 0      # for the metrics
+        self.sent_lock = threading.Lock()
+
+
+    def count_sent(self):
+        with self.sent_lock:
+            self.requests_sent += 1
+
+
+    def request(self, srv_ip, URI, req='POST', data=None, params=None, json=None, timeout_s=None):
+        raise NotImplementedError
+
+
+    def request_many(self, calls, timeout_s=None):
+        """
+        Sends the requests given as dicts of ``request`` arguments at once and returns their results in the
+        same order. Requests not answered within ``timeout_s`` (None: no limit) result in ``(False, None)``.
+        The time counts from when a request is sent, not while it waits for a connection or thread.
+        """
+        raise NotImplementedError
+
+
+    def serve(self, app, port=80, host='0.0.0.0', start_loop=True):
+        """
+        Serves ``app``. With ``start_loop=False`` the server is only returned, the caller runs its
+        ``serve_forever`` and stops it with ``shutdown`` and ``server_close``.
+        """
+        raise NotImplementedError
+
+
+    def close(self):
+        """
+        Releases the connections and threads of the transport.
+        """
+
+
+class HttpTransport(Transport):
+    """
+    Sends the requests with the pooled keep-alive sessions of ``util``, concurrent requests with a pool
+    of ``max_workers`` threads (0 or 1: one after another). Serves with ``paste`` like ``util.serve``.
+    """
+
+    def __init__(self, max_workers):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+
+
+    def request(self, srv_ip, URI, req='POST', data=None, params=None, json=None, timeout_s=None):
+        self.count_sent()
+        return util.contact_another_server(srv_ip, URI, req, data=data, params=params, json=json, timeout_s=timeout_s)
+
+
+    def request_many(self, calls, timeout_s=None):
+        # every request ends by its own timeout, a call without one gets ``timeout_s``
+        if timeout_s is not None:
+            calls = [{'timeout_s': timeout_s, **call} for call in calls]
+        if not self.executor:
+            return [self.request(**call) for call in calls]
+
+        futures = [self.executor.submit(self.request, **call) for call in calls]
+        return [future.result() for future in futures]
+
+
+    def serve(self, app, port=80, host='0.0.0.0', start_loop=True):
+        return util.serve(RequestPools(app), port=port, host=host, start_loop=start_loop)
+
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        util.close_sessions()
+
+
+class Response:
+    """
+    A received answer, with the attributes of a requests response the nodes use.
+    """
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+
+class AsyncioTransport(Transport):
+    """
+    Sends the requests with one aiohttp session on an event loop in a background thread, so any number of
+    requests can wait for their answers without holding a thread each. The server accepts the connections
+    on an event loop as well and runs the app's handlers in the pools of ``RequestPools``.
+    """
+
+    def __init__(self):
+        if aiohttp is None:
+            raise ImportError("TRANSPORT=asyncio requires aiohttp")
+        super().__init__()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.session = asyncio.run_coroutine_threadsafe(self.create_session(), self.loop).result()
+
+
+    async def create_session(self):
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=util.HTTP_POOL_SIZE)
+        return aiohttp.ClientSession(connector=connector)
+
+
+    def get_timeout(self, timeout_s):
+        """
+        Converts a timeout given like to ``util.contact_another_server`` into an aiohttp timeout.
+        """
+        if timeout_s is None:
+            timeout_s = (util.HTTP_CONNECT_TIMEOUT_S, util.HTTP_READ_TIMEOUT_S)
+        if not isinstance(timeout_s, tuple):
+            # like requests: the limit for connecting and for each read, not for waiting for a connection
+            timeout_s = (timeout_s, timeout_s)
+        return aiohttp.ClientTimeout(total=None, sock_connect=timeout_s[0], sock_read=timeout_s[1])
+
+
+    async def send(self, srv_ip, URI, req='POST', data=None, params=None, json=None, timeout_s=None):
+        self.count_sent()
+        try:
+            url = f"http://{srv_ip}{URI}"
+            timeout = self.get_timeout(timeout_s)
+            if 'POST' in req:
+                # We handle data string as json for now
+                headers = {'Content-type': 'application/json', 'Accept': 'application/json'}
+                if json is not None:
+                    data = jsonlib.dumps(json)
+                request = self.session.post(url, data=data, headers=headers, timeout=timeout)
+            else:
+                headers = {'Accept': 'application/json'}
+                params = {key: str(value) for key, value in (params or {}).items()}
+                request = self.session.get(url, params=params, headers=headers, timeout=timeout)
+
+            async with request as res:
+                response = Response(res.status, await res.read())
+            return response.status_code == 200, response
+
+        except Exception as e:
+            print("[ERROR] " + (str(e) or type(e).__name__))
+            return False, None
+
+
+    async def send_many(self, calls, timeout_s):
+        # every request ends by its own timeout, a call without one gets ``timeout_s``
+        if timeout_s is not None:
+            calls = [{'timeout_s': timeout_s, **call} for call in calls]
+        return await asyncio.gather(*(self.send(**call) for call in calls))
+
+
+    def request(self, srv_ip, URI, req='POST', data=None, params=None, json=None, timeout_s=None):
+        return asyncio.run_coroutine_threadsafe(
+            self.send(srv_ip, URI, req, data=data, params=params, json=json, timeout_s=timeout_s), self.loop).result()
+
+
+    def request_many(self, calls, timeout_s=None):
+        return asyncio.run_coroutine_threadsafe(self.send_many(calls, timeout_s), self.loop).result()
+
+
+    def serve(self, app, port=80, host='0.0.0.0', start_loop=True):
+        server = AsyncioServer(app, host, port)
+        if start_loop:
+            print(f"serving on {host}:{port}")
+            server.serve_forever()
+        return server
+
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class AsyncioServer:
+    """
+    Serves a WSGI app with aiohttp. The connections are handled on the event loop of ``serve_forever``,
+    only the app itself runs in the worker threads.
+    """
+
+    def __init__(self, app, host, port):
+        self.pools = RequestPools(app)
+        self.host = host
+        self.port = port
+        self.loop = None
+
+
+    def serve_forever(self):
+        self.loop = asyncio.new_event_loop()
+        web_app = web.Application(client_max_size=1024 ** 3)
+        web_app.router.add_route('*', '/{path:.*}', self.handle)
+        runner = web.AppRunner(web_app, access_log=None)
+        self.loop.run_until_complete(runner.setup())
+        self.loop.run_until_complete(web.TCPSite(runner, self.host, self.port).start())
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(runner.cleanup())
+            self.loop.close()
+
+
+    def shutdown(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+    def server_close(self):
+        self.pools.close()
+
+
+    async def handle(self, request):
+        body = await request.read()
+        environ = make_environ(request.method, request.path, request.query_string, body,
+                               request.headers.get('Content-Type', ''), request.headers.items(), self.host, self.port,
+                               f"HTTP/{request.version.major}.{request.version.minor}")
+
+        status, headers, content = await asyncio.wrap_future(self.pools.handle(environ))
+
+        # aiohttp sets the length and the connection header itself
+        headers = [(key, value) for key, value in headers if key.lower() not in ('content-length', 'connection')]
+        return web.Response(status=int(status.split()[0]), headers=headers, body=content)
+
+
+def make_environ(method, path, query_string, body, content_type, headers, host, port, protocol='HTTP/1.1'):
+    """
+    Returns the WSGI environment of a request with the given ``body`` (bytes) and ``headers``
+    (pairs of name and value, the content type and length are taken from ``content_type`` and ``body``).
+    """
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': host,
+        'SERVER_PORT': str(port),
+        'SERVER_PROTOCOL': protocol,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        }
+    for key, value in headers:
+        key = key.upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ['HTTP_' + key] = value
+    return environ
+
+
+def call_wsgi_app(app, environ):
+    """
+    Runs the WSGI app for one request and returns its status line, headers and body.
+    """
+    answer = {}
+    def start_response(status, response_headers, exc_info=None):
+        answer['status'] = status
+        answer['headers'] = response_headers
+
+    result = app(environ, start_response)
+    try:
+        content = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return answer['status'], answer['headers'], content
+
+
+class WorkerPool:
+    """
+    A pool of ``workers`` threads running the handlers of one kind of request, with metrics about its queue.
+    If ``max_queued`` requests are already waiting (0: no limit), new ones are rejected.
+    """
+
+    def __init__(self, name, workers, max_queued):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}_worker")
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait_s = 0.0
+
+
+    def submit(self, fn, *args):
+        """
+        Returns the future of ``fn(*args)``, or None if the request was rejected.
+        """
+        with self.lock:
+            if self.max_queued and self.queued >= self.max_queued:
+                self.rejected += 1
+                return None
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        return self.executor.submit(self.run, time.monotonic(), fn, *args)
+
+
+    def run(self, submitted, fn, *args):
+        with self.lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait_s += time.monotonic() - submitted
+        try:
+            return fn(*args)
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.completed += 1
+
+
+    def get_metrics(self):
+        with self.lock:
+            started = self.completed + self.active
+            return {
+                'workers': self.workers,
+                'active': self.active,
+                'queue_depth': self.queued,
+                'max_queue_depth': self.max_queue_depth,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'mean_wait_ms': 1000 * self.total_wait_s / started if started else 0.0
+                }
+
+
+class RequestPools:
+    """
+    WSGI app running ``app`` in two separate worker pools. Requests to the app's ``outbound_routes``
+    contact other nodes while they are handled and run in the event pool of ``EVENT_WORKERS`` threads.
+    All other requests only answer from the node's own data and run in the query pool of ``QUERY_WORKERS``
+    threads, so they never wait for a thread held by a request that waits for them.
+    Only the event pool is bounded: above ``MAX_QUEUED_EVENTS`` waiting requests it answers 503 with
+    ``Retry-After``. ``/metrics`` is answered directly with the metrics of both pools and the number of
+    requests the app's transport sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.outbound_routes = set(getattr(app, 'outbound_routes', ()))
+        self.event_pool = WorkerPool('event', EVENT_WORKERS, MAX_QUEUED_EVENTS)
+        self.query_pool = WorkerPool('query', QUERY_WORKERS, 0)
+
+
+    def __call__(self, environ, start_response):
+        status, headers, content = self.handle(environ).result()
+        start_response(status, headers)
+        return [content]
+
+
+    def handle(self, environ):
+        """
+        Returns the future of the answer to a request as status line, headers and body.
+        """
+        path = environ.get('PATH_INFO', '')
+        if path == '/metrics':
+            return self.answer('200 OK', [('Content-Type', 'application/json')], jsonlib.dumps(self.get_metrics()).encode('utf-8'))
+
+        pool = self.event_pool if path in self.outbound_routes else self.query_pool
+        future = pool.submit(self.call_app, environ)
+        if future is None:
+            return self.answer('503 Service Unavailable', [('Retry-After', str(RETRY_AFTER_S))], b'')
+        return future
+
+
+    def answer(self, status, headers, content):
+        future = Future()
+        future.set_result((status, headers, content))
+        return future
+
+
+    def get_metrics(self):
+        metrics = {'event_pool': self.event_pool.get_metrics(), 'query_pool': self.query_pool.get_metrics()}
+        transport = getattr(self.app, 'transport', None)
+        if transport is not None:
+            metrics['requests_sent'] = transport.requests_sent
+        return metrics
+
+
+    def call_app(self, environ):
+        return call_wsgi_app(self.app, environ)
+
+
+    def close(self):
+        self.event_pool.executor.shutdown(wait=False)
+        self.query_pool.executor.shutdown(wait=False)
@@ -4,20 +4,89 @@
 # LICENSE file in the root directory of this source tree.
 
 
+import os
+import socket
+import threading
+
 import requests
+from paste import httpserver
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '4'))                   # kept-alive connections per peer
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv('HTTP_CONNECT_TIMEOUT_S', '1'))
+HTTP_READ_TIMEOUT_S = float(os.getenv('HTTP_READ_TIMEOUT_S', '5')) or None  # 0: no limit, a hung node then blocks the caller
+HTTP_IDLE_TIMEOUT_S = int(os.getenv('HTTP_IDLE_TIMEOUT_S', '60'))          # server side: close idle kept-alive connections
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(srv_ip):
+    """
+    Returns the keep-alive session used for all requests to the given peer.
+    The session is created on first use with a connection pool of ``HTTP_POOL_SIZE``.
+    """
+    session = _sessions.get(srv_ip)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(srv_ip)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount('http://', adapter)
+                _sessions[srv_ip] = session
+    return session
+
+
+def close_sessions():
+    """
+    Closes all peer sessions and their pooled connections.
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
 
-def contact_another_server(srv_ip, URI, req='POST', data=None, timeout_s=1):
+
+class KeepAliveHandler(httpserver.WSGIHandler):
+    """
+    Request handler for ``paste.httpserver`` answering on kept-alive connections without delay.
+    Nagle's algorithm is disabled, otherwise small answers wait for the peer's delayed ACK.
+    """
+
+    def setup(self):
+        httpserver.WSGIHandler.setup(self)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def serve(app, port=80, host='0.0.0.0', start_loop=True):
+    """
+    Serves ``app`` with HTTP/1.1, so the peers' sessions can reuse their connections.
+    Every connection is handled by its own thread, idle connections are closed after ``HTTP_IDLE_TIMEOUT_S``.
+    Up to 1024 connection attempts can wait to be accepted, so bursts of new connections are not reset.
+    With ``start_loop=False`` the server is only returned, the caller runs its ``serve_forever``.
+    """
+    return httpserver.serve(app, host=host, port=port, handler=KeepAliveHandler, protocol_version='HTTP/1.1',
+                            use_threadpool=False, daemon_threads=True, socket_timeout=HTTP_IDLE_TIMEOUT_S,
+                            request_queue_size=1024, start_loop=start_loop)
+
+
+def contact_another_server(srv_ip, URI, req='POST', data=None, params=None, json=None, timeout_s=None):
     # Try to contact another serverthrough a POST or GET
     # usage: server.contact_another_server("10.1.1.1", "/index", "POST", data)
+    # timeout_s defaults to (HTTP_CONNECT_TIMEOUT_S, HTTP_READ_TIMEOUT_S)
     success = False
+    if timeout_s is None:
+        timeout_s = (HTTP_CONNECT_TIMEOUT_S, HTTP_READ_TIMEOUT_S)
     try:
+        session = get_session(srv_ip)
         if 'POST' in req:
             # We handle data string as json for now
             headers = {'Content-type': 'application/json', 'Accept': 'application/json'}
-            res = requests.post('http://{}{}'.format(srv_ip, URI), data=data, headers=headers, timeout=timeout_s)
+            res = session.post('http://{}{}'.format(srv_ip, URI), data=data, json=json, headers=headers, timeout=timeout_s)
         elif 'GET' in req:
             headers = {'Accept': 'application/json'}
-            res = requests.get(f"http://{srv_ip}{URI}", headers=headers)
+            res = session.get(f"http://{srv_ip}{URI}", headers=headers, params=params, timeout=timeout_s)
             # result can be accessed res.json()
         if res.status_code == 200:
             success = True
@@ -27,4 +96,3 @@ def contact_another_server(srv_ip, URI, req='POST', data=None, timeout_s=1):
         res = None
 
     return (success, res)
-
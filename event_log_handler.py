@@ -5,22 +5,44 @@
 
 import json
 import os
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
+import pandas as pd
 import requests
 from dotenv import load_dotenv
 from pm4py.objects.petri_net.importer import importer as pnml_importer
 
 from alpha_miner_original import run_original_alpha_miner
-from auxiliaries.event_log_adjuster import no_doubled_timestamps
-from auxiliaries.file_reader import read_event_log
+from auxiliaries.log_cache import preprocess_event_log, read_cached_event_log
+from auxiliaries.stream_reader import read_activities, stream_event_log
 from equality_check import equality_check
+from replay_scheduler import ReplayScheduler
 
 load_dotenv()
 BASE_SERVER_PORT = int(os.getenv('BASE_SERVER_PORT'))
 DOCKER_LABEL = str(os.getenv('DOCKER_LABEL'))
+NOTIFY_CASE_CLOSED = os.getenv('NOTIFY_CASE_CLOSED', '0') == '1'
+STREAM_LOG = os.getenv('STREAM_LOG', '0') == '1'                  # read the log in chunks instead of loading it
+LOG_CHUNK_SIZE = int(os.getenv('LOG_CHUNK_SIZE', '100000'))       # events per chunk when streaming
+LOG_CACHE_DIR = os.getenv('LOG_CACHE_DIR', '')                      # if set: keep the preprocessed log there
 IP_NO_PORT = 'http://127.0.0.1:'
 
+# An activity node answers an event within the time of its predecessor queries, one request to the chosen
+# predecessor and the handling itself. Waiting that long lets a node reject the event with 503 instead.
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv('HTTP_CONNECT_TIMEOUT_S', '1'))
+HTTP_READ_TIMEOUT_S = float(os.getenv('HTTP_READ_TIMEOUT_S', '5'))
+PREDECESSOR_QUERY_TIMEOUT_S = float(os.getenv('PREDECESSOR_QUERY_TIMEOUT_S', '10'))
+if HTTP_READ_TIMEOUT_S > 0 and PREDECESSOR_QUERY_TIMEOUT_S > 0:
+    TRIGGER_TIMEOUT_S = PREDECESSOR_QUERY_TIMEOUT_S + HTTP_CONNECT_TIMEOUT_S + HTTP_READ_TIMEOUT_S + 5
+else:
+    TRIGGER_TIMEOUT_S = None    # the nodes may wait for each other without limit
+# how often an event is triggered before the remaining events of its case are skipped, and the pause in between
+TRIGGER_ATTEMPTS = int(os.getenv('TRIGGER_ATTEMPTS', '3'))
+TRIGGER_RETRY_DELAY_S = 1
+
 
 
 class EventLogHandler:
@@ -28,20 +50,40 @@ class EventLogHandler:
     The ``EventLogHandler`` keeps track of all event log related.
     """
 
-    def __init__(self):
-        file_path = str(os.getenv('FILE_PATH'))
-        self.output_file_name = os.path.splitext(os.path.basename(file_path))[0]
-
-        self.event_log_df = read_event_log(file_path)
-        self.event_log_df = self.event_log_df.filter(items=["case:concept:name", "concept:name", "time:timestamp"]) # Caution: filter changes order
-        self.event_log_df = self.event_log_df.sort_values(["case:concept:name","time:timestamp"])
-        self.event_log_df = no_doubled_timestamps(self.event_log_df)
-
-        self.num_events = self.event_log_df.shape[0] # number of rows in dataframe
+    def __init__(self, session=None):
+        # requests are sent with ``session`` (anything with the ``get`` and ``post`` of requests), default HTTP
+        self.session = session if session is not None else requests
+        self.file_path = str(os.getenv('FILE_PATH'))
+        self.output_file_name = os.path.splitext(os.path.basename(self.file_path))[0]
+
+        if STREAM_LOG:
+            # The log is never loaded as a whole, the events are read lazily in chunks
+            self.event_log_df = None
+            self.event_chunks = stream_event_log(self.file_path, LOG_CHUNK_SIZE)
+        else:
+            if LOG_CACHE_DIR:
+                self.event_log_df = read_cached_event_log(self.file_path, LOG_CACHE_DIR)
+            else:
+                self.event_log_df = preprocess_event_log(self.file_path)
+            self.event_chunks = iter([self.event_log_df])
+
+        # events of the current chunk that were not triggered yet start at buffer_pos
+        self.buffer = None
+        self.buffer_pos = 0
+        # positions among the pending events that a failed call of trigger_next_events already got handled
+        self.handled_pending = set()
 
         self.current_event = 0
+        self.current_event_lock = threading.Lock()
+        # sequential replay: failed attempts of the next event, the case that is skipped and the skipped events
+        self.failed_attempts = 0
+        self.failed_case = None
+        self.errors = 0
         self.server_id_to_activity_name_mapping, self.activity_name_to_server_id_mapping = self.compute_activities_and_mapping()
 
+        # sends the notifications about closed cases to all activity nodes at once
+        self.close_executor = ThreadPoolExecutor(max_workers=min(32, max(1, self.get_activity_count())), thread_name_prefix="close_cases")
+
         # Set up file to count queried nodes for each event
         with open(f"outputs/{self.output_file_name}_opt.csv" ,"w", encoding="utf-8") as f:
             f.write("case:concept:name;concept:name;time:timestamp;requested_nodes\n")
@@ -72,7 +114,10 @@ class EventLogHandler:
         """
         Computes a mapping from server IDs to activity names and the other way around.
         """
-        activities_in_traces = set(row["concept:name"] for _,row in self.event_log_df.iterrows())
+        if self.event_log_df is not None:
+            activities_in_traces = set(self.event_log_df["concept:name"].unique())
+        else:
+            activities_in_traces = set(read_activities(self.file_path, LOG_CHUNK_SIZE))
         mapping_1 = {}
         mapping_2 = {}
         for i, activity_name in enumerate(activities_in_traces):
@@ -81,47 +126,284 @@ class EventLogHandler:
         return mapping_1, mapping_2
 
 
+    def send(self, method, url, **kwargs):
+        """
+        Sends a request to a node. A node that is busy answers with 503, then the request is
+        sent again after the node's ``Retry-After``.
+        """
+        while True:
+            res = getattr(self.session, method)(url, **kwargs)
+            if res.status_code != 503:
+                return res
+            time.sleep(float(res.headers.get('Retry-After', 1)))
+
+
+    def request_process_model(self):
+        """
+        Requests the process model from the central node and compares it to the output of the original miner.
+        Returns whether both are equal, None if they were not compared.
+        """
+        print("Requesting process model")
+        res = self.send("get", f"{IP_NO_PORT}{BASE_SERVER_PORT + self.get_activity_count()}/process_model", data=None, timeout=5)
+        response_content = res.text
+
+        if response_content:
+            response_content = json.loads(response_content)
+            response_content['net'] = response_content['net'].encode("utf-8")
+
+            net_1 = pnml_importer.deserialize(response_content['net'])
+            print(f"\nEdgeAlpha \n{net_1[0]}")
+
+            if self.event_log_df is None:
+                print("The event log was streamed, the model is not compared to the original miner")
+                return None
+
+            # Compare output to original miner
+            net_2 = run_original_alpha_miner(self.event_log_df)
+            is_equal = equality_check(net_1,net_2)
+            equality = ">>> Equal <<<" if is_equal else "\n\n>>> Not equal <<<"
+            print(equality)
+            return is_equal
+        return None
+
+
+    def peek_events(self, max_events):
+        """
+        Returns the next up to ``max_events`` events that were not triggered yet as a dataframe,
+        and the case id of the event after them (None if there is none).
+        The events stay pending until they are consumed with ``consume_events`` after they were handled,
+        so events that failed are returned again by the next call.
+        New chunks of the event log are only read when the buffered events do not suffice.
+        """
+        while self.buffer is None or self.buffer.shape[0] - self.buffer_pos <= max_events:
+            chunk = next(self.event_chunks, None)
+            if chunk is None:
+                break
+            if self.buffer is None or self.buffer_pos == self.buffer.shape[0]:
+                self.buffer = chunk
+            else:
+                self.buffer = pd.concat([self.buffer.iloc[self.buffer_pos:], chunk])
+            self.buffer_pos = 0
+
+        if self.buffer is None:
+            return pd.DataFrame(columns=["case:concept:name", "concept:name", "time:timestamp"]), None
+
+        window = self.buffer.iloc[self.buffer_pos:self.buffer_pos + max_events]
+        end = self.buffer_pos + window.shape[0]
+
+        next_case_id = None
+        if end < self.buffer.shape[0]:
+            next_case_id = self.buffer.iloc[end]["case:concept:name"]
+        return window, next_case_id
+
+
+    def consume_events(self, count):
+        """
+        Marks the next ``count`` pending events as triggered.
+        """
+        self.buffer_pos += count
+        self.handled_pending = set()
+
+
     def trigger_next_event(self):
         """
         Triggers the next event of the event log by sending a HTTP request to the corresponding activity node.
+        If the node does not handle the event, it is triggered again by the next call, up to ``TRIGGER_ATTEMPTS``
+        times. Then, or right away if the node did not answer in time and may still handle it, the event and the
+        remaining events of its case are skipped and counted as errors, like ``ReplayScheduler`` does.
         """
         try:
+            window, next_case_id = self.peek_events(1)
+
             # Request process model from central node if there is no event left
-            if self.current_event == self.num_events:
+            if window.empty:
+                if self.errors:
+                    print(f"[EVENTLOG HANDLER ERROR] {self.errors} events were skipped")
+                self.request_process_model()
+                return True
 
-                print("Requesting process model")
-                res = requests.get(f"{IP_NO_PORT}{BASE_SERVER_PORT + self.get_activity_count()}/process_model", data=None, timeout=5)
-                response_content = res.text
+            # Read the next event and trigger it, it is only consumed once the node handled it
+            row = window.iloc[0]
+            case_id = row["case:concept:name"]
+            if case_id != self.failed_case:
+                try:
+                    self.send_event(case_id, row["concept:name"], row["time:timestamp"])
+                except Exception as e:
+                    self.failed_attempts += 1
+                    if self.failed_attempts < TRIGGER_ATTEMPTS and not isinstance(e, requests.exceptions.ReadTimeout):
+                        raise
+                    print("[EVENTLOG HANDLER ERROR] " + str(e))
+                    print(f"[EVENTLOG HANDLER ERROR] Skipping the remaining events of case {case_id}")
+                    self.failed_case = case_id
+
+            self.failed_attempts = 0
+            self.consume_events(1)
+
+            if case_id == self.failed_case:
+                self.errors += 1
+            else:
+                with self.current_event_lock:
+                    self.current_event += 1
+
+            # the log is ordered by case id, the events of a case follow each other
+            if next_case_id != case_id:
+                if case_id == self.failed_case:
+                    self.failed_case = None
+                if NOTIFY_CASE_CLOSED:
+                    self.close_cases([case_id])
 
-                if response_content:
-                    response_content = json.loads(response_content)
-                    response_content['net'] = response_content['net'].encode("utf-8")
+            return False
+
+        except Exception as e:
+            print("[EVENTLOG HANDLER ERROR] " + str(e))
+            print(traceback.format_exc())
+            time.sleep(TRIGGER_RETRY_DELAY_S)
 
-                    net_1 = pnml_importer.deserialize(response_content['net'])
-                    print(f"\nEdgeAlpha \n{net_1[0]}")
 
-                    # Compare output to original miner
-                    net_2 = run_original_alpha_miner(self.event_log_df)
-                    equality = ">>> Equal <<<" if equality_check(net_1,net_2) else "\n\n>>> Not equal <<<"
-                    print(equality)
+    def trigger_event(self, case_id, activity_name, timestamp, is_last):
+        """
+        Triggers an event by sending the event data to the corresponding activity node and returns after
+        the node handled it. ``is_last`` tells whether it is the last event of its case.
+        """
+        self.send_event(case_id, activity_name, timestamp)
+
+        with self.current_event_lock:
+            self.current_event += 1
+
+        # Tell the activity nodes when the last event of a case was triggered
+        if NOTIFY_CASE_CLOSED and is_last:
+            self.close_cases([case_id])
+
+
+    def send_event(self, case_id, activity_name, timestamp):
+        """
+        Sends the event data to the corresponding activity node. Raises if the node did not handle the event.
+        """
+        activity = self.activity_name_to_server_id_mapping[activity_name]
+        data = {'activity_id': int(activity), "case_id": str(case_id), "timestamp": timestamp}
+        print(f"Triggering event   {data}      activity name  {activity_name}")
+
+        res = self.send("post", IP_NO_PORT + f"{BASE_SERVER_PORT + int(activity)}/trigger_event", data=data, timeout=TRIGGER_TIMEOUT_S)
+        if res.status_code != 200:
+            raise RuntimeError(f"Activity node {activity} failed to handle the event {data}: {res.status_code}")
+
+
+    def replay(self, workers, rate=0.0, time_scale=0.0):
+        """
+        Triggers all remaining events with a ``ReplayScheduler``: the cases are replayed concurrently by
+        ``workers`` threads, the events of a case one after another. Then the process model is requested.
+        Returns the metrics of the replay.
+        A streamed log is ordered by case id, each chunk spans the whole time of the log, so it cannot be
+        replayed at the times of its timestamps.
+        """
+        if STREAM_LOG and time_scale > 0:
+            raise ValueError("REPLAY_TIME_SCALE cannot be used with STREAM_LOG")
+
+        scheduler = ReplayScheduler(self.trigger_event, workers, rate, time_scale)
+        metrics = scheduler.run(self.iter_remaining_chunks())
+        print(f"Replayed {metrics['events']} events in {metrics['duration_s']:.2f}s ({metrics['events_per_s']:.1f} events/s), "
+              f"latency p50 {metrics['latency_p50_ms']:.1f}ms p99 {metrics['latency_p99_ms']:.1f}ms, "
+              f"max lag {metrics['max_lag_ms']:.1f}ms, {metrics['errors']} errors")
+
+        self.request_process_model()
+        return metrics
+
+
+    def iter_remaining_chunks(self):
+        """
+        Yields the events that were not triggered yet in chunks, starting with the rest of the buffer.
+        """
+        if self.buffer is not None and self.buffer_pos < self.buffer.shape[0]:
+            yield self.buffer.iloc[self.buffer_pos:]
+        self.buffer = None
+        self.buffer_pos = 0
+        yield from self.event_chunks
+
+
+    def trigger_next_events(self, max_events):
+        """
+        Triggers up to ``max_events`` next events of the event log with as few HTTP requests as possible.
+        The events are split into waves: wave k holds the k-th event of every case in this part of the log.
+        Within a wave all events of the same activity node are sent in one request to ``/trigger_events``.
+        A wave is only sent after the previous one was handled, so the per-case order is kept.
+        If a batch fails, the events stay pending and the next call triggers the ones that were not handled yet.
+        """
+        try:
+            window, next_case_id = self.peek_events(max_events)
+
+            # Request process model from central node if there is no event left
+            if window.empty:
+                self.request_process_model()
                 return True
 
-            # Read the next event
-            row = self.event_log_df.iloc[self.current_event]
-            activity = self.activity_name_to_server_id_mapping[row["concept:name"]]
-            case_id = row["case:concept:name"]
-            timestamp = row["time:timestamp"]
+            window = window.reset_index(drop=True)
+            waves = window.groupby("case:concept:name", sort=False).cumcount()
 
-            # Trigger event by sending the event data to the corresponding activity node
-            data = {'activity_id': int(activity), "case_id": str(case_id), "timestamp": timestamp}
-            print(f"Triggering event   {data}      activity name  {row['concept:name']}")
+            for wave in range(waves.max() + 1):
 
-            requests.post(IP_NO_PORT + f"{BASE_SERVER_PORT + int(activity)}/trigger_event", data=data, timeout=5)
+                # Collect the events of this wave per activity node, keeping the order of the log
+                batches = {}
+                for position, row in window[waves == wave].iterrows():
+                    if position in self.handled_pending:
+                        continue
+                    activity = self.activity_name_to_server_id_mapping[row["concept:name"]]
+                    event = {'activity_id': int(activity), "case_id": str(row["case:concept:name"]), "timestamp": str(row["time:timestamp"])}
+                    batches.setdefault(activity, []).append((position, event))
 
-            self.current_event += 1
+                for activity, events in batches.items():
+                    self.send_batch(activity, events)
+
+            self.consume_events(window.shape[0])
+            with self.current_event_lock:
+                self.current_event += window.shape[0]
+
+            # Tell the activity nodes about all cases of the window that do not continue in the next one
+            if NOTIFY_CASE_CLOSED:
+                finished_cases = set(window["case:concept:name"])
+                finished_cases.discard(next_case_id)
+                self.close_cases(finished_cases)
 
             return False
 
         except Exception as e:
             print("[EVENTLOG HANDLER ERROR] " + str(e))
             print(traceback.format_exc())
+
+
+    def send_batch(self, activity, events):
+        """
+        Sends the given ``(position, event)`` pairs to ``/trigger_events`` of an activity node and records the
+        positions of the handled events in ``handled_pending``. A node that could not handle all events answers
+        with 503 and the number of events it handled, then only the remaining ones are sent again after the
+        node's ``Retry-After``.
+        """
+        url = IP_NO_PORT + f"{BASE_SERVER_PORT + int(activity)}/trigger_events"
+        while events:
+            print(f"Triggering {len(events)} events at activity node {activity}")
+            res = self.session.post(url, json={'events': [event for _, event in events]},
+                                    timeout=TRIGGER_TIMEOUT_S and TRIGGER_TIMEOUT_S * len(events))
+            if res.status_code == 200:
+                handled = len(events)
+            elif res.status_code == 503:
+                handled = res.json()['handled_events'] if res.content else 0
+            else:
+                raise RuntimeError(f"Activity node {activity} failed to handle a batch of {len(events)} events: {res.status_code}")
+
+            self.handled_pending.update(position for position, _ in events[:handled])
+            events = events[handled:]
+            if events:
+                time.sleep(float(res.headers.get('Retry-After', 1)))
+
+
+    def close_cases(self, case_ids):
+        """
+        Informs all activity nodes that the given cases are finished, so they can remove their data.
+        Every node gets one request to ``/close_cases`` with all cases, the nodes are informed in parallel.
+        """
+        case_ids = [str(case_id) for case_id in case_ids]
+        if not case_ids:
+            return
+
+        send_to_node = lambda activity: self.send("post", IP_NO_PORT + f"{BASE_SERVER_PORT + activity}/close_cases",
+                                                  json={'case_ids': case_ids}, timeout=5)
+        list(self.close_executor.map(send_to_node, range(self.get_activity_count())))
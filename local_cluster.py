@@ -0,0 +1,286 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+LocalCluster runs the activity nodes and the central node in this process instead of Docker containers.
+The nodes either call each other directly (``direct``) or are served on loopback ports (``http``).
+"""
+import importlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+
+from bottle import request, response
+from requests.structures import CaseInsensitiveDict
+
+BASE_SERVER_PORT = int(os.getenv('BASE_SERVER_PORT', '9000'))   # also imported by tests and benchmark.py without a .env
+DOCKER_LABEL = str(os.getenv('DOCKER_LABEL'))
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ACTIVITY_NODE_DIR = os.path.join(REPO_DIR, 'activity_node')
+CENTRAL_NODE_DIR = os.path.join(REPO_DIR, 'central_node')
+
+
+def import_node_modules(directory, *module_names):
+    """
+    Imports the given modules of a node directory and returns them.
+    The node directories are separate Docker contexts that both have a module ``util``, so their modules are
+    removed from ``sys.modules`` again afterwards. The returned modules keep their references to each other.
+    """
+    local_names = {os.path.splitext(entry)[0] for entry in os.listdir(directory)
+                   if entry.endswith('.py') or os.path.isdir(os.path.join(directory, entry))}
+    is_local = lambda name: name.split('.')[0] in local_names
+
+    hidden = {name: sys.modules.pop(name) for name in list(sys.modules) if is_local(name)}
+    sys.path.insert(0, directory)
+    try:
+        return [importlib.import_module(name) for name in module_names]
+    finally:
+        sys.path.remove(directory)
+        for name in list(sys.modules):
+            if is_local(name):
+                del sys.modules[name]
+        sys.modules.update(hidden)
+
+
+# the WSGI helpers of the nodes' servers, the copy in the central node directory is the same
+transport, = import_node_modules(ACTIVITY_NODE_DIR, 'transport')
+
+
+class LocalResponse:
+    """
+    The answer of a node to a request of the ``DirectTransport``, with the attributes of a requests response
+    the callers use.
+    """
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class DirectTransport:
+    """
+    Delivers requests by calling the WSGI app of the receiving node in the calling thread.
+    Used by the nodes as their transport (see ``transport.Transport``) and by the ``EventLogHandler`` as session.
+    """
+
+    def __init__(self):
+        self.apps_by_name = {}
+        self.apps_by_port = {}
+        self.requests_sent = 0      # requests between the nodes, for the metrics
+        self.sent_lock = threading.Lock()
+
+
+    def add_node(self, name, port, app):
+        self.apps_by_name[name] = app
+        self.apps_by_port[port] = app
+
+
+    def request(self, srv_ip, URI, req='POST', data=None, params=None, json=None, timeout_s=None):
+        """
+        Returns ``(success, res)`` like ``util.contact_another_server``. Timeouts are not applied.
+        """
+        with self.sent_lock:
+            self.requests_sent += 1
+        try:
+            method = 'POST' if 'POST' in req else 'GET'
+            res = self.call_app(self.apps_by_name[srv_ip], method, URI, data=data, params=params, json=json)
+            return res.status_code == 200, res
+        except Exception as e:
+            print("[ERROR] " + str(e))
+            return False, None
+
+
+    def request_many(self, calls, timeout_s=None):
+        """
+        The requests are answered one after another, each one is handled completely when it returns.
+        """
+        return [self.request(**call) for call in calls]
+
+
+    def close(self):
+        pass
+
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.call_app(self.get_app(url), 'POST', urllib.parse.urlsplit(url).path, data=data, json=json)
+
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        return self.call_app(self.get_app(url), 'GET', urllib.parse.urlsplit(url).path, params=params, headers=headers)
+
+
+    def get_app(self, url):
+        """
+        Returns the app of the node the given loopback url points to, the nodes are known by their ports.
+        """
+        return self.apps_by_port[urllib.parse.urlsplit(url).port]
+
+
+    def call_app(self, app, method, path, data=None, params=None, json=None, headers=None):
+        """
+        Calls ``app`` with a WSGI environment for the given request and returns its ``LocalResponse``.
+        """
+        body, content_type = encode_body(data, json)
+        environ = transport.make_environ(method, path, urllib.parse.urlencode(params or {}), body, content_type,
+                                         (headers or {}).items(), '127.0.0.1', 80)
+
+        # A node calls other nodes while it handles a request. Bottle keeps the current request and
+        # response per thread, so the caller's ones are restored after the nested call.
+        context = save_bottle_context()
+        try:
+            status, response_headers, content = transport.call_wsgi_app(app, environ)
+        finally:
+            restore_bottle_context(context)
+
+        return LocalResponse(int(status.split()[0]), CaseInsensitiveDict(response_headers), content)
+
+
+def encode_body(data, json_data):
+    """
+    Returns the request body and its content type like requests would send them. A string is sent as json,
+    like ``util.contact_another_server`` declares it.
+    """
+    if json_data is not None:
+        return json.dumps(json_data).encode('utf-8'), 'application/json'
+    if isinstance(data, dict):
+        return urllib.parse.urlencode(data).encode('utf-8'), 'application/x-www-form-urlencoded'
+    if isinstance(data, str):
+        return data.encode('utf-8'), 'application/json'
+    if isinstance(data, bytes):
+        return data, 'application/json'
+    return b'', ''
+
+
+def save_bottle_context():
+    """
+    Returns the request and response bottle currently holds for this thread, None if there are none.
+    """
+    try:
+        return (request.environ, response._status_line, response._status_code, response._cookies,
+                response._headers, response.body)
+    except RuntimeError:
+        return None
+
+
+def restore_bottle_context(context):
+    if context is None:
+        return
+    (request.environ, response._status_line, response._status_code, response._cookies,
+     response._headers, response.body) = context
+
+
+class LocalCluster:
+    """
+    Creates one activity node per activity and the central node in this process. ``transport`` is
+    ``direct`` (the nodes call each other's apps, no sockets) or ``http`` (every node is served on
+    ``127.0.0.1:BASE_SERVER_PORT + id`` like the Docker containers, with the transport selected by
+    ``TRANSPORT``). The ``EventLogHandler`` sends its requests with ``session``.
+    """
+
+    def __init__(self, transport='direct', activity_node='improved'):
+        if transport not in ('direct', 'http'):
+            raise ValueError(f"Unknown transport: {transport}")
+        self.transport = transport
+
+        activity_node_module, improved_module = import_node_modules(ACTIVITY_NODE_DIR, 'activity_node', 'improved_activity_node')
+        central_node_module, = import_node_modules(CENTRAL_NODE_DIR, 'central_node')
+
+        if activity_node == 'improved':
+            self.activity_node_class = improved_module.ImprovedActivityNode
+        else:
+            self.activity_node_class = activity_node_module.ActivityNode
+        self.central_node_class = central_node_module.CentralNode
+
+        self.direct_transport = DirectTransport() if transport == 'direct' else None
+        self.nodes = []
+        self.servers = []
+
+
+    @property
+    def session(self):
+        """
+        What the ``EventLogHandler`` sends its requests with, None for HTTP.
+        """
+        return self.direct_transport
+
+
+    def get_server_names(self, num_servers):
+        """
+        Returns the names the nodes address each other with, the central node is the last one.
+        """
+        if self.transport == 'http':
+            return [f"127.0.0.1:{BASE_SERVER_PORT + i}" for i in range(num_servers)]
+        return [f"{DOCKER_LABEL}_activity_node_{i}" for i in range(num_servers - 1)] + [f"{DOCKER_LABEL}_central_node"]
+
+
+    def start(self, server_activity_mapping):
+        """
+        Creates the nodes for the given mapping from server IDs to activity names and makes them reachable.
+        """
+        num_servers = len(server_activity_mapping) + 1      # +1 for the central node
+        names = self.get_server_names(num_servers)
+
+        # None: every node creates its own transport
+        transport = self.direct_transport
+
+        for server_id in range(num_servers - 1):
+            node = self.activity_node_class(server_id, names[server_id], server_activity_mapping[str(server_id)],
+                                            [''], list(names), transport)
+            self.nodes.append(node)
+        central_node = self.central_node_class(num_servers - 1, names[-1], list(names), [''], dict(server_activity_mapping),
+                                               transport)
+        self.nodes.append(central_node)
+
+        if self.direct_transport is not None:
+            for server_id, node in enumerate(self.nodes):
+                self.direct_transport.add_node(names[server_id], BASE_SERVER_PORT + server_id, node)
+            return
+
+        for server_id, node in enumerate(self.nodes):
+            server = node.transport.serve(node, port=BASE_SERVER_PORT + server_id, host='127.0.0.1', start_loop=False)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        for server_id in range(num_servers):
+            wait_for_port(BASE_SERVER_PORT + server_id)
+
+
+    def stop(self):
+        """
+        Stops serving the nodes and closes their transports.
+        """
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+        for node in self.nodes:
+            node.transport.close()
+
+
+def wait_for_port(port, timeout_s=5):
+    """
+    Waits until a server accepts connections on the given loopback port.
+    """
+    deadline = time.time() + timeout_s
+    while True:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=timeout_s):
+                return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(.05)
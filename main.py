@@ -8,10 +8,9 @@ import threading
 import time
 import traceback
 
-import docker
 from dotenv import load_dotenv
 
-from event_log_handler import EventLogHandler
+from event_log_handler import STREAM_LOG, EventLogHandler
 
 load_dotenv()
 
@@ -23,6 +22,21 @@ CENTRAL_NODE_IMAGE = str(os.getenv('CENTRAL_NODE_IMAGE'))
 OUTPUTS_PATH = str(os.getenv('OUTPUTS_PATH'))
 FILE_PATH =  str(os.getenv('FILE_PATH'))
 OUTPUTS_PATH = str(os.getenv('OUTPUTS_PATH'))
+REPLAY_BATCH_SIZE = int(os.getenv('REPLAY_BATCH_SIZE', '1'))   # > 1: send the events in batches
+REPLAY_WORKERS = int(os.getenv('REPLAY_WORKERS', '0'))         # > 0: replay that many cases concurrently
+REPLAY_RATE = float(os.getenv('REPLAY_RATE', '0'))             # concurrent replay: events per second, 0: no limit
+REPLAY_TIME_SCALE = float(os.getenv('REPLAY_TIME_SCALE', '0')) # concurrent replay: follow the log's timestamps this much faster
+CLUSTER_MODE = os.getenv('CLUSTER_MODE', 'docker')   # 'docker', or 'direct'/'http' to run all nodes in this process
+CLUSTER_ACTIVITY_NODE = os.getenv('CLUSTER_ACTIVITY_NODE', 'improved')   # 'improved' or 'basic', without Docker
+
+if REPLAY_WORKERS > 0 and REPLAY_TIME_SCALE > 0 and STREAM_LOG:
+    raise ValueError("REPLAY_TIME_SCALE cannot be used with STREAM_LOG, the streamed log is ordered by case id")
+
+# Optional node settings, passed on to the containers if they are set in .env
+NODE_SETTINGS = ['FAN_OUT_WORKERS', 'HTTP_POOL_SIZE', 'HTTP_CONNECT_TIMEOUT_S', 'HTTP_READ_TIMEOUT_S', 'HTTP_IDLE_TIMEOUT_S',
+                 'PREDECESSOR_QUERY_RETRIES', 'PREDECESSOR_QUERY_TIMEOUT_S', 'CASE_TTL_S', 'MAX_CASES', 'COMPACT_NEIGHBORHOODS',
+                 'SYNC_MODE', 'COLLECT_WORKERS', 'COLLECT_TIMEOUT_S', 'PAIR_ENGINE', 'TRANSPORT',
+                 'EVENT_WORKERS', 'QUERY_WORKERS', 'MAX_QUEUED_EVENTS']
 
 
 # --- Helper Functions ---
@@ -64,6 +78,10 @@ def get_server_name_list_str():
     return server_str
 
 
+def get_node_settings():
+    return {name: os.getenv(name) for name in NODE_SETTINGS if os.getenv(name) is not None}
+
+
 def get_server_ip_list_str():
     server_str = ""
     for i in range(NUM_SERVERS):
@@ -75,83 +93,110 @@ def get_server_ip_list_str():
 
 # ---
 
-client = docker.from_env()
+if CLUSTER_MODE == 'docker':
+    import docker
+    client = docker.from_env()
+    cluster = None
+else:
+    # The nodes write their outputs directly to OUTPUTS_PATH
+    os.environ.setdefault('OUTPUTS_DIR', OUTPUTS_PATH)
+    from local_cluster import LocalCluster
+    cluster = LocalCluster(CLUSTER_MODE, CLUSTER_ACTIVITY_NODE)
 
 # Set up Event Log Handler
-elh = EventLogHandler()
+elh = EventLogHandler(session=cluster.session if cluster else None)
 NUM_SERVERS = elh.get_activity_count() + 1      # +1 for the central node
 server_activity_mapping = elh.get_server_id_to_activity_name_mapping()
 
-# Remove any running container instances
-remove()
-
-# Add the network
-network = client.networks.create(DOCKER_LABEL + "_net", driver="bridge")
-
-# Add the containers
-for server_id in range(0, NUM_SERVERS):
-    if server_id == NUM_SERVERS-1:
-        # Run container for central node
-        server_name = DOCKER_LABEL + "_central_node"
-        server_container = client.containers.run(CENTRAL_NODE_IMAGE,
-                                                detach=True,
-                                                labels={DOCKER_LABEL: 'central_node'},
-                                                name=server_name,
-                                                ports={'80': ('127.0.0.1', BASE_SERVER_PORT + server_id)},
-                                                network= DOCKER_LABEL + "_net",
-                                                volumes={
-                                                    OUTPUTS_PATH: {
-                                                        'bind': '/application/outputs',
-                                                        'mode': 'rw'}},
-                                                environment={
-                                                    "SERVER_NAME_LIST": get_server_name_list_str(),
-                                                    "SERVER_IP_LIST": "", # not using IPs right now
-                                                    "SERVER_ID": server_id,
-                                                    "SERVER_ACTIVITY_MAPPING": server_activity_mapping})
-    else:
-        # Run container for activity node
-        server_name = f"{DOCKER_LABEL}_activity_node_{server_id}"
-        server_container = client.containers.run(ACTIVITY_NODE_IMAGE,
-                                                detach=True,
-                                                labels={DOCKER_LABEL: 'activity_node'},
-                                                name=server_name,
-                                                ports={'80': ('127.0.0.1', BASE_SERVER_PORT + server_id)},
-                                                network=DOCKER_LABEL + "_net",
-                                                volumes={
-                                                    OUTPUTS_PATH: {
-                                                        'bind': '/application/outputs',
-                                                        'mode': 'rw'}},
-                                                environment={
-                                                    "SERVER_NAME_LIST": get_server_name_list_str(),
-                                                    "SERVER_IP_LIST": "", # not using IPs right now
-                                                    "SERVER_ID": server_id,
-                                                    "ACTIVITY_NAME": server_activity_mapping[str(server_id)],
-                                                    "FILE_PATH": FILE_PATH})
-    attach_logs(server_container)
+if cluster:
+    cluster.start(server_activity_mapping)
+else:
+    # Remove any running container instances
+    remove()
+
+    # Add the network
+    network = client.networks.create(DOCKER_LABEL + "_net", driver="bridge")
+
+    # Add the containers
+    for server_id in range(0, NUM_SERVERS):
+        if server_id == NUM_SERVERS-1:
+            # Run container for central node
+            server_name = DOCKER_LABEL + "_central_node"
+            server_container = client.containers.run(CENTRAL_NODE_IMAGE,
+                                                    detach=True,
+                                                    labels={DOCKER_LABEL: 'central_node'},
+                                                    name=server_name,
+                                                    ports={'80': ('127.0.0.1', BASE_SERVER_PORT + server_id)},
+                                                    network= DOCKER_LABEL + "_net",
+                                                    volumes={
+                                                        OUTPUTS_PATH: {
+                                                            'bind': '/application/outputs',
+                                                            'mode': 'rw'}},
+                                                    environment={
+                                                        "SERVER_NAME_LIST": get_server_name_list_str(),
+                                                        "SERVER_IP_LIST": "", # not using IPs right now
+                                                        "SERVER_ID": server_id,
+                                                        "SERVER_ACTIVITY_MAPPING": server_activity_mapping,
+                                                        **get_node_settings()})
+        else:
+            # Run container for activity node
+            server_name = f"{DOCKER_LABEL}_activity_node_{server_id}"
+            server_container = client.containers.run(ACTIVITY_NODE_IMAGE,
+                                                    detach=True,
+                                                    labels={DOCKER_LABEL: 'activity_node'},
+                                                    name=server_name,
+                                                    ports={'80': ('127.0.0.1', BASE_SERVER_PORT + server_id)},
+                                                    network=DOCKER_LABEL + "_net",
+                                                    volumes={
+                                                        OUTPUTS_PATH: {
+                                                            'bind': '/application/outputs',
+                                                            'mode': 'rw'}},
+                                                    environment={
+                                                        "SERVER_NAME_LIST": get_server_name_list_str(),
+                                                        "SERVER_IP_LIST": "", # not using IPs right now
+                                                        "SERVER_ID": server_id,
+                                                        "ACTIVITY_NAME": server_activity_mapping[str(server_id)],
+                                                        "FILE_PATH": FILE_PATH,
+                                                        **get_node_settings()})
+        attach_logs(server_container)
 
 # ---
 
 print("CTRL-C to shutdown...")
 try:
-    time.sleep(7)
-
-    # Run until shutdown
-    while True:
+    if not cluster:
+        time.sleep(7)
 
-        time.sleep(.1)
-        try:
-            # Trigger Events and pass them to the according activity node by HTTP request
-            res = elh.trigger_next_event()
-            if res:
-                break
+    if REPLAY_WORKERS > 0:
+        # Replay the cases concurrently, events are paced by the scheduler
+        elh.replay(REPLAY_WORKERS, REPLAY_RATE, REPLAY_TIME_SCALE)
 
-        except Exception as e:
-            print("[MAIN FCT ERROR] " + str(e))
-            print(traceback.format_exc())
+    else:
+        # Run until shutdown
+        while True:
+
+            # the nodes in this process handle an event before the request returns, containers get some time
+            if not cluster:
+                time.sleep(.1)
+            try:
+                # Trigger Events and pass them to the according activity node by HTTP request
+                if REPLAY_BATCH_SIZE > 1:
+                    res = elh.trigger_next_events(REPLAY_BATCH_SIZE)
+                else:
+                    res = elh.trigger_next_event()
+                if res:
+                    break
+
+            except Exception as e:
+                print("[MAIN FCT ERROR] " + str(e))
+                print(traceback.format_exc())
 
 except KeyboardInterrupt:
     pass
 
 print("Shutting down...")
-remove()
+if cluster:
+    cluster.stop()
+else:
+    remove()
 print("Finished")
\ No newline at end of file
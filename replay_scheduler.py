@@ -0,0 +1,187 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+ReplayScheduler replays the events of an event log concurrently.
+Cases are independent of each other, only the events of one case have to be triggered in order.
+"""
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+class ReplayScheduler:
+    """
+    Triggers the events of different cases at the same time with ``workers`` threads. The next event of a
+    case is only triggered after the previous one was acknowledged. The events are released in the order of
+    their timestamps, either as fast as possible, at ``rate`` events per second, or following the log's
+    timestamps sped up by ``time_scale`` (2: the replay takes half the time the log spans).
+    If an event fails, the remaining events of its case are not triggered: the node may still handle the
+    failed event later, so a later event could overtake it. They are counted as errors as well.
+    """
+
+    def __init__(self, trigger_event, workers, rate=0.0, time_scale=0.0):
+        # trigger_event(case_id, activity_name, timestamp, is_last) sends an event and returns after its acknowledgement
+        self.trigger_event = trigger_event
+        self.rate = rate
+        self.time_scale = time_scale
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="replay_worker")
+
+        # released events that were not acknowledged yet, at most ``max_outstanding``
+        self.condition = threading.Condition()
+        self.outstanding = 0
+        self.max_outstanding = 16 * workers
+        # events waiting for the acknowledgement of their case's previous event, by case id
+        self.waiting = {}
+        # cases with a failed event, their remaining events are skipped
+        self.failed_cases = set()
+
+        # metrics
+        self.latencies = []         # seconds from sending an event to its acknowledgement
+        self.max_lag_s = 0.0        # how much later than scheduled an event was released at most
+        self.errors = 0             # failed and skipped events
+
+
+    def run(self, chunks):
+        """
+        Replays the events of the given chunks, which are ordered by case id and timestamp like the event log,
+        and returns the metrics of the replay. The events of each chunk are released by their timestamps, the
+        chunks one after another. With ``time_scale`` the replay starts at the earliest timestamp of the first
+        chunk, so the log has to be one chunk (see ``EventLogHandler.replay``).
+        """
+        start = time.monotonic()
+        log_start = None
+        released = 0
+
+        for chunk, is_last in self.iter_with_last_events(chunks):
+            case_ids = chunk["case:concept:name"].tolist()
+            activities = chunk["concept:name"].tolist()
+            timestamps = chunk["time:timestamp"].tolist()
+            timestamps_ns = pd.DatetimeIndex(chunk["time:timestamp"]).as_unit("ns").asi8
+            if log_start is None:
+                log_start = timestamps_ns.min()
+
+            for i in np.argsort(timestamps_ns, kind="stable"):
+                due = None
+                if self.rate > 0:
+                    due = start + released / self.rate
+                elif self.time_scale > 0:
+                    due = start + (timestamps_ns[i] - log_start) / 1e9 / self.time_scale
+
+                if due is not None:
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        self.max_lag_s = max(self.max_lag_s, -delay)
+
+                self.release((case_ids[i], activities[i], timestamps[i], bool(is_last[i])))
+                released += 1
+
+        with self.condition:
+            while self.outstanding:
+                self.condition.wait()
+        duration_s = time.monotonic() - start
+        self.executor.shutdown()
+
+        latencies_ms = 1000 * np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            'events': released,
+            'duration_s': duration_s,
+            'events_per_s': released / duration_s if duration_s else 0.0,
+            'latency_p50_ms': float(np.percentile(latencies_ms, 50)),
+            'latency_p99_ms': float(np.percentile(latencies_ms, 99)),
+            'max_lag_ms': 1000 * self.max_lag_s,
+            'errors': self.errors
+            }
+
+
+    def iter_with_last_events(self, chunks):
+        """
+        Yields every chunk together with a boolean array telling which events are the last one of their case.
+        The last event of a chunk is compared to the first one of the next chunk, as a case can continue there.
+        """
+        previous = None
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            if previous is not None:
+                yield previous, self.get_last_events(previous, chunk["case:concept:name"].iloc[0])
+            previous = chunk
+        if previous is not None:
+            yield previous, self.get_last_events(previous, None)
+
+
+    def get_last_events(self, chunk, next_case_id):
+        case_ids = chunk["case:concept:name"].to_numpy()
+        next_case_ids = np.append(case_ids[1:], np.array([next_case_id], dtype=object))
+        return case_ids != next_case_ids
+
+
+    def release(self, event):
+        """
+        Triggers the event now if its case has no event in progress, otherwise after the ones before.
+        Blocks while ``max_outstanding`` events are released but not acknowledged.
+        """
+        case_id = event[0]
+        with self.condition:
+            while self.outstanding >= self.max_outstanding:
+                self.condition.wait()
+
+            # checked after waiting, the case may have failed meanwhile
+            if case_id in self.failed_cases:
+                self.errors += 1
+                return
+            self.outstanding += 1
+
+            if case_id in self.waiting:
+                self.waiting[case_id].append(event)
+                return
+            self.waiting[case_id] = deque()
+
+        self.executor.submit(self.trigger, event)
+
+
+    def trigger(self, event):
+        """
+        Triggers the event and afterwards the next waiting event of its case.
+        If the event fails, the waiting events of its case are dropped.
+        """
+        case_id = event[0]
+        sent = time.monotonic()
+        failed = False
+        try:
+            self.trigger_event(*event)
+        except Exception as e:
+            failed = True
+            print("[REPLAY ERROR] " + str(e))
+            print(traceback.format_exc())
+
+        with self.condition:
+            self.latencies.append(time.monotonic() - sent)
+            self.outstanding -= 1
+
+            next_event = None
+            if failed:
+                skipped = len(self.waiting.pop(case_id))
+                self.failed_cases.add(case_id)
+                self.errors += 1 + skipped
+                self.outstanding -= skipped
+            elif self.waiting[case_id]:
+                next_event = self.waiting[case_id].popleft()
+            else:
+                del self.waiting[case_id]
+            self.condition.notify_all()
+
+        if failed:
+            print(f"[REPLAY ERROR] Skipping the remaining events of case {case_id}")
+
+        if next_event is not None:
+            self.executor.submit(self.trigger, next_event)
@@ -0,0 +1,12 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import sys
+
+# the modules import each other from the repository root, like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# the port of the first node, which main.py and the node modules read from .env
+os.environ.setdefault('BASE_SERVER_PORT', '9000')
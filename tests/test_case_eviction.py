@@ -0,0 +1,84 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import threading
+import time
+from types import SimpleNamespace
+
+from local_cluster import ACTIVITY_NODE_DIR, import_node_modules
+
+case_eviction, neighbors, start_activities = import_node_modules(
+    ACTIVITY_NODE_DIR, 'data_structures.case_eviction', 'data_structures.neighbors', 'data_structures.start_activities')
+
+
+def make_node(compact=False):
+    node = SimpleNamespace(id=0, neighbors=neighbors.NeighborhoodCollection(compact=compact))
+    node.start_activities = start_activities.StartActivities(node)
+    return node
+
+
+def test_max_cases_removes_whole_cases():
+    node = make_node(compact=True)
+    eviction = case_eviction.CaseEviction(node, max_cases=2)
+
+    for case in range(5):
+        node.neighbors.add_neighborhood(str(case), 100 * case)
+        eviction.touch(str(case))
+
+    assert sorted(node.neighbors.all) == ["3", "4"]
+    assert node.neighbors.memory_usage()['events'] == 2
+    assert eviction.get_statistics()['evicted_cases'] == 3
+
+
+def test_queries_keep_a_case_active():
+    node = make_node()
+    eviction = case_eviction.CaseEviction(node, max_cases=2)
+
+    node.neighbors.add_neighborhood("0", 0)
+    eviction.touch("0")
+    node.neighbors.add_neighborhood("1", 100)
+    eviction.touch("1")
+
+    # another node asks for the predecessor in case 0, a case the node does not store is not tracked
+    eviction.touch_if_stored("0")
+    eviction.touch_if_stored("7")
+    node.neighbors.add_neighborhood("2", 200)
+    eviction.touch("2")
+
+    assert sorted(node.neighbors.all) == ["0", "2"]
+    assert eviction.get_statistics()['tracked_cases'] == 2
+
+
+def test_new_event_during_a_removal_is_kept():
+    node = make_node()
+    eviction = case_eviction.CaseEviction(node, max_cases=2)
+    node.neighbors.add_neighborhood("0", 0)
+    eviction.touch("0")
+    node.neighbors.add_neighborhood("1", 100)
+    eviction.touch("1")
+
+    # the removal of case 0 is slow, a new event of it arrives in the meantime
+    removal_started = threading.Event()
+    remove_case = node.neighbors.remove_case
+
+    def slow_remove_case(case_id):
+        if case_id == "0" and not removal_started.is_set():
+            removal_started.set()
+            time.sleep(0.2)
+        return remove_case(case_id)
+
+    node.neighbors.remove_case = slow_remove_case
+    node.neighbors.add_neighborhood("2", 200)
+    evicting = threading.Thread(target=eviction.touch, args=("2",))
+    evicting.start()
+    removal_started.wait()
+
+    # like handle_event: the case is touched before the event is stored
+    eviction.touch("0")
+    node.neighbors.add_neighborhood("0", 300)
+    evicting.join()
+
+    assert len(node.neighbors.all["0"]) == 1
+    assert node.neighbors.event_timestamp[node.neighbors.all["0"][0]] == 300
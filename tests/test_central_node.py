@@ -0,0 +1,165 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from pm4py.objects.petri_net.importer import importer as pnml_importer
+
+from alpha_miner_original import run_original_alpha_miner
+from equality_check import equality_check
+from local_cluster import BASE_SERVER_PORT, CENTRAL_NODE_DIR, LocalCluster, import_node_modules
+
+central_node_auxiliaries, = import_node_modules(CENTRAL_NODE_DIR, 'central_node_auxiliaries')
+
+ACTIVITIES = ["a", "b", "c", "d"]
+START = pd.Timestamp("2020-01-01", tz="UTC")
+
+
+def start_cluster(monkeypatch, tmp_path, transport='direct'):
+    # the activity nodes write the requested nodes per event to OUTPUTS_DIR
+    monkeypatch.setenv('OUTPUTS_DIR', str(tmp_path))
+    monkeypatch.setenv('FILE_PATH', str(tmp_path / "log.csv"))
+    local_cluster = LocalCluster(transport)
+    local_cluster.start({str(i): activity for i, activity in enumerate(ACTIVITIES)})
+    return local_cluster
+
+
+@pytest.fixture
+def cluster(monkeypatch, tmp_path):
+    local_cluster = start_cluster(monkeypatch, tmp_path)
+    yield local_cluster
+    local_cluster.stop()
+
+
+def get_url(node_id, uri):
+    return f"http://127.0.0.1:{BASE_SERVER_PORT + node_id}{uri}"
+
+
+def trigger(cluster, case_id, activity, seconds):
+    session = cluster.session or requests
+    res = session.post(get_url(activity, "/trigger_event"),
+                       data={'activity_id': activity, 'case_id': case_id, 'timestamp': str(START + pd.Timedelta(seconds=seconds))})
+    assert res.status_code == 200
+
+
+def collect_full(central):
+    """
+    Returns the merged data of the nodes' complete data, like the central node with ``SYNC_MODE=full``.
+    """
+    contents, missing_nodes = central.collect_from_nodes('/current_data')
+    assert not missing_nodes
+    return central.merge_node_data([central_node_auxiliaries.decode_node_data(content) for content in contents.values()])
+
+
+def test_delta_and_full_sync_merge_the_same_data(cluster):
+    rng = random.Random(0)
+    central = cluster.nodes[-1]
+    # the events of each case follow each other a second apart, the cases are interleaved
+    cases = {str(case): [rng.randrange(len(ACTIVITIES)) for _ in range(rng.randint(1, 6))] for case in range(30)}
+    seconds = {case_id: 0 for case_id in cases}
+
+    for _ in range(5):
+        for case_id in rng.sample(sorted(cases), 10):
+            if cases[case_id]:
+                trigger(cluster, case_id, cases[case_id].pop(0), seconds[case_id])
+                seconds[case_id] += 1
+
+        # the deltas are applied to the data of the rounds before
+        delta, missing_nodes = central.sync_node_deltas()
+        full = collect_full(central)
+
+        assert not missing_nodes
+        assert np.array_equal(delta['fm'], full['fm'])
+        assert np.array_equal(delta['seq_nmbr_vector'], full['seq_nmbr_vector'])
+        assert delta['start_activities'] == full['start_activities']
+        assert delta['end_activities'] == full['end_activities']
+
+    assert full['fm'].any()
+
+
+def test_node_that_does_not_answer_is_missing(monkeypatch, tmp_path):
+    http_cluster = start_cluster(monkeypatch, tmp_path, 'http')
+    try:
+        central = http_cluster.nodes[-1]
+        monkeypatch.setitem(central.collect_from_nodes.__globals__, 'COLLECT_TIMEOUT_S', 0.5)
+        trigger(http_cluster, "1", 0, 0)
+        trigger(http_cluster, "1", 1, 1)
+
+        # node 2 stops answering: its port still accepts connections, but nobody reads the requests
+        server = http_cluster.servers.pop(2)
+        server.shutdown()
+        server.server_close()
+        with socket.socket() as silent:
+            silent.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            silent.bind(('127.0.0.1', BASE_SERVER_PORT + 2))
+            silent.listen()
+
+            began = time.perf_counter()
+            res = requests.get(get_url(len(ACTIVITIES), "/process_model"), timeout=10)
+            elapsed_s = time.perf_counter() - began
+    finally:
+        http_cluster.stop()
+
+    assert res.status_code == 200
+    assert res.json()['missing_nodes'] == [f"127.0.0.1:{BASE_SERVER_PORT + 2}"]
+    assert elapsed_s < 5
+
+
+def test_unchanged_model_is_not_sent_again(cluster):
+    url = get_url(len(ACTIVITIES), "/process_model")
+    trigger(cluster, "1", 0, 0)
+    trigger(cluster, "1", 1, 1)
+
+    res = cluster.session.get(url)
+    assert res.status_code == 200
+    etag = res.headers['etag']
+    assert res.json()['net']
+
+    res = cluster.session.get(url, headers={'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.headers['etag'] == etag
+    assert not res.content
+
+    # a new event changes the version
+    trigger(cluster, "1", 2, 2)
+    res = cluster.session.get(url, headers={'If-None-Match': etag})
+    assert res.status_code == 200
+    assert res.headers['etag'] != etag
+    assert res.json()['net']
+
+
+def test_model_equals_the_original_alpha_miner(cluster):
+    rng = random.Random(1)
+    variants = [[0, 1, 2, 3], [0, 2, 1, 3], [0, 1, 1, 3], [0, 3]]
+    rows = []
+    for case in range(20):
+        case_id = str(case)
+        for seconds, activity in enumerate(rng.choice(variants)):
+            trigger(cluster, case_id, activity, seconds)
+            rows.append((case_id, ACTIVITIES[activity], START + pd.Timedelta(seconds=seconds)))
+
+    res = cluster.session.get(get_url(len(ACTIVITIES), "/process_model"))
+    model = pnml_importer.deserialize(res.json()['net'].encode("utf-8"))
+
+    log = pd.DataFrame(rows, columns=["case:concept:name", "concept:name", "time:timestamp"])
+    assert equality_check(model, run_original_alpha_miner(log))
+
+
+def test_predecessor_with_another_utc_offset(cluster):
+    # the second event is an hour later, although its local time is earlier
+    for activity, timestamp in ((0, "2020-01-01 10:00:00+02:00"), (1, "2020-01-01 09:00:00+00:00")):
+        res = cluster.session.post(get_url(activity, "/trigger_event"),
+                                   data={'activity_id': activity, 'case_id': "1", 'timestamp': timestamp})
+        assert res.status_code == 200
+
+    full = collect_full(cluster.nodes[-1])
+    assert full['fm'][0][1] == 1
+    assert full['start_activities'] == {0}
@@ -0,0 +1,96 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from auxiliaries.event_log_adjuster import no_doubled_timestamps
+
+
+def no_doubled_timestamps_by_rows(event_log_df):
+    """
+    The loop over the rows ``no_doubled_timestamps`` replaced, as reference.
+    """
+    current_case_id = -1
+    last_timestamp = None
+
+    for i, row in event_log_df.iterrows():
+
+        case_id = row["case:concept:name"]
+        timestamp = row["time:timestamp"]
+
+        if last_timestamp and case_id == current_case_id and timestamp <= last_timestamp:
+            event_log_df.loc[i, "time:timestamp"] = last_timestamp + timedelta(seconds=1)
+
+        current_case_id = case_id
+        last_timestamp = event_log_df.loc[i, "time:timestamp"]
+
+    return event_log_df
+
+
+def make_log(rng, num_events, tz):
+    """
+    Returns a log ordered by case id and timestamp in which many events of a case are less than a second apart.
+    """
+    start = pd.Timestamp("2020-01-01", tz=tz)
+    rows = [(f"case_{rng.randrange(5)}", "a", start + pd.Timedelta(milliseconds=250 * rng.randrange(20)))
+            for _ in range(num_events)]
+    events = pd.DataFrame(rows, columns=["case:concept:name", "concept:name", "time:timestamp"])
+    return events.sort_values(["case:concept:name", "time:timestamp"], kind="mergesort").reset_index(drop=True)
+
+
+def test_equals_the_loop_over_the_rows():
+    rng = random.Random(0)
+    for i in range(200):
+        events = make_log(rng, rng.randint(1, 40), tz="UTC" if i % 2 else None)
+
+        expected = no_doubled_timestamps_by_rows(events.copy())
+        result = no_doubled_timestamps(events.copy())
+
+        assert result["time:timestamp"].dtype == expected["time:timestamp"].dtype
+        assert result["time:timestamp"].tolist() == expected["time:timestamp"].tolist()
+
+
+def test_long_case_of_sub_second_timestamps():
+    num_events = 32000
+    start = pd.Timestamp("2020-01-01", tz="UTC")
+    steps = np.arange(num_events)
+    cases = [
+        # an event every 100 ms, none of them is adjusted
+        (steps * 100, steps * 100),
+        # two events every 100 ms, each event ends up a second after the one before
+        (steps // 2 * 100, steps * 1000),
+    ]
+    for milliseconds, expected_milliseconds in cases:
+        timestamps = (start + pd.to_timedelta(milliseconds, unit="ms")).as_unit("ms")
+        events = pd.DataFrame({"case:concept:name": "1", "concept:name": "a", "time:timestamp": timestamps})
+
+        began = time.perf_counter()
+        result = no_doubled_timestamps(events.copy())
+        assert time.perf_counter() - began < 2
+
+        assert result["time:timestamp"].dtype == events["time:timestamp"].dtype
+        expected = (start + pd.to_timedelta(expected_milliseconds, unit="ms")).as_unit("ms")
+        assert result["time:timestamp"].tolist() == expected.tolist()
+
+
+def test_mixed_utc_offsets():
+    # local time across the change to daylight saving time, the column has object dtype
+    timestamps = [pd.Timestamp("2020-03-29 01:30:00+01:00"), pd.Timestamp("2020-03-29 02:30:00+02:00"),
+                  pd.Timestamp("2020-03-29 03:00:00+02:00"), pd.Timestamp("2020-03-29 04:00:00+02:00")]
+    events = pd.DataFrame({"case:concept:name": ["1", "1", "2", "2"], "concept:name": ["a", "b", "a", "b"],
+                           "time:timestamp": timestamps})
+    assert events["time:timestamp"].dtype == object
+
+    expected = no_doubled_timestamps_by_rows(events.copy())
+    result = no_doubled_timestamps(events.copy())
+
+    assert result["time:timestamp"].tolist() == expected["time:timestamp"].tolist()
+    # the first two events are at the same instant, the second one is moved a second later
+    assert result["time:timestamp"].iloc[1] == pd.Timestamp("2020-03-29 00:30:01+00:00")
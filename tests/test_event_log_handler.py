@@ -0,0 +1,116 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+
+import pandas as pd
+import requests
+
+import event_log_handler
+from event_log_handler import EventLogHandler
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.headers = {'Retry-After': '0'}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    """
+    Answers the requests of the event log handler with the given responses, one after another.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def post(self, url, data=None, json=None, **kwargs):
+        self.sent.append((url, data if json is None else json))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_handler(session, events):
+    handler = EventLogHandler.__new__(EventLogHandler)
+    handler.session = session
+    handler.event_log_df = events
+    handler.event_chunks = iter([events])
+    handler.buffer = None
+    handler.buffer_pos = 0
+    handler.handled_pending = set()
+    handler.current_event = 0
+    handler.current_event_lock = event_log_handler.threading.Lock()
+    handler.failed_attempts = 0
+    handler.failed_case = None
+    handler.errors = 0
+    handler.activity_name_to_server_id_mapping = {"a": 0, "b": 1}
+    return handler
+
+
+def make_log(rows):
+    events = pd.DataFrame(rows, columns=["case:concept:name", "concept:name", "time:timestamp"])
+    events["time:timestamp"] = pd.to_datetime(events["time:timestamp"])
+    return events
+
+
+def test_failed_event_is_triggered_again(monkeypatch):
+    monkeypatch.setattr(event_log_handler, 'TRIGGER_RETRY_DELAY_S', 0)
+    events = make_log([("1", "a", "2020-01-01 00:00:00+00:00"), ("1", "b", "2020-01-01 00:00:01+00:00")])
+    session = FakeSession([ConnectionError("node not reachable"), FakeResponse(200), FakeResponse(200)])
+    handler = make_handler(session, events)
+
+    handler.trigger_next_event()
+    handler.trigger_next_event()
+    handler.trigger_next_event()
+
+    assert [data['activity_id'] for _, data in session.sent] == [0, 0, 1]
+    assert handler.current_event == 2
+
+
+def test_case_is_skipped_after_the_last_attempt(monkeypatch):
+    monkeypatch.setattr(event_log_handler, 'TRIGGER_RETRY_DELAY_S', 0)
+    monkeypatch.setattr(event_log_handler, 'TRIGGER_ATTEMPTS', 2)
+    events = make_log([("1", "a", "2020-01-01 00:00:00+00:00"), ("1", "b", "2020-01-01 00:00:01+00:00"),
+                       ("2", "a", "2020-01-01 00:00:00+00:00"), ("3", "a", "2020-01-01 00:00:00+00:00"),
+                       ("3", "b", "2020-01-01 00:00:01+00:00"), ("4", "a", "2020-01-01 00:00:00+00:00")])
+    # case 1 fails twice; the node may still handle the event of case 3 that timed out, it is not sent again
+    session = FakeSession([FakeResponse(500), ConnectionError("node not reachable"), FakeResponse(200),
+                           requests.exceptions.ReadTimeout("no answer"), FakeResponse(200)])
+    handler = make_handler(session, events)
+
+    for _ in range(7):
+        handler.trigger_next_event()
+
+    assert [data['case_id'] for _, data in session.sent] == ["1", "1", "2", "3", "4"]
+    assert handler.buffer_pos == 6
+    assert handler.current_event == 2
+    assert handler.errors == 4
+
+
+def test_failed_batch_only_sends_the_unhandled_events_again():
+    events = make_log([(str(case), "a", "2020-01-01 00:00:00+00:00") for case in range(4)]
+                      + [(str(case), "b", "2020-01-01 00:00:01+00:00") for case in range(4)])
+    events = events.sort_values(["case:concept:name", "time:timestamp"], kind="mergesort")
+    # the node handles two events of the first wave, then cannot reach a predecessor; the second wave fails once
+    session = FakeSession([FakeResponse(503, {'handled_events': 2}), FakeResponse(200),
+                           RuntimeError("no answer"), FakeResponse(200)])
+    handler = make_handler(session, events)
+
+    handler.trigger_next_events(8)
+    assert handler.buffer_pos == 0          # the window is not left after a failed batch
+    handler.trigger_next_events(8)
+
+    sent_cases = [[event['case_id'] for event in body['events']] for _, body in session.sent]
+    assert sent_cases == [["0", "1", "2", "3"], ["2", "3"], ["0", "1", "2", "3"], ["0", "1", "2", "3"]]
+    assert handler.buffer_pos == 8
+    assert handler.current_event == 8
@@ -0,0 +1,25 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from bottle import Bottle, response
+
+from local_cluster import DirectTransport
+
+
+def test_direct_response_headers_are_case_insensitive():
+    app = Bottle()
+
+    @app.get('/busy')
+    def busy():
+        response.status = 503
+        response.set_header('Retry-After', '1')
+        return ''
+
+    direct_transport = DirectTransport()
+    direct_transport.add_node("node", 9000, app)
+    res = direct_transport.get("http://127.0.0.1:9000/busy")
+
+    assert res.status_code == 503
+    assert res.headers['retry-after'] == res.headers['Retry-After'] == '1'
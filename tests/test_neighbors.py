@@ -0,0 +1,98 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+
+import pytest
+
+from local_cluster import ACTIVITY_NODE_DIR, import_node_modules
+
+neighbors, = import_node_modules(ACTIVITY_NODE_DIR, 'data_structures.neighbors')
+
+
+def predecessor_candidate_by_scan(events, req_timestamp):
+    """
+    The latest of the given (timestamp, successor timestamp or None) events before ``req_timestamp``
+    that can still be the predecessor, found by looking at all of them.
+    """
+    candidates = [timestamp for timestamp, succ_timestamp in events
+                  if timestamp < req_timestamp and (succ_timestamp is None or req_timestamp < succ_timestamp)]
+    return max(candidates, default=None)
+
+
+def add_succ_by_scan(events, timestamp, succ_timestamp):
+    """
+    Sets the successor of the first of the given events at ``timestamp`` without one, in the order they were added.
+    """
+    for event in events:
+        if event[0] == timestamp and event[1] is None:
+            event[1] = succ_timestamp
+            return True
+    return False
+
+
+def test_lookups_after_inserts_out_of_order():
+    rng = random.Random(0)
+    for i in range(200):
+        collection = neighbors.NeighborhoodCollection(compact=i % 2 == 1)
+        events = {case: [] for case in "abc"}     # [timestamp, successor timestamp or None] in the order they were added
+        for _ in range(rng.randint(1, 30)):
+            case = rng.choice("abc")
+            timestamp = rng.randrange(10)
+            if rng.random() < 0.7:
+                collection.add_neighborhood(case, timestamp)
+                events[case].append([timestamp, None])
+            else:
+                succ_timestamp = timestamp + rng.randint(1, 5)
+                added = add_succ_by_scan(events[case], timestamp, succ_timestamp)
+                assert collection.add_succ_to_neighborhood(case, timestamp, 1, succ_timestamp) == added
+
+        for case, case_events in events.items():
+            if collection.compact:
+                # events with a successor are dropped
+                case_events = [event for event in case_events if event[1] is None]
+            rows = collection.all.get(case, [])
+            assert sorted(collection.event_timestamp[row] for row in rows) == \
+                [collection.event_timestamp[row] for row in rows] == sorted(timestamp for timestamp, _ in case_events)
+
+            for timestamp in range(12):
+                assert len(collection.find_rows(case, timestamp)) == sum(t == timestamp for t, _ in case_events)
+                assert collection.find_predecessor_candidate(case, timestamp) == \
+                    predecessor_candidate_by_scan(case_events, timestamp)
+
+
+def test_removed_rows_are_reused():
+    collection = neighbors.NeighborhoodCollection()
+    for timestamp in (300, 100, 200):
+        collection.add_neighborhood("a", timestamp)
+    collection.add_neighborhood("b", 100)
+    collection.add_succ_to_neighborhood("a", 100, 1, 200)
+
+    assert collection.remove_case("a") == 3
+    assert collection.remove_case("a") == 0
+    assert collection.find_rows("a", 100) == []
+    assert collection.find_predecessor_candidate("a", 400) is None
+    # two events of case a had no successor, one of them was its last event
+    assert collection.events_without_successor == 1
+    assert collection.has_event_without_successor()
+
+    collection.add_neighborhood("c", 500, 2, 400)
+    assert collection.memory_usage()['events'] == 2
+    assert len(collection.event_timestamp) == 4
+    assert collection.find_predecessor_candidate("c", 600) == 500
+    assert collection.find_predecessor_candidate("b", 600) == 100
+
+
+def test_activity_ids_are_bounded_by_int16():
+    collection = neighbors.NeighborhoodCollection()
+    collection.add_neighborhood("a", 100, 32767, 50)
+    collection.add_succ_to_neighborhood("a", 100, 32767, 200)
+    assert collection.pred[0] == collection.succ[0] == 32767
+
+    with pytest.raises(OverflowError):
+        collection.add_neighborhood("b", 100, 32768, 50)
+    # nothing of the rejected event was stored
+    assert len(collection.event_timestamp) == len(collection.pred) == len(collection.succ_timestamp) == 1
+    assert "b" not in collection.all
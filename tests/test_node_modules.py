@@ -0,0 +1,46 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import ast
+import os
+
+from local_cluster import ACTIVITY_NODE_DIR, CENTRAL_NODE_DIR
+
+# settings the nodes choose differently, e.g. the central node keeps fewer connections per peer
+NODE_SPECIFIC = {'HTTP_POOL_SIZE'}
+
+
+def read_source(directory, file_name):
+    with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+        return f.read()
+
+
+def get_definitions(source):
+    """
+    Returns the functions, classes and assigned names at the top of a module by name, as dumps of their syntax trees.
+    """
+    definitions = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            definitions[node.name] = ast.dump(node)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    definitions[target.id] = ast.dump(node.value)
+    return definitions
+
+
+def test_transport_is_the_same_in_both_node_directories():
+    assert read_source(ACTIVITY_NODE_DIR, "transport.py") == read_source(CENTRAL_NODE_DIR, "transport.py")
+
+
+def test_util_definitions_are_the_same_in_both_node_directories():
+    # only the activity nodes parse timestamps, the other definitions are shared
+    activity_util = get_definitions(read_source(ACTIVITY_NODE_DIR, "util.py"))
+    central_util = get_definitions(read_source(CENTRAL_NODE_DIR, "util.py"))
+
+    assert set(central_util) <= set(activity_util)
+    for name in set(central_util) - NODE_SPECIFIC:
+        assert activity_util[name] == central_util[name], name
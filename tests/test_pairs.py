@@ -0,0 +1,130 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import itertools
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from local_cluster import CENTRAL_NODE_DIR, import_node_modules
+
+central_node, auxiliaries = import_node_modules(CENTRAL_NODE_DIR, 'central_node', 'central_node_auxiliaries')
+
+
+def make_central_node(num_activities):
+    mapping = {str(i): f"activity_{i}" for i in range(num_activities)}
+    names = [f"activity_node_{i}" for i in range(num_activities)] + ["central_node"]
+    return central_node.CentralNode(num_activities, "central_node", names, [''] * len(names), mapping,
+                                    transport=SimpleNamespace())
+
+
+def random_fm(rng, num_activities, self_loop_probability=0.2):
+    fm = (np.array([[rng.random() for _ in range(num_activities)] for _ in range(num_activities)]) < 0.35).astype(int)
+    np.fill_diagonal(fm, [rng.random() < self_loop_probability for _ in range(num_activities)])
+    return fm
+
+
+def maximal_pairs(pairs):
+    """
+    Returns the pairs that are no subset of another pair, by comparing all of them.
+    """
+    is_subset = lambda p, q: p[0] & ~q[0] == 0 and p[1] & ~q[1] == 0
+    return set(p for p in pairs if not any(p != q and is_subset(p, q) for q in pairs))
+
+
+def to_sets(pairs):
+    return set((frozenset(auxiliaries.iter_bits(a)), frozenset(auxiliaries.iter_bits(b))) for a, b in pairs)
+
+
+def minimize_pairs_by_comparison(set_of_pairs, self_loops):
+    """
+    The ``minimize_pairs`` the subsumption index replaced, on pairs of sets, as reference.
+    """
+    is_subset = lambda p, q: p[0].issubset(q[0]) and p[1].issubset(q[1])
+
+    for (p_1, p_2) in itertools.combinations(set_of_pairs, 2):
+        if is_subset(p_1, p_2):
+            set_of_pairs.discard(p_1)
+        elif is_subset(p_2, p_1):
+            set_of_pairs.discard(p_2)
+
+    for activity in self_loops:
+        for (a, b) in set_of_pairs.copy():
+            if activity not in a and activity not in b:
+                continue
+            set_of_pairs.discard((a, b))
+            a_new, b_new = a - {activity}, b - {activity}
+            if a_new and b_new and not any(is_subset((a_new, b_new), pair) for pair in set_of_pairs.copy()):
+                set_of_pairs.add((a_new, b_new))
+
+    return set_of_pairs
+
+
+def test_cliques_are_the_maximal_powerset_pairs(monkeypatch):
+    rng = random.Random(0)
+    for _ in range(300):
+        num_activities = rng.randint(1, 7)
+        fm = random_fm(rng, num_activities)
+
+        monkeypatch.setattr(central_node, "PAIR_ENGINE", "powerset")
+        powerset_pairs, powerset_self_loops = make_central_node(num_activities).calculate_pairs(fm)
+        monkeypatch.setattr(central_node, "PAIR_ENGINE", "cliques")
+        clique_pairs, self_loops = make_central_node(num_activities).calculate_pairs(fm)
+
+        assert self_loops == powerset_self_loops
+        assert clique_pairs == maximal_pairs(powerset_pairs)
+
+
+def test_minimize_pairs_equals_the_pairwise_comparison(monkeypatch):
+    monkeypatch.setattr(central_node, "PAIR_ENGINE", "powerset")
+    rng = random.Random(1)
+    for _ in range(300):
+        num_activities = rng.randint(1, 7)
+        node = make_central_node(num_activities)
+        pairs, self_loops = node.calculate_pairs(random_fm(rng, num_activities, self_loop_probability=0.5))
+
+        expected = minimize_pairs_by_comparison(to_sets(pairs), set(auxiliaries.iter_bits(self_loops)))
+        assert to_sets(node.minimize_pairs(set(pairs), self_loops)) == expected
+
+
+def test_incremental_model_equals_a_full_rebuild():
+    rng = random.Random(2)
+    for _ in range(30):
+        num_activities = rng.randint(2, 9)
+        node = make_central_node(num_activities)
+        fm = random_fm(rng, num_activities)
+
+        for _ in range(10):
+            merged_data = {"fm": fm.copy(), "start_activities": {0}, "end_activities": {num_activities - 1}}
+            node.update_process_model(merged_data)
+
+            # the pairs of the model follow from the cliques, the PNML strings differ in their arc ids
+            full_node = make_central_node(num_activities)
+            full_node.update_process_model(merged_data)
+            assert node.pair_cliques == full_node.pair_cliques
+
+            # change a few cells, including self-loops
+            for _ in range(rng.randint(1, 3)):
+                pred, succ = rng.randrange(num_activities), rng.randrange(num_activities)
+                fm[pred, succ] = 1 - fm[pred, succ]
+
+
+def test_form_petri_net():
+    node = make_central_node(3)
+    pair = (auxiliaries.to_mask({0}), auxiliaries.to_mask({1, 2}))
+    net, initial_marking, final_marking = node.form_petri_net({pair}, {0}, {1, 2})
+
+    # the label of the place is its pair with activity names
+    assert node.pair_with_activity_names(pair) == ({"activity_0"}, {"activity_1", "activity_2"})
+    place_name = str(node.pair_with_activity_names(pair))
+    assert {place.name for place in net.places} == {"start", "end", place_name}
+    assert {(transition.name, transition.label) for transition in net.transitions} == \
+        {(f"activity_{i}", f"activity_{i}") for i in range(3)}
+    assert {(arc.source.name, arc.target.name) for arc in net.arcs} == {
+        ("start", "activity_0"), ("activity_0", place_name), (place_name, "activity_1"), (place_name, "activity_2"),
+        ("activity_1", "end"), ("activity_2", "end")}
+    assert [(place.name, tokens) for place, tokens in initial_marking.items()] == [("start", 1)]
+    assert [(place.name, tokens) for place, tokens in final_marking.items()] == [("end", 1)]
@@ -0,0 +1,53 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import threading
+
+import pandas as pd
+
+from replay_scheduler import ReplayScheduler
+
+
+def make_log(cases, events_per_case):
+    rows = [(f"case_{case}", f"activity_{i}", pd.Timestamp("2020-01-01", tz="UTC") + pd.Timedelta(minutes=case + i))
+            for case in range(cases) for i in range(events_per_case)]
+    return pd.DataFrame(rows, columns=["case:concept:name", "concept:name", "time:timestamp"])
+
+
+def test_failed_event_skips_the_rest_of_its_case():
+    triggered = []
+    lock = threading.Lock()
+
+    def trigger_event(case_id, activity_name, timestamp, is_last):
+        if case_id == "case_1" and activity_name == "activity_1":
+            raise TimeoutError("no answer")
+        with lock:
+            triggered.append((case_id, activity_name))
+
+    metrics = ReplayScheduler(trigger_event, workers=4).run(iter([make_log(cases=3, events_per_case=4)]))
+
+    # activity_1 of case_1 failed, activity_2 and activity_3 are skipped
+    assert metrics['events'] == 12
+    assert metrics['errors'] == 3
+    assert [activity for case_id, activity in triggered if case_id == "case_1"] == ["activity_0"]
+
+    # the other cases are replayed completely and in order
+    for case_id in ("case_0", "case_2"):
+        assert [activity for case, activity in triggered if case == case_id] == [f"activity_{i}" for i in range(4)]
+
+
+def test_events_released_after_the_failure_are_skipped():
+    triggered = []
+
+    def trigger_event(case_id, activity_name, timestamp, is_last):
+        if activity_name == "activity_0":
+            raise ConnectionError("node not reachable")
+        triggered.append(activity_name)
+
+    # one worker releases at most 16 events before the first one is answered, the rest come afterwards
+    metrics = ReplayScheduler(trigger_event, workers=1).run(iter([make_log(cases=1, events_per_case=40)]))
+
+    assert triggered == []
+    assert metrics['errors'] == 40
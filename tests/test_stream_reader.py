@@ -0,0 +1,97 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+
+import pandas as pd
+
+from auxiliaries import stream_reader
+from auxiliaries.stream_reader import COLUMNS, external_sort
+
+
+def make_events(num_events, seed=0):
+    """
+    Returns a shuffled event log with few cases and timestamps, so many events share case id and timestamp.
+    """
+    rng = random.Random(seed)
+    rows = [(f"case_{rng.randrange(7)}", f"activity_{i}", f"2020-01-01 00:00:0{rng.randrange(3)}+00:00")
+            for i in range(num_events)]
+    events = pd.DataFrame(rows, columns=COLUMNS)
+    events["time:timestamp"] = pd.to_datetime(events["time:timestamp"])
+    return events
+
+
+def test_external_sort_merges_more_runs_than_fan_in(tmp_path, monkeypatch):
+    events = make_events(100)
+    chunk_size, fan_in = 2, 3
+    chunks = [events.iloc[i:i + chunk_size] for i in range(0, len(events), chunk_size)]
+    assert len(chunks) > fan_in ** 2     # at least two passes before the final merge
+
+    # count the runs that are read at the same time
+    iter_run = stream_reader._iter_run
+    open_runs = {'now': 0, 'max': 0}
+    def counting_iter_run(path, size):
+        open_runs['now'] += 1
+        open_runs['max'] = max(open_runs['max'], open_runs['now'])
+        try:
+            yield from iter_run(path, size)
+        finally:
+            open_runs['now'] -= 1
+    monkeypatch.setattr(stream_reader, "_iter_run", counting_iter_run)
+
+    result = pd.concat(external_sort(iter(chunks), chunk_size, str(tmp_path), fan_in=fan_in), ignore_index=True)
+
+    expected = events.sort_values(["case:concept:name", "time:timestamp"], kind="mergesort").reset_index(drop=True)
+    assert open_runs['max'] <= fan_in
+    assert result["case:concept:name"].tolist() == expected["case:concept:name"].tolist()
+    assert result["concept:name"].tolist() == expected["concept:name"].tolist()
+    assert pd.to_datetime(result["time:timestamp"]).tolist() == expected["time:timestamp"].tolist()
+    # the merged runs are removed, only the ones of the last pass are left
+    assert len(list(tmp_path.iterdir())) <= fan_in
+
+
+def test_xes_with_mixed_utc_offsets(tmp_path):
+    # two traces in local time, before and after the change to daylight saving time
+    path = tmp_path / "log.xes"
+    path.write_text("""<?xml version="1.0" encoding="UTF-8"?>
+<log xes.version="1.0" xmlns="http://www.xes-standard.org/">
+  <trace>
+    <string key="concept:name" value="1"/>
+    <event><string key="concept:name" value="a"/><date key="time:timestamp" value="2020-03-28T10:00:00.000+01:00"/></event>
+    <event><string key="concept:name" value="b"/><date key="time:timestamp" value="2020-03-28T11:00:00.000+01:00"/></event>
+  </trace>
+  <trace>
+    <string key="concept:name" value="2"/>
+    <event><string key="concept:name" value="a"/><date key="time:timestamp" value="2020-03-29T10:00:00.000+02:00"/></event>
+    <event><string key="concept:name" value="b"/><date key="time:timestamp" value="2020-03-29T08:00:00.000+00:00"/></event>
+  </trace>
+</log>
+""")
+
+    result = pd.concat(stream_reader.stream_event_log(str(path), chunk_size=2), ignore_index=True)
+
+    assert result["case:concept:name"].tolist() == ["1", "1", "2", "2"]
+    # the last event is at the same instant as the one before, so it is moved a second later
+    assert result["time:timestamp"].tolist() == [pd.Timestamp(timestamp, tz="UTC") for timestamp in
+                                                 ["2020-03-28 09:00:00", "2020-03-28 10:00:00",
+                                                  "2020-03-29 08:00:00", "2020-03-29 08:00:01"]]
+
+
+def test_timestamps_with_and_without_fractional_seconds(tmp_path):
+    path = tmp_path / "log.xes"
+    path.write_text("""<?xml version="1.0" encoding="UTF-8"?>
+<log xes.version="1.0" xmlns="http://www.xes-standard.org/">
+  <trace>
+    <string key="concept:name" value="1"/>
+    <event><string key="concept:name" value="a"/><date key="time:timestamp" value="2020-01-01T10:00:00.250+01:00"/></event>
+    <event><string key="concept:name" value="b"/><date key="time:timestamp" value="2020-01-01T11:00:00+01:00"/></event>
+  </trace>
+</log>
+""")
+
+    result = pd.concat(stream_reader.stream_event_log(str(path), chunk_size=2), ignore_index=True)
+
+    assert result["time:timestamp"].tolist() == [pd.Timestamp("2020-01-01 09:00:00.250", tz="UTC"),
+                                                 pd.Timestamp("2020-01-01 10:00:00", tz="UTC")]
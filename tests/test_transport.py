@@ -0,0 +1,75 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import threading
+import time
+
+from bottle import Bottle
+
+from local_cluster import ACTIVITY_NODE_DIR, import_node_modules
+
+transport, = import_node_modules(ACTIVITY_NODE_DIR, 'transport')
+
+
+def test_requests_waiting_for_a_thread_do_not_time_out():
+    http_transport = transport.HttpTransport(max_workers=2)
+    timeouts = []
+
+    def slow_request(srv_ip, URI, timeout_s=None, **kwargs):
+        timeouts.append(timeout_s)
+        time.sleep(0.3)
+        return True, srv_ip
+
+    http_transport.request = slow_request
+    try:
+        # the last two requests only start when the first two are answered, after the timeout of the call
+        calls = [{'srv_ip': f"node_{i}", 'URI': '/'} for i in range(4)]
+        results = http_transport.request_many(calls, timeout_s=0.5)
+    finally:
+        http_transport.close()
+
+    assert results == [(True, f"node_{i}") for i in range(4)]
+    assert timeouts == [0.5] * 4
+
+
+def make_environ(path):
+    return transport.make_environ('POST', path, '', b'', 'text/plain', [], '127.0.0.1', 80)
+
+
+def test_full_event_pool_rejects_events(monkeypatch):
+    monkeypatch.setattr(transport, 'EVENT_WORKERS', 1)
+    monkeypatch.setattr(transport, 'MAX_QUEUED_EVENTS', 2)
+    release = threading.Event()
+
+    app = Bottle()
+    app.outbound_routes = {'/trigger_event'}
+    app.post('/trigger_event', callback=lambda: "handled" if release.wait(5) else "")
+    app.post('/case_event_data', callback=lambda: "answered")
+    pools = transport.RequestPools(app)
+    try:
+        # one event is handled, two wait, the next one is rejected
+        events = [pools.handle(make_environ('/trigger_event'))]
+        while pools.event_pool.get_metrics()['active'] == 0:
+            time.sleep(0.01)
+        events += [pools.handle(make_environ('/trigger_event')) for _ in range(2)]
+        status, headers, _ = pools.handle(make_environ('/trigger_event')).result(timeout=5)
+        assert status.startswith('503')
+        assert ('Retry-After', str(transport.RETRY_AFTER_S)) in headers
+
+        # the other requests are still answered
+        status, _, content = pools.handle(make_environ('/case_event_data')).result(timeout=5)
+        assert status.startswith('200') and content == b"answered"
+
+        release.set()
+        assert [future.result(timeout=5)[2] for future in events] == [b"handled"] * 3
+        _, _, content = pools.handle(make_environ('/metrics')).result(timeout=5)
+        metrics = json.loads(content)
+        assert metrics['event_pool']['rejected'] == 1
+        assert metrics['event_pool']['completed'] == 3
+        assert metrics['event_pool']['max_queue_depth'] == 2
+    finally:
+        release.set()
+        pools.close()
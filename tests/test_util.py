@@ -0,0 +1,31 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from local_cluster import ACTIVITY_NODE_DIR, import_node_modules
+
+util, = import_node_modules(ACTIVITY_NODE_DIR, 'util')
+
+NEW_YEAR_2020_NS = 1577836800 * 10**9
+
+
+def test_naive_timestamps_are_taken_as_utc():
+    assert util.to_epoch_ns("2020-01-01 00:00:00") == NEW_YEAR_2020_NS
+    assert util.to_epoch_ns("2020-01-01T00:00:00.000001") == NEW_YEAR_2020_NS + 1000
+    assert util.to_epoch_ns(datetime(2020, 1, 1)) == NEW_YEAR_2020_NS
+
+
+def test_timestamps_with_utc_offsets():
+    # the same instant in different offsets, also as sent by the event log handler
+    for timestamp in ["2020-01-01 01:00:00+01:00", "2019-12-31T19:00:00-05:00", "2020-01-01T00:00:00Z",
+                      datetime(2020, 1, 1, 2, tzinfo=timezone(timedelta(hours=2))),
+                      str(pd.Timestamp("2020-01-01", tz="UTC").as_unit("ms"))]:
+        assert util.to_epoch_ns(timestamp) == NEW_YEAR_2020_NS, timestamp
+
+    # the instants are compared, not the local times
+    assert util.to_epoch_ns("2020-01-01 10:00:00+02:00") < util.to_epoch_ns("2020-01-01 09:00:00+00:00")
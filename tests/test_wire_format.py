@@ -0,0 +1,83 @@
+# Copyright 2024 Kiel University
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from local_cluster import ACTIVITY_NODE_DIR, CENTRAL_NODE_DIR, import_node_modules
+
+activity_correlations, = import_node_modules(ACTIVITY_NODE_DIR, 'data_structures.activity_correlations')
+central_node_auxiliaries, = import_node_modules(CENTRAL_NODE_DIR, 'central_node_auxiliaries')
+
+
+def make_correlations(rng, node_id, n):
+    """
+    Returns the ``ActivityCorrelations`` of node ``node_id`` with random counts, start values and sequence numbers.
+    """
+    correlations = activity_correlations.ActivityCorrelations(SimpleNamespace(id=node_id))
+    correlations.set_variables((n, n))
+    correlations.footprint_matrix[:] = [[rng.randrange(1000) for _ in range(n)] for _ in range(n)]
+    correlations.is_start_vector[:] = [[rng.randrange(2)] for _ in range(n)]
+    correlations.seq_nmbr_vector[:] = [[rng.randrange(2**40)] for _ in range(n)]
+    return correlations
+
+
+def test_node_data_round_trip():
+    rng = random.Random(0)
+    for n in (1, 2, 7, 40):
+        node_id = rng.randrange(n)
+        correlations = make_correlations(rng, node_id, n)
+        for is_end_activity in (False, True):
+            data = central_node_auxiliaries.decode_node_data(correlations.to_bytes(is_end_activity))
+
+            assert np.array_equal(data['start_activities'], correlations.is_start_vector)
+            assert np.array_equal(data['seq_nmbr_vector'], correlations.seq_nmbr_vector)
+            assert np.array_equal(data['fm'], correlations.footprint_matrix)
+            assert data['end_activities'] == ({node_id} if is_end_activity else set())
+
+
+def test_unknown_format_is_rejected():
+    payload = bytearray(make_correlations(random.Random(0), 0, 3).to_bytes(False))
+    payload[4] = activity_correlations.WIRE_VERSION + 1
+    with pytest.raises(ValueError):
+        central_node_auxiliaries.decode_node_data(bytes(payload))
+
+
+def test_both_sides_use_the_same_format():
+    for name in ('WIRE_MAGIC', 'WIRE_VERSION', 'WIRE_HEADER', 'FLAG_END_ACTIVITY', 'DELTA_MAGIC', 'FLAG_ROW_INCLUDED'):
+        encoder_value, decoder_value = getattr(activity_correlations, name), getattr(central_node_auxiliaries, name)
+        if name == 'WIRE_HEADER':
+            encoder_value, decoder_value = encoder_value.format, decoder_value.format
+        assert encoder_value == decoder_value, name
+
+
+def test_node_delta_round_trip():
+    rng = random.Random(1)
+    for n in (1, 2, 7, 40):
+        node_id = rng.randrange(n)
+        correlations = make_correlations(rng, node_id, n)
+        seq_nmbr = int(correlations.seq_nmbr_vector[node_id][0])
+        for is_end_activity in (False, True):
+            # the central node knows an older sequence number, or one of a node that restarted since
+            for known_seq_nmbr in (seq_nmbr - 1, seq_nmbr + 1):
+                delta = central_node_auxiliaries.decode_node_delta(correlations.delta_to_bytes(known_seq_nmbr, is_end_activity))
+
+                assert delta['node_id'] == node_id
+                assert delta['is_end_activity'] == is_end_activity
+                assert delta['seq_nmbr'] == seq_nmbr
+                assert delta['is_start'] == correlations.is_start_vector[node_id][0]
+                assert np.array_equal(delta['row'], correlations.footprint_matrix[node_id])
+
+
+def test_node_delta_without_row():
+    correlations = make_correlations(random.Random(2), 1, 4)
+    seq_nmbr = int(correlations.seq_nmbr_vector[1][0])
+
+    payload = correlations.delta_to_bytes(seq_nmbr, True)
+    assert len(payload) == activity_correlations.WIRE_HEADER.size
+    assert central_node_auxiliaries.decode_node_delta(payload) == {'node_id': 1, 'is_end_activity': True}